@@ -0,0 +1,128 @@
+"""
+Benchmark of the logging overhead of the write loop.
+
+The script writer is run over a synthetic outline with the chat model stubbed
+out, so what is measured is the work Podcastic does around each model call:
+building the prompt, scoring candidates for repetition, bookkeeping, and logging.
+Log output that would go to the console is written to a file in a temporary
+directory, and its size is reported along with the time per utterance.
+
+Setups:
+
+* ``off``: logging disabled, the baseline the overhead of the others is measured against
+* ``legacy``: what importing the write command used to configure, DEBUG on the
+  root logger plus a second console handler, all written synchronously
+* ``default``: the default ``--log-level WARNING``
+* ``debug``: ``--log-level DEBUG`` through the background queue
+* ``trace``: ``--log-level DEBUG`` with prompts and scripts in a trace file
+
+Usage::
+
+    python benchmarks/bench_write_logging.py --setup off --setup legacy --setup default --sections 10 --repeat 5
+
+Run it on a checkout from before the logging changes with ``--setup off --setup
+legacy`` to measure the logging the write command used to configure itself.
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Run from a checkout without installing the package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SETUPS = ("off", "legacy", "default", "debug", "trace")
+
+
+def configure(setup, log_dir):
+    """
+    Apply a logging setup, sending console output to a file in log_dir.
+    """
+    # Handlers bind sys.stderr when they are created
+    sys.stderr = open(log_dir / "console.log", "w")
+    if setup == "off":
+        logging.disable(logging.CRITICAL)
+        return lambda: None
+    if setup == "legacy":
+        logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+        handler = logging.StreamHandler()
+        handler.setLevel(logging.DEBUG)
+        logging.getLogger("podcastic.commands.write").addHandler(handler)
+        return lambda: None
+    from podcastic.utils.logging_config import configure_logging, stop_logging
+    configure_logging(
+        level="WARNING" if setup == "default" else "DEBUG",
+        trace_file=log_dir / "trace.log" if setup == "trace" else None,
+    )
+    return stop_logging
+
+
+def run_once(sections, config, retriever):
+    from podcastic.commands.write import iter_script
+
+    rng = random.Random(0)
+
+    def request_candidates(chat_model, prompt):
+        # Made-up words, so no utterance is taken for a repetition of an earlier one
+        words = ("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(16))
+        return [" ".join(words).capitalize() + "."]
+
+    with patch("langchain_openai.ChatOpenAI", lambda **kwargs: SimpleNamespace(n=kwargs.get("n"))), \
+            patch("podcastic.commands.write.request_candidates", request_candidates):
+        started = time.perf_counter()
+        fragments = list(iter_script(sections, config, retriever))
+        return time.perf_counter() - started, sum(1 for fragment in fragments if fragment.startswith("<speak"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--setup", action="append", choices=SETUPS, help="Setups to compare (default: all)")
+    parser.add_argument("--sections", type=int, default=10, help="Outline sections per run (4 utterances each)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per setup; the median is reported")
+    args = parser.parse_args()
+    setups = args.setup or list(SETUPS)
+    if len(setups) > 1:
+        # Logging is configured once per process, so each setup runs in its own
+        for setup in setups:
+            os.system(f'"{sys.executable}" "{__file__}" --setup {setup} '
+                      f'--sections {args.sections} --repeat {args.repeat}')
+        return
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    import yaml
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_dir = Path(temp_dir)
+        stdout = sys.stdout
+        # Before the write command is imported, in case importing it configures logging
+        stop = configure(setups[0], log_dir)
+
+        from podcastic.commands.write import build_context_retriever
+        config = yaml.safe_load(Path("config.yaml").read_text())
+        topic = "\n\n".join(f"Section {i} covers topic {i} in some depth. " * 40 for i in range(args.sections))
+        sections = [f"{i}. Topic {i}\n   - Point one about topic {i}\n   - Point two about topic {i}"
+                    for i in range(1, args.sections + 1)]
+        retriever = build_context_retriever(topic, config)
+        timings = []
+        for _ in range(args.repeat):
+            seconds, utterances = run_once(sections, config, retriever)
+            timings.append(seconds / utterances)
+        stop()
+        sys.stderr.close()
+        sys.stderr = sys.__stderr__
+        logged = sum(path.stat().st_size for path in log_dir.iterdir())
+        stdout.write(f"{setups[0]:>8}: {statistics.median(timings) * 1000:7.2f} ms per utterance, "
+                     f"{logged / args.repeat / 1024:8.1f} KiB logged per run\n")
+
+
+if __name__ == "__main__":
+    main()
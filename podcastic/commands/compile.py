@@ -11,47 +11,108 @@ import logging
 from pathlib import Path
 import typer
 from rich.console import Console
-from podcastic.utils.audio_utils import stitch_audio_files
+from podcastic.utils.audio_utils import check_segments, parse_ssml, script_texts, stitch_audio_files
+from podcastic.utils.preview import DEFAULT_LEAD_IN, parse_window, render_preview
+from podcastic.utils.segment_store import open_episode_pack
 
 app = typer.Typer()
 console = Console()
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 @app.command()
-def run(input: Path = typer.Option(..., "--input", help="Path to the input SSML file")):
+def run(
+    input: Path = typer.Option(..., "--input", help="Path to the input SSML file"),
+    segments: str = typer.Option(None, "--segments", help="Only preview part of the script: segment numbers such as 40-60, or a time range such as 2:30-4:00"),
+    lead_in: float = typer.Option(DEFAULT_LEAD_IN, "--lead-in", help="Seconds of context to play before the previewed segments")
+):
     """
     Compile the generated audio files into a single podcast.
+
+    Every segment is checked for truncation and corruption first; the podcast
+    is only compiled if all of them are usable. Segments are read from the
+    episode's segment pack if it has one, and from its MP3 files otherwise.
+    With --segments, only that part of the script is compiled, to a preview file.
     """
     try:
         input_file = Path(input).resolve()
         output_dir = Path.cwd() / "generated" / input_file.stem
+
+        if segments:
+            compile_preview(input_file, output_dir, segments, lead_in)
+            return
         
-        logger.debug(f"Input file: {input_file}")
-        logger.debug(f"Output directory: {output_dir}")
-        logger.debug(f"Output directory exists: {output_dir.exists()}")
-        logger.debug(f"Output directory is dir: {output_dir.is_dir()}")
+        logger.debug("Input file: %s", input_file)
+        logger.debug("Output directory: %s", output_dir)
+        logger.debug("Output directory exists: %s", output_dir.exists())
+        logger.debug("Output directory is dir: %s", output_dir.is_dir())
         
-        audio_files = list(output_dir.glob("*.mp3"))
-        logger.debug(f"Found audio files: {[file.name for file in audio_files]}")
+        full_podcast_path = output_dir / f"{input_file.stem}_full_podcast.mp3"
+        pack = open_episode_pack(output_dir)
+        try:
+            if pack is not None:
+                audio_files = pack.segments()
+            else:
+                # The podcast from the last compile sits next to the segments
+                audio_files = [path for path in output_dir.glob("*.mp3") if path != full_podcast_path]
+            logger.debug("Found audio files: %s", [file.name for file in audio_files])
         
-        if not audio_files:
-            logger.error(f"No audio files found in {output_dir}")
-            console.print(f"[bold red]Error:[/bold red] No audio files found in {output_dir}")
-            raise typer.Exit(code=1)
+            if not audio_files:
+                logger.error("No audio files found in %s", output_dir)
+                console.print(f"[bold red]Error:[/bold red] No audio files found in {output_dir}")
+                raise typer.Exit(code=1)
         
-        # Sort the audio files by name
-        audio_files.sort(key=lambda x: x.name)
+            # Sort the audio files by name
+            audio_files.sort(key=lambda x: x.name)
         
-        audio_files_with_type = [("audio", file) for file in audio_files]
+            audio_files_with_type = [("audio", file) for file in audio_files]
+
+            # Catch cut-off or corrupt segments before they reach the encoder
+            texts = script_texts(input_file.read_text()) if input_file.exists() else {}
+            flagged = check_segments(audio_files_with_type, texts)
+            if flagged:
+                for path, problems in flagged.items():
+                    console.print(f"[bold red]Unusable segment:[/bold red] {path.name}: {'; '.join(problems)}")
+                if pack is not None:
+                    console.print("These segments are in the episode's segment pack; run 'generate' again, "
+                                  "and the new takes will replace them in the pack.")
+                else:
+                    console.print("Delete these files and run 'generate' again to synthesize them.")
+                raise typer.Exit(code=1)
         
-        full_podcast_path = output_dir / f"{input_file.stem}_full_podcast.mp3"
-        full_podcast = stitch_audio_files(audio_files_with_type, full_podcast_path)
-        logger.info(f"Full podcast compiled: {full_podcast}")
+            full_podcast = stitch_audio_files(audio_files_with_type, full_podcast_path)
+        finally:
+            if pack is not None:
+                pack.close()
+        logger.info("Full podcast compiled: %s", full_podcast)
         console.print(f"[bold green]Full podcast compiled:[/bold green] {full_podcast}")
     except Exception as e:
-        logger.exception(f"Error in compile command: {str(e)}")
+        logger.exception("Error in compile command: %s", e)
         console.print(f"[bold red]Error:[/bold red] {str(e)}")
-        raise typer.Exit(code=1)
\ No newline at end of file
+        raise typer.Exit(code=1)
+
+def compile_preview(input_file: Path, output_dir: Path, segments: str, lead_in: float):
+    """
+    Compile a preview of part of the script from the audio already generated.
+
+    :raises ValueError: If the window is invalid or a segment in it has no usable audio
+    """
+    window = parse_window(segments)
+    store = open_episode_pack(output_dir)
+    try:
+        preview = render_preview(parse_ssml(input_file.read_text()), output_dir, input_file.stem,
+                                 window, lead_in, store)
+    finally:
+        if store is not None:
+            store.close()
+    report_preview(preview)
+
+def report_preview(preview):
+    """
+    Print where a preview was written, and which of its segments could not be
+    checked against the script.
+    """
+    if preview.unverified:
+        console.print(f"[yellow]Unverified:[/yellow] {', '.join(preview.unverified)} have no recorded text "
+                      "and may not match the current script")
+    console.print(f"[bold green]Preview compiled:[/bold green] {preview.path}")
\ No newline at end of file
@@ -10,23 +10,34 @@ the SSML, sending requests to the TTS service, and saving the resulting audio fi
 from pathlib import Path
 import typer
 from rich.console import Console
+from rich.table import Table
 from podcastic.utils.tts_services import get_tts_service
-from podcastic.utils.audio_utils import process_ssml
-from podcastic.commands.compile import run as compile_run
+from podcastic.utils.audio_utils import parse_ssml, process_ssml
+from podcastic.utils.estimates import (
+    format_cost, format_duration, load_history, schedule, tts_cost, tts_request_latencies
+)
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.offline_tts import WORDS_PER_SECOND
+from podcastic.utils.preview import DEFAULT_LEAD_IN, parse_window, render_preview
+from podcastic.utils.rate_limiter import DEFAULT_SETTINGS, load_rate_limit_settings
+from podcastic.utils.segment_store import open_episode_pack
+from podcastic.commands.compile import report_preview, run as compile_run
+from podcastic.commands.write import load_config
 import logging
 
 app = typer.Typer()
 console = Console()
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG, filename='generate_reasoning.log', filemode='w',
-                    format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 @app.callback()
 def run(
     input: Path = typer.Option(..., "--input", help="Path to the input SSML file"),
-    service: str = typer.Option("openai", help="TTS service to use (elevenlabs or openai)")
+    service: str = typer.Option("openai", help="TTS service to use (openai, elevenlabs or offline)"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Estimate characters, cost and duration without calling any API"),
+    concurrency: int = typer.Option(None, "--concurrency", help="Requests in flight assumed by --dry-run (default: max_concurrency of the service)"),
+    segments: str = typer.Option(None, "--segments", help="Only synthesize and preview part of the script: segment numbers such as 40-60, or a time range such as 2:30-4:00"),
+    lead_in: float = typer.Option(DEFAULT_LEAD_IN, "--lead-in", help="Seconds of context to play before the previewed segments")
 ):
     """
     Main function for the 'generate' command.
@@ -42,10 +53,14 @@ def run(
     4. Saving individual audio files
     5. Initiating the compilation process to create the full podcast
 
+    With --segments, only the segments of that window (and its lead-in) that
+    have no usable audio are synthesized, and a preview of the window is
+    compiled instead of the full podcast.
+
     This function bridges the gap between the written script and audio production,
     turning the AI-generated dialogue into spoken word.
     """
-    logger.info(f"Starting generation process with input file: {input} and service: {service}")
+    logger.info("Starting generation process with input file: %s and service: %s", input, service)
     
     input_file = Path(input).resolve()
 
@@ -55,26 +70,61 @@ def run(
         console.print(f"[bold red]Error:[/bold red] {error_msg}")
         raise typer.Exit(code=1)
     
+    if dry_run:
+        estimate_audio(input_file, service, concurrency)
+        return
+
+    try:
+        window = parse_window(segments) if segments else None
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        raise typer.Exit(code=1)
+
     output_dir = Path.cwd() / "generated" / input_file.stem
     output_dir.mkdir(parents=True, exist_ok=True)
-    logger.info(f"Created output directory: {output_dir}")
+    logger.info("Created output directory: %s", output_dir)
     
     with open(input_file, "r") as file:
         content = file.read()
-    logger.debug(f"Read content from input file: {input_file}")
+    logger.debug("Read content from input file: %s", input_file)
     
     try:
         tts_service = get_tts_service(service)
-        logger.info(f"Using {service} TTS service")
+        logger.info("Using %s TTS service", service)
         console.print(f"[bold green]Using {service} TTS service[/bold green]")
         
         logger.debug("Starting SSML processing")
-        audio_files = process_ssml(content, tts_service, output_dir)
-        logger.info(f"Audio files and pauses generated in: {output_dir}")
+        store = open_episode_pack(output_dir, create=True)
+        if window:
+            try:
+                preview = render_preview(parse_ssml(content), output_dir, input_file.stem,
+                                         window, lead_in, store, tts_service)
+            finally:
+                if store is not None:
+                    store.close()
+            run_metrics.save(output_dir / "run_metrics.json")
+            console.print(f"Synthesized {preview.synthesized} missing segments")
+            report_preview(preview)
+            return
+        try:
+            audio_files = process_ssml(content, tts_service, output_dir, store)
+            if store is not None and store.needs_compaction():
+                reclaimed = store.compact()
+                logger.info("Compacted the segment pack, reclaiming %s bytes", reclaimed)
+        finally:
+            if store is not None:
+                store.close()
+        logger.info("Audio files and pauses generated in: %s", output_dir)
         console.print(f"[bold green]Audio files and pauses generated in:[/bold green] {output_dir}")
+
+        rate_limit = run_metrics.snapshot()["gauges"].get(f"rate_limit.{service}")
+        if rate_limit:
+            console.print(f"Rate limit for {service}: {rate_limit}")
+        metrics_path = run_metrics.save(output_dir / "run_metrics.json")
+        logger.info("Run metrics saved to: %s", metrics_path)
         
         logger.debug("Starting compilation process")
-        compile_run(input=input_file)
+        compile_run(input=input_file, segments=None)
         logger.info("Compilation process completed")
     except Exception as e:
         error_msg = f"Error during generation process: {str(e)}"
@@ -82,5 +132,61 @@ def run(
         console.print(f"[bold red]Error:[/bold red] {error_msg}")
         raise typer.Exit(code=1)
 
+def provider_voice(config: dict, service: str, speaker: str) -> str:
+    """
+    Name the provider voice a speaker is synthesized with.
+
+    :rtype: str
+    """
+    voice = (config.get(service) or {}).get(speaker.lower()) or {}
+    return voice.get('voice') or voice.get('voice_id') or speaker
+
+def estimate_audio(input_file: Path, service: str, concurrency: int = None):
+    """
+    Print the expected size, cost and duration of synthesizing a script.
+
+    No API is called. Request latencies are taken from the metrics of previous
+    runs when available, and requests are scheduled on ``concurrency`` workers
+    within the rate limit configured for the service.
+    """
+    # Loaded the way 'write --dry-run' loads it, and read once for prices and rate limits
+    config = load_config()
+    settings = {**DEFAULT_SETTINGS, **load_rate_limit_settings(service, config)}
+    concurrency = concurrency or settings['max_concurrency']
+
+    segments = parse_ssml(input_file.read_text())
+    speech = [segment for segment in segments if segment[0] == "speech"]
+    pauses = sum(segment[1] for segment in segments if segment[0] == "pause")
+
+    table = Table(title=f"Dry run: {input_file.name} with {service} (no API calls made)")
+    table.add_column("Voice")
+    table.add_column(f"{service} voice")
+    table.add_column("Segments", justify="right")
+    table.add_column("Characters", justify="right")
+    by_speaker = {}
+    for _, speaker, text in speech:
+        counts = by_speaker.setdefault(speaker, [0, 0])
+        counts[0] += 1
+        counts[1] += len(text)
+    for speaker, (count, characters) in by_speaker.items():
+        table.add_row(speaker, provider_voice(config, service, speaker), str(count), str(characters))
+    characters = sum(len(text) for _, _, text in speech)
+    table.add_row("Total", "", str(len(speech)), str(characters))
+    console.print(table)
+
+    history = load_history(Path.cwd() / "generated")
+    latencies, measured = tts_request_latencies([text for _, _, text in speech], service, history)
+    wall_clock = max(schedule(latencies, concurrency), len(speech) / settings['max_requests_per_second'])
+    words = sum(len(text.split()) for _, _, text in speech)
+    basis = f"latencies measured over {history['runs']} previous runs" if measured else "typical latencies, no previous runs"
+
+    console.print(f"Pauses: {len([segment for segment in segments if segment[0] == 'pause'])}, {pauses:.1f}s in total")
+    console.print(f"Expected audio length: {format_duration(words / WORDS_PER_SECOND + pauses)}")
+    console.print(f"Estimated cost: {format_cost(tts_cost(config, service, characters))}")
+    console.print(
+        f"Estimated duration: {format_duration(wall_clock)} at concurrency {concurrency} "
+        f"({basis})"
+    )
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
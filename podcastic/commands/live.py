@@ -0,0 +1,185 @@
+"""
+Module for streaming a podcast episode live as it is written.
+
+This module implements the 'live' command. It streams each utterance from the
+chat model token by token, cuts the tokens into sentences, synthesizes every
+sentence as soon as it is complete, and serves the audio from a local HTTP
+endpoint as one continuous MP3 stream. Listeners hear the first sentence while
+the rest of the episode is still being written.
+
+The personas, prompts and pauses are the ones the 'write' command uses. Because
+audio is played as soon as it exists, an utterance cannot be regenerated after
+the fact, so the similarity retries of 'write' are not applied here.
+"""
+
+import logging
+import time
+from functools import partial
+from pathlib import Path
+import typer
+from rich.console import Console
+from podcastic.commands.write import build_utterance_prompt, iter_script, plan_script
+from podcastic.utils.audio_utils import parse_ssml
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.profiling import span
+from podcastic.utils.streaming import AudioStreamServer, LiveAudioPipeline, SentenceSplitter
+from podcastic.utils.tts_services import get_tts_service
+
+app = typer.Typer()
+console = Console()
+
+logger = logging.getLogger(__name__)
+
+@app.command()
+def run(
+    topic: Path = typer.Option(..., help="Path to the topic markdown file"),
+    service: str = typer.Option("offline", help="TTS service to use (openai, elevenlabs or offline)"),
+    host: str = typer.Option("127.0.0.1", help="Address to serve the audio stream on"),
+    port: int = typer.Option(8000, help="Port to serve the audio stream on (0 picks a free port)"),
+    output: Path = typer.Option(None, help="Path to also save the podcast script"),
+    research: Path = typer.Option(None, help="Research YAML file whose index provides the topic context"),
+    context_tokens: int = typer.Option(None, "--context-tokens", help="Token budget for the topic context sent with each utterance"),
+    keep_serving: bool = typer.Option(True, help="Keep serving the finished episode until interrupted")
+):
+    """
+    Write a podcast episode and stream its audio in real time.
+
+    The process involves:
+    1. Generating the outline, as the 'write' command does
+    2. Streaming each utterance from the chat model and cutting it into sentences
+    3. Synthesizing sentences concurrently and publishing them in order
+    4. Inserting the scripted pauses between utterances as silence
+    5. Reporting the time to first audio and the gaps between utterances
+    """
+    started = time.perf_counter()
+
+    try:
+        tts_service = get_tts_service(service)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        raise typer.Exit(code=1)
+    console.print(f"[bold green]Using {service} TTS service[/bold green]")
+
+    server = AudioStreamServer((host, port))
+    server.start()
+    console.print(f"[bold green]Streaming at[/bold green] {server.url}")
+
+    try:
+        config, retriever, sections = plan_script(topic, research, context_tokens)
+        try:
+            if len(sections) == 0:
+                console.print("[bold red]Error:[/bold red] No sections found in the outline.")
+                raise typer.Exit(code=1)
+
+            pipeline = LiveAudioPipeline(tts_service, server, started=started)
+            script_file = open(output, "w") if output else None
+            try:
+                utterance_fn = partial(stream_utterance, pipeline)
+                for fragment in iter_script(sections, config, retriever, utterance_fn=utterance_fn):
+                    if script_file:
+                        script_file.write(fragment + "\n\n")
+                        script_file.flush()
+                    for segment in parse_ssml(fragment):
+                        if segment[0] == "pause":
+                            pipeline.pause(segment[1])
+            except Exception:
+                # say() and pause() raise the first synthesis failure; stop writing there
+                pipeline.abort()
+                raise
+            finally:
+                if script_file:
+                    script_file.close()
+            pipeline.finish()
+        finally:
+            retriever.close()
+    except typer.Exit:
+        server.stop()
+        raise
+    except Exception as e:
+        logger.exception("Error in live command: %s", e)
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        server.stop()
+        raise typer.Exit(code=1)
+
+    report_live_metrics(pipeline, Path.cwd() / "generated" / (output.stem if output else "live"))
+
+    if keep_serving:
+        console.print(f"Episode complete; still serving it at {server.url} (press Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    server.stop()
+
+@span("stream_utterance")
+def stream_utterance(
+    pipeline: LiveAudioPipeline,
+    speaker: str,
+    other_speaker: str,
+    full_conversation_history: str,
+    section: str,
+    config: dict,
+    name_usage_count: dict,
+    utterance_count: dict,
+    total_utterances: int,
+    is_final_utterance: bool,
+    topic_content: str
+) -> str:
+    """
+    Stream an utterance from the chat model, sending each sentence to the pipeline.
+
+    Takes the same arguments as generate_utterance, after the pipeline.
+
+    :return: The complete utterance
+    :rtype: str
+    """
+    from langchain_openai import ChatOpenAI
+
+    chat_model = ChatOpenAI(model=config.get('utterance_generation_model', 'gpt-4o-mini'), temperature=0)
+    messages = build_utterance_prompt(
+        speaker, other_speaker, full_conversation_history, section, config,
+        utterance_count, is_final_utterance, topic_content
+    )
+
+    voice = speaker.capitalize()
+    splitter = SentenceSplitter()
+    parts = []
+    pipeline.start_utterance()
+    requested = time.perf_counter()
+    with run_metrics.timer("live.utterance_latency"):
+        for chunk in chat_model.stream(messages):
+            if not parts:
+                run_metrics.observe("live.first_token_latency", time.perf_counter() - requested)
+            parts.append(chunk.content)
+            for sentence in splitter.feed(chunk.content):
+                pipeline.say(voice, sentence)
+    for sentence in splitter.flush():
+        pipeline.say(voice, sentence)
+
+    utterance = "".join(parts).strip()
+    logger.debug("Streamed utterance for %s: %s", speaker, utterance)
+
+    if other_speaker.lower() in utterance.lower():
+        name_usage_count[other_speaker.lower()] += 1
+    utterance_count[speaker.lower()] += 1
+    return utterance
+
+def report_live_metrics(pipeline: LiveAudioPipeline, output_dir: Path):
+    """
+    Print the streaming latencies and save the run metrics.
+
+    :param pipeline: The pipeline that streamed the episode
+    :type pipeline: LiveAudioPipeline
+    :param output_dir: Directory the run metrics are saved in
+    :type output_dir: Path
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    run_metrics.save(output_dir / "run_metrics.json")
+    if pipeline.time_to_first_audio is not None:
+        console.print(f"Time to first audio: {pipeline.time_to_first_audio:.2f}s")
+    if pipeline.gaps:
+        console.print(
+            f"Gaps between utterances beyond the scripted pauses: "
+            f"mean {sum(pipeline.gaps) / len(pipeline.gaps):.2f}s, max {max(pipeline.gaps):.2f}s"
+        )
@@ -0,0 +1,109 @@
+"""
+Module for producing a podcast episode from a topic in a single pass.
+
+This module implements the 'produce' command, which fuses the 'write' and
+'generate' commands. Each utterance is final as soon as it has been written,
+so it is handed straight to the TTS worker pool while later utterances are
+still being generated. The SSML script is written incrementally as a side
+effect, and the episode is compiled once the last segment has been synthesized.
+Total episode time is therefore roughly the longer of writing and synthesis
+instead of their sum.
+"""
+
+import logging
+import time
+from pathlib import Path
+import typer
+from rich.console import Console
+from podcastic.commands.write import plan_script, iter_script, report_write_metrics
+from podcastic.commands.compile import run as compile_run
+from podcastic.utils.audio_utils import SynthesisPool, parse_ssml
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.segment_store import open_episode_pack
+from podcastic.utils.tts_services import get_tts_service
+
+app = typer.Typer()
+console = Console()
+
+logger = logging.getLogger(__name__)
+
+@app.command()
+def run(
+    topic: Path = typer.Option(..., help="Path to the topic markdown file"),
+    output: Path = typer.Option("output.ssml", help="Path to save the podcast script"),
+    service: str = typer.Option("openai", help="TTS service to use (openai, elevenlabs or offline)"),
+    research: Path = typer.Option(None, help="Research YAML file whose index provides the topic context"),
+    context_tokens: int = typer.Option(None, "--context-tokens", help="Token budget for the topic context sent with each utterance"),
+    candidates: int = typer.Option(None, "--candidates", help="Candidate utterances to request per call; the least repetitive is kept")
+):
+    """
+    Write a podcast script and synthesize it at the same time.
+
+    The process involves:
+    1. Generating the outline, as the 'write' command does
+    2. Generating utterances one by one, appending each to the SSML file
+    3. Sending each utterance to the TTS worker pool as soon as it is written
+    4. Waiting for the remaining synthesis once the script is complete
+    5. Compiling the full podcast
+    """
+    started = time.perf_counter()
+    output_dir = Path.cwd() / "generated" / output.stem
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        tts_service = get_tts_service(service)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        raise typer.Exit(code=1)
+    console.print(f"[bold green]Using {service} TTS service[/bold green]")
+
+    config, retriever, sections = plan_script(topic, research, context_tokens)
+    if candidates:
+        config['utterance_candidates'] = candidates
+    if len(sections) == 0:
+        logger.error("No sections found in the outline. Script generation cannot proceed.")
+        console.print("[bold red]Error:[/bold red] No sections found in the outline.")
+        retriever.close()
+        raise typer.Exit(code=1)
+
+    store = open_episode_pack(output_dir, create=True)
+    pool = SynthesisPool(tts_service, output_dir, store)
+    try:
+        with open(output, "w") as script_file:
+            for index, fragment in enumerate(iter_script(sections, config, retriever)):
+                script_file.write(fragment + "\n\n")
+                script_file.flush()
+                for segment in parse_ssml(fragment):
+                    pool.add(index, segment)
+                # Stop writing as soon as a segment fails rather than at the end of the script
+                pool.raise_if_failed()
+                if fragment.startswith("<speak"):
+                    console.print(f"Written and queued for synthesis: segment {index + 1}")
+        written = time.perf_counter()
+        console.print(f"[bold green]Script written:[/bold green] {output}")
+
+        pool.wait(lambda output_path: console.print(f"Generated: {output_path.name}"))
+        synthesized = time.perf_counter()
+        if store is not None and store.needs_compaction():
+            store.compact()
+    except Exception as e:
+        pool.executor.shutdown(wait=False, cancel_futures=True)
+        logger.exception("Error in produce command: %s", e)
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        raise typer.Exit(code=1)
+    finally:
+        if store is not None:
+            store.close()
+        retriever.close()
+
+    report_write_metrics(retriever, output)
+    run_metrics.observe("produce.write_seconds", written - started)
+    run_metrics.observe("produce.synthesis_tail_seconds", synthesized - written)
+    run_metrics.observe("produce.total_seconds", synthesized - started)
+    run_metrics.save(output_dir / "run_metrics.json")
+    console.print(
+        f"Writing took {written - started:.1f}s; synthesis finished {synthesized - written:.1f}s later "
+        f"({synthesized - started:.1f}s in total)"
+    )
+
+    compile_run(input=output, segments=None)
@@ -3,18 +3,50 @@ Module for researching topics using the RAPTOR RAG technique.
 
 This module implements a command to research topics based on URLs provided in a YAML file,
 generate recursive summaries, and index them in a vector database.
+
+The input YAML file lists the sources to study:
+
+    urls:
+      - https://example.com/article
+    files:
+      - notes/background.md
+    embedder: openai   # or 'hashing' for a deterministic, offline index
+    summarizer: openai # or 'extractive' for offline summaries
+    summary_model: gpt-4o-mini
+    clustering: kmeans # or 'gmm'
+    cluster_size: 6
+    max_connections: 8
+    max_connections_per_host: 2
+
+URLs are fetched concurrently and each page is indexed as soon as it arrives.
+Responses are cached in ``research/.http_cache/`` and revalidated with their ETag
+or Last-Modified date, so unchanged pages cost a 304 and are skipped.
+
+The index is stored in ``research/<input_file_name>/`` and updated incrementally:
+sources whose text has not changed since the last run are not re-embedded, and
+only the RAPTOR branches of new or changed sources are re-clustered and
+re-summarized.
 """
 
+import asyncio
 import typer
+import yaml
 from pathlib import Path
 from rich.console import Console
+from podcastic.utils.documents import extract_text
+from podcastic.utils.embeddings import get_embedder
+from podcastic.utils.fetcher import FAILED, NOT_MODIFIED, HTTPCache, fetch_all
+from podcastic.utils.raptor import RaptorTree, get_summarizer
+from podcastic.utils.research_index import ResearchIndex
 
 app = typer.Typer()
 console = Console()
 
 @app.command()
 def run(
-    input_file: Path = typer.Argument(..., help="Path to the input YAML file containing research parameters")
+    input_file: Path = typer.Argument(..., help="Path to the input YAML file containing research parameters"),
+    query: str = typer.Option(None, "--query", help="Search the research index instead of updating it"),
+    top_k: int = typer.Option(5, "--top-k", help="Number of results to show for --query")
 ):
     """
     Research topics using the RAPTOR RAG technique.
@@ -26,6 +58,157 @@ def run(
     :param input_file: Path to the input YAML file
     :type input_file: Path
     """
-    console.print("[bold]Research command is not yet implemented.[/bold]")
-    console.print(f"Input file: {input_file}")
-    # TODO: Implement the research logic using RAPTOR RAG technique
\ No newline at end of file
+    input_file = Path(input_file).resolve()
+    if not input_file.exists():
+        console.print(f"[bold red]Error:[/bold red] File {input_file} not found.")
+        raise typer.Exit(code=1)
+
+    research_config = load_research_config(input_file)
+    index_dir = Path.cwd() / "research" / input_file.stem
+    try:
+        index = ResearchIndex(index_dir, get_embedder(research_config.get("embedder", "openai")))
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        raise typer.Exit(code=1)
+
+    if query:
+        for result in index.search(query, k=top_k):
+            if "chunk" in result.metadata:
+                label = f"{result.metadata['source']} #{result.metadata['chunk']}"
+            else:
+                label = f"{result.metadata['source'] or 'all sources'} (level {result.metadata['level']} summary)"
+            console.print(f"[bold]{result.score:.3f}[/bold] {label}")
+            console.print(result.metadata["text"])
+            console.print()
+        return
+
+    sources = research_config["sources"]
+    for source in set(index.sources) - set(sources):
+        index.remove_source(source)
+        console.print(f"Removed: {source}")
+
+    urls = [source for source in sources if is_url(source)]
+    if urls:
+        cache = HTTPCache(Path.cwd() / "research" / ".http_cache")
+        asyncio.run(index_urls(index, urls, cache, research_config))
+
+    for source in sources:
+        if is_url(source):
+            continue
+        try:
+            text = load_file(source)
+        except OSError as e:
+            console.print(f"[bold red]Failed to load {source}:[/bold red] {str(e)}")
+            continue
+        report_indexed(source, index.update_source(source, text))
+
+    summarizer_name = research_config.get("summarizer", "openai")
+    summarizer_options = {"model": research_config["summary_model"]} \
+        if summarizer_name == "openai" and research_config.get("summary_model") else {}
+    try:
+        tree = RaptorTree(
+            index,
+            get_summarizer(summarizer_name, **summarizer_options),
+            cluster_size=research_config.get("cluster_size", 6),
+            method=research_config.get("clustering", "kmeans")
+        )
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        raise typer.Exit(code=1)
+    stats = tree.update()
+    console.print(
+        f"RAPTOR tree: {stats['rebuilt_sources']} sources rebuilt, {stats['reused_sources']} reused, "
+        f"{stats['summaries_generated']} summaries generated, {stats['cache_hits']} cached"
+    )
+
+    console.print(f"[bold green]Research index updated:[/bold green] {index_dir} ({len(index.sources)} sources)")
+
+def load_research_config(input_file: Path) -> dict:
+    """
+    Load the research parameters from the input YAML file.
+
+    Local file paths are resolved relative to the YAML file and merged with the
+    URLs into a single ``sources`` list.
+
+    :param input_file: Path to the input YAML file
+    :type input_file: Path
+    :return: Research parameters
+    :rtype: dict
+    """
+    with open(input_file, "r") as f:
+        research_config = yaml.safe_load(f) or {}
+    files = [str((input_file.parent / path).resolve()) for path in research_config.get("files") or []]
+    research_config["sources"] = list(research_config.get("urls") or []) + files
+    return research_config
+
+async def index_urls(index: ResearchIndex, urls: list, cache: HTTPCache, research_config: dict):
+    """
+    Fetch URLs concurrently and index each page as soon as it arrives.
+
+    Pages answered with a 304 are skipped if the index already holds them.
+    Indexing runs off the event loop, so fetches keep starting while a page
+    is being chunked and embedded.
+
+    :param index: Research index to update
+    :type index: ResearchIndex
+    :param urls: URLs to fetch
+    :type urls: list
+    :param cache: HTTP cache used for conditional requests
+    :type cache: HTTPCache
+    :param research_config: Research parameters with optional connection limits
+    :type research_config: dict
+    """
+    loop = asyncio.get_running_loop()
+    results = fetch_all(
+        urls,
+        cache,
+        max_per_host=research_config.get("max_connections_per_host", 2),
+        max_connections=research_config.get("max_connections", 8)
+    )
+    async for result in results:
+        if result.status == FAILED:
+            console.print(f"[bold red]Failed to load {result.url}:[/bold red] {result.error}")
+            continue
+        if result.status == NOT_MODIFIED and result.url in index.manifest:
+            console.print(f"Not modified: {result.url}")
+            continue
+        text = extract_text(result.content, result.content_type)
+        added = await loop.run_in_executor(None, index.update_source, result.url, text)
+        report_indexed(result.url, added)
+
+def report_indexed(source: str, added: int):
+    """
+    Print the outcome of indexing one source.
+
+    :param source: URL or path of the source
+    :type source: str
+    :param added: Number of chunks added
+    :type added: int
+    """
+    if added:
+        console.print(f"Indexed: {source} ({added} chunks)")
+    else:
+        console.print(f"Unchanged: {source}")
+
+def is_url(source: str) -> bool:
+    """
+    Tell whether a source is a URL rather than a local file.
+
+    :param source: URL or path of the source
+    :type source: str
+    :rtype: bool
+    """
+    return source.startswith(("http://", "https://"))
+
+def load_file(source: str) -> str:
+    """
+    Load the text of a local file source.
+
+    :param source: Local file path
+    :type source: str
+    :return: Extracted text of the file
+    :rtype: str
+    """
+    path = Path(source)
+    content_type = "text/html" if path.suffix in (".html", ".htm") else "text/plain"
+    return extract_text(path.read_text(), content_type)
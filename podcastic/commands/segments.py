@@ -0,0 +1,88 @@
+"""
+Module for managing the segment pack of an episode.
+
+This module implements the 'segments' command, which moves an episode's audio
+segments between the two layouts 'generate' can write: one MP3 file per segment,
+or a single segment pack (see podcastic.utils.segment_store). It packs existing
+loose files, exports a pack back to loose files, and compacts a pack that holds
+many replaced segments.
+"""
+
+import logging
+from pathlib import Path
+import typer
+from rich.console import Console
+from podcastic.utils.audio_utils import load_segment_texts, save_segment_texts
+from podcastic.utils.segment_store import INDEX_FILE, PACK_FILE, SegmentPack
+
+app = typer.Typer()
+console = Console()
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("pack", "export", "compact")
+
+@app.command()
+def run(
+    action: str = typer.Argument(..., help=f"What to do with the episode's segments ({', '.join(ACTIONS)})"),
+    input: Path = typer.Option(..., "--input", help="Path to the input SSML file"),
+    output: Path = typer.Option(None, "--output", help="Directory to export to (default: the episode's directory)"),
+    keep: bool = typer.Option(False, "--keep", help="Keep the loose files after packing, or the pack after exporting")
+):
+    """
+    Pack, export or compact the audio segments of an episode.
+
+    'pack' moves the episode's MP3 segments into a segment pack, 'export' writes
+    the segments of a pack back out as MP3 files, and 'compact' drops replaced
+    segments from a pack.
+    """
+    if action not in ACTIONS:
+        console.print(f"[bold red]Error:[/bold red] Unknown action '{action}', expected one of: {', '.join(ACTIONS)}")
+        raise typer.Exit(code=1)
+
+    input_file = Path(input).resolve()
+    output_dir = Path.cwd() / "generated" / input_file.stem
+    full_podcast_path = output_dir / f"{input_file.stem}_full_podcast.mp3"
+
+    if action == "pack":
+        paths = sorted(path for path in output_dir.glob("*.mp3") if path != full_podcast_path)
+        if not paths:
+            console.print(f"[bold red]Error:[/bold red] No audio files found in {output_dir}")
+            raise typer.Exit(code=1)
+        texts = load_segment_texts(output_dir)
+        pack = SegmentPack(output_dir)
+        for path in paths:
+            metadata = {"text": texts[path.name]} if path.name in texts else {}
+            pack.put(path.name, path.read_bytes(), **metadata)
+        pack.close()
+        if not keep:
+            for path in paths:
+                path.unlink()
+        console.print(f"[bold green]Packed {len(paths)} segments into:[/bold green] {pack.pack_path}")
+        return
+
+    if not SegmentPack.exists(output_dir):
+        console.print(f"[bold red]Error:[/bold red] No segment pack found in {output_dir}")
+        raise typer.Exit(code=1)
+    pack = SegmentPack(output_dir)
+
+    if action == "compact":
+        reclaimed = pack.compact()
+        pack.close()
+        console.print(f"[bold green]Compacted {pack.pack_path}:[/bold green] reclaimed {reclaimed} bytes")
+        return
+
+    destination = Path(output).resolve() if output else output_dir
+    paths = pack.export(destination)
+    save_segment_texts(destination, {
+        segment.name: segment.entry["text"] for segment in pack.segments() if "text" in segment.entry
+    })
+    pack.close()
+    if destination == output_dir and not keep:
+        # Otherwise 'compile' would keep reading the pack instead of the exported files
+        (output_dir / PACK_FILE).unlink()
+        (output_dir / INDEX_FILE).unlink()
+    console.print(f"[bold green]Exported {len(paths)} segments to:[/bold green] {destination}")
+
+if __name__ == "__main__":
+    app()
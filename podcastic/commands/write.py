@@ -16,25 +16,45 @@ from langchain_core.runnables import RunnableSequence
 import re
 import logging
 import random
-import difflib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from podcastic.commands.research import load_research_config
+from podcastic.utils.embeddings import get_embedder
+from podcastic.utils.estimates import (
+    DEFAULT_OUTLINE_LATENCY, DEFAULT_OUTLINE_TOKENS, DEFAULT_UTTERANCE_LATENCY, DEFAULT_UTTERANCE_TOKENS,
+    format_cost, format_duration, llm_cost, load_history, mean_latency, script_tokens
+)
+from podcastic.utils.logging_config import get_trace_logger
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.profiling import span
+from podcastic.utils.research_index import ResearchIndex
+from podcastic.utils.retrieval import ContextRetriever
+from podcastic.utils.similarity import SIMILARITY_THRESHOLD, SimilarityIndex
+from podcastic.utils.tokens import count_tokens
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-
-# Add a StreamHandler to output logs to the console
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
-logger.addHandler(console_handler)
+# Prompts, outlines and scripts, kept out of the main log (see --trace-file)
+trace = get_trace_logger(__name__)
 
 app = typer.Typer()
 console = Console()
 
+# Concurrent requests sent when every candidate repeats the conversation
+FALLBACK_REQUESTS = 3
+UTTERANCES_PER_SECTION = 4
+# Outline length assumed by --dry-run before any outline has been generated
+DEFAULT_SECTIONS = 5
+# Section text and per-turn instructions in each utterance prompt
+PER_TURN_PROMPT_TOKENS = 120
+
 @app.command()
 def run(
     topic: Path = typer.Option(..., help="Path to the topic markdown file"),
-    output: Path = typer.Option("output.ssml", help="Path to save the podcast script")
+    output: Path = typer.Option("output.ssml", help="Path to save the podcast script"),
+    research: Path = typer.Option(None, help="Research YAML file whose index provides the topic context"),
+    context_tokens: int = typer.Option(None, "--context-tokens", help="Token budget for the topic context sent with each utterance"),
+    candidates: int = typer.Option(None, "--candidates", help="Candidate utterances to request per call; the least repetitive is kept"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Estimate tokens, cost and duration without calling any API")
 ):
     """
     Main function for the 'write' command.
@@ -51,49 +71,116 @@ def run(
     5. Adding appropriate pauses between utterances
     6. Saving the final script in SSML format
 
+    Rather than the whole topic file, each utterance prompt receives only the
+    passages most relevant to the current section, retrieved from an index of
+    the topic file (or of a research index) within a token budget.
+
     This function is the core of the script generation process and ties together
     various helper functions to create a coherent podcast script.
     """
-    logger.debug(f"Starting script generation for topic: {topic}")
+    if dry_run:
+        estimate_script(topic, research, context_tokens, candidates)
+        return
+
+    config, retriever, sections = plan_script(topic, research, context_tokens)
+    try:
+        if candidates:
+            config['utterance_candidates'] = candidates
+        if len(sections) == 0:
+            logger.error("No sections found in the outline. Script generation cannot proceed.")
+            return
+
+        script = ""
+        for fragment in iter_script(sections, config, retriever):
+            script += fragment + "\n\n"
+            logger.debug("Current script length: %s characters", len(script))
+
+        if not script:
+            logger.error("No script content generated.")
+        else:
+            logger.debug("Saving script to %s", output)
+            output.write_text(script)
+            logger.debug("Script generation complete")
+            trace.debug("Final script:\n%s", script)
+
+        console.print("\n[bold]Generated Script:[/bold]")
+        console.print(script)
+        logger.debug("Script output to console complete")
+
+        report_write_metrics(retriever, output)
+    finally:
+        retriever.close()
+
+def load_config() -> dict:
+    """
+    Load the configuration file.
+
+    :rtype: dict
+    """
+    with open('config.yaml', 'r') as config_file:
+        return yaml.safe_load(config_file)
+
+def plan_script(topic: Path, research: Path = None, context_tokens: int = None) -> tuple:
+    """
+    Load the topic and configuration and generate the outline for a script.
+
+    :return: The configuration, the context retriever and the outline sections
+    :rtype: tuple
+    """
+    logger.debug("Starting script generation for topic: %s", topic)
     topic_content = topic.read_text()
     logger.debug("Topic content loaded")
-    logger.debug(f"Topic content:\n{topic_content}")
+    trace.debug("Topic content:\n%s", topic_content)
 
-    with open('config.yaml', 'r') as config_file:
-        config = yaml.safe_load(config_file)
+    config = load_config()
     logger.debug("Configuration loaded")
-    logger.debug(f"Configuration:\n{config}")
+    trace.debug("Configuration:\n%s", config)
 
     editorial_guidelines = config.get('editorial_guidelines', '')
     editorial_outline_model = config.get('editorial_outline_model', 'gpt-4o-mini')
 
+    retriever = build_context_retriever(topic_content, config, research, context_tokens)
+
     logger.debug("Generating outline")
     outline = generate_outline(topic_content, editorial_guidelines, editorial_outline_model)
     console.print("[bold]Generated Podcast Outline:[/bold]")
     console.print(outline)
 
     sections = split_outline_into_sections(outline)
-    logger.debug(f"Number of sections: {len(sections)}")
+    run_metrics.increment("write.outlines")
+    run_metrics.increment("write.sections", len(sections))
+    logger.debug("Number of sections: %s", len(sections))
     for i, section in enumerate(sections, 1):
-        logger.debug(f"Section {i}:\n{section}")
+        trace.debug("Section %s:\n%s", i, section)
 
-    if len(sections) == 0:
-        logger.error("No sections found in the outline. Script generation cannot proceed.")
-        return
+    return config, retriever, sections
+
+def iter_script(sections: list, config: dict, retriever: ContextRetriever, utterance_fn=None):
+    """
+    Generate the script one SSML fragment at a time.
 
+    Utterances alternate between Ava and Marvin, and every utterance except the
+    last is followed by a pause. Each fragment is final once it is yielded, so
+    callers can save or synthesize it while later utterances are still being
+    written.
+
+    :param utterance_fn: Function with the signature of generate_utterance that
+        produces each utterance; defaults to generate_utterance
+    :return: Iterator of SSML fragments (``<speak>`` and ``<break>`` tags)
+    """
+    utterance_fn = utterance_fn or generate_utterance
     total_utterances = len(sections) * 2  # Two utterances per section
-    logger.debug(f"Total expected utterances: {total_utterances}")
+    logger.debug("Total expected utterances: %s", total_utterances)
 
-    script = ""
     global_conversation_history = ""
     name_usage_count = {"ava": 0, "marvin": 0}
     utterance_count = {"ava": 0, "marvin": 0}
 
     for i, section in enumerate(sections, 1):
-        logger.debug(f"Processing section {i}/{len(sections)}")
-        logger.debug(f"Section content:\n{section}")
+        logger.debug("Processing section %s/%s", i, len(sections))
+        trace.debug("Section content:\n%s", section)
 
-        utterances_per_section = 4  # Adjust this value as needed
+        utterances_per_section = UTTERANCES_PER_SECTION
         for utterance_index in range(utterances_per_section):
             speaker = 'ava' if utterance_index % 2 == 0 else 'marvin'
             other_speaker = 'marvin' if speaker == 'ava' else 'ava'
@@ -101,8 +188,8 @@ def run(
             is_last_section = i == len(sections)
             is_last_utterance = is_last_section and utterance_index == utterances_per_section - 1
 
-            logger.debug(f"Generating utterance for {speaker}")
-            utterance = generate_utterance(
+            logger.debug("Generating utterance for %s", speaker)
+            utterance = utterance_fn(
                 speaker, 
                 other_speaker, 
                 global_conversation_history,
@@ -112,41 +199,165 @@ def run(
                 utterance_count,
                 total_utterances,
                 is_last_utterance,
-                topic_content,
-                retry_count=0
+                retriever.context_for(section)
             )
-            logger.debug(f"Generated utterance for {speaker}: {utterance}")
+            logger.debug("Generated utterance for %s: %s", speaker, utterance)
 
             # Update global conversation history
             global_conversation_history += f"{speaker.capitalize()}: {utterance}\n\n"
 
-            # Append utterance in SSML format
-            script += f'<speak voice="{speaker.capitalize()}">{utterance}</speak>\n\n'
-            logger.debug(f"Current script length: {len(script)} characters")
+            # Emit utterance in SSML format
+            yield f'<speak voice="{speaker.capitalize()}">{utterance}</speak>'
 
             # Generate pause if it's not the last utterance
             if not is_last_utterance:
                 next_speaker = 'marvin' if speaker == 'ava' else 'ava'
                 next_section = section if utterance_index < utterances_per_section - 1 else (sections[i] if i < len(sections) else "")
                 pause = generate_pause(utterance, next_speaker, next_section)
-                script += pause + "\n\n"
-                logger.debug(f"Added pause: {pause}")
+                logger.debug("Added pause: %s", pause)
+                yield pause
 
             utterance_count[speaker.lower()] += 1
-            logger.debug(f"Current utterance count: {utterance_count}")
+            logger.debug("Current utterance count: %s", utterance_count)
+
+def report_write_metrics(retriever: ContextRetriever, output: Path):
+    """
+    Report the token savings of a script run and save its metrics.
+
+    Metrics are saved to ``generated/<output_name>/write_metrics.json``.
+    """
+    run_metrics.increment("write.prompt_tokens_saved", retriever.tokens_saved)
+    console.print(
+        f"Prompt tokens saved by context retrieval: {retriever.tokens_saved} "
+        f"over {retriever.lookups} utterances"
+    )
+    snapshot = run_metrics.snapshot()["counters"]
+    if snapshot.get("write.prompt_tokens"):
+        console.print(
+            f"Prompt tokens served from cache: {snapshot.get('write.cached_prompt_tokens', 0)} "
+            f"of {snapshot['write.prompt_tokens']}"
+        )
+    if snapshot.get("write.retries"):
+        retry_seconds = run_metrics.snapshot()["timings"]["write.retry_seconds"]["total"]
+        console.print(
+            f"Repetition fallbacks: {snapshot['write.retries']} requests "
+            f"for {snapshot.get('write.similarity_rejections', 0)} rejected candidates, "
+            f"{retry_seconds:.1f}s lost to retries"
+        )
+    metrics_dir = Path.cwd() / "generated" / output.stem
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    run_metrics.save(metrics_dir / "write_metrics.json")
+
+def context_tokens_per_prompt(
+    topic_content: str,
+    config: dict,
+    research: Path = None,
+    context_tokens: int = None
+) -> int:
+    """
+    Estimate the topic context tokens each utterance prompt will carry.
+
+    Mirrors build_context_retriever without building any index.
+
+    :rtype: int
+    """
+    retrieval_config = config.get('retrieval') or {}
+    token_budget = context_tokens or retrieval_config.get('token_budget', 1500)
+    full_tokens = count_tokens(topic_content, config.get('utterance_generation_model', 'gpt-4o-mini'))
+    if research:
+        return token_budget
+    if not retrieval_config.get('enabled', False) and context_tokens is None:
+        return full_tokens
+    return min(full_tokens, token_budget)
+
+def estimate_script(topic: Path, research: Path = None, context_tokens: int = None, candidates: int = None):
+    """
+    Print the expected size, token usage, cost and duration of writing a script.
 
-    if not script:
-        logger.error("No script content generated.")
+    No API is called. The number of sections, the length of an utterance and the
+    model latencies are taken from the metrics of previous runs when available.
+    """
+    topic_content = topic.read_text()
+    config = load_config()
+    model = config.get('utterance_generation_model', 'gpt-4o-mini')
+    outline_model = config.get('editorial_outline_model', 'gpt-4o-mini')
+    candidates = candidates or config.get('utterance_candidates', 1)
+    guidelines = config.get('editorial_guidelines', '')
+
+    history = load_history(Path.cwd() / "generated")
+    counters = history["counters"]
+    if counters.get("write.outlines"):
+        sections = max(1, round(counters["write.sections"] / counters["write.outlines"]))
+    else:
+        sections = DEFAULT_SECTIONS
+    if counters.get("write.completion_tokens") and counters.get("write.candidates"):
+        utterance_tokens = round(counters["write.completion_tokens"] / counters["write.candidates"])
     else:
-        logger.debug(f"Saving script to {output}")
-        output.write_text(script)
-        logger.debug("Script generation complete")
-        logger.debug(f"Final script:\n{script}")
+        utterance_tokens = DEFAULT_UTTERANCE_TOKENS
+    utterances = sections * UTTERANCES_PER_SECTION
+
+    context = context_tokens_per_prompt(topic_content, config, research, context_tokens)
+    persona = max(count_tokens(AVA_SYSTEM_PROMPT, model), count_tokens(MARVIN_SYSTEM_PROMPT, model))
+    fixed = persona + count_tokens(guidelines, model) + count_tokens(UTTERANCE_INSTRUCTIONS, model) \
+        + context + PER_TURN_PROMPT_TOKENS
+    prompt_tokens, completion_tokens = script_tokens(utterances, fixed, utterance_tokens, candidates)
+    outline_prompt = count_tokens(topic_content, outline_model) + count_tokens(guidelines, outline_model) \
+        + PER_TURN_PROMPT_TOKENS
+
+    cost = llm_cost(config, model, prompt_tokens, completion_tokens)
+    outline_cost = llm_cost(config, outline_model, outline_prompt, DEFAULT_OUTLINE_TOKENS)
+    total_cost = None if cost is None or outline_cost is None else cost + outline_cost
+
+    outline_latency, _ = mean_latency(history, "write.outline_latency", DEFAULT_OUTLINE_LATENCY)
+    utterance_latency, measured = mean_latency(history, "write.utterance_latency", DEFAULT_UTTERANCE_LATENCY)
+    basis = f"latencies measured over {history['runs']} previous runs" if measured else "typical latencies, no previous runs"
+
+    console.print(f"[bold]Dry run:[/bold] writing {topic.name} (no API calls made)")
+    console.print(f"Sections: {sections}" + ("" if counters.get("write.outlines") else " (assumed until an outline exists)"))
+    console.print(f"Utterances: {utterances}, {candidates} candidate(s) each, ~{utterance_tokens} tokens per candidate")
+    console.print(f"Topic context per prompt: {context} tokens")
+    console.print(f"Prompt tokens: {prompt_tokens + outline_prompt} "
+                  f"(the last prompt carries {fixed + (utterance_tokens + 4) * (utterances - 1)} as the history grows)")
+    console.print(f"Completion tokens: {completion_tokens + DEFAULT_OUTLINE_TOKENS}")
+    console.print(f"Estimated cost: {format_cost(total_cost)} before prompt caching discounts")
+    console.print(
+        f"Estimated duration: {format_duration(outline_latency + utterances * utterance_latency)} "
+        f"(utterances are written one after another; {basis})"
+    )
 
-    console.print("\n[bold]Generated Script:[/bold]")
-    console.print(script)
-    logger.debug("Script output to console complete")
+def build_context_retriever(
+    topic_content: str,
+    config: dict,
+    research: Path = None,
+    context_tokens: int = None
+) -> ContextRetriever:
+    """
+    Build the retriever that supplies topic context to each utterance prompt.
 
+    With a research file, passages come from that research index. Otherwise the
+    topic file itself is indexed for this run, unless retrieval is disabled in the
+    configuration, in which case the whole topic is sent as before.
+    """
+    retrieval_config = config.get('retrieval') or {}
+    top_k = retrieval_config.get('top_k', 4)
+    token_budget = context_tokens or retrieval_config.get('token_budget', 1500)
+    model = config.get('utterance_generation_model', 'gpt-4o-mini')
+
+    if research:
+        research = Path(research).resolve()
+        research_config = load_research_config(research)
+        embedder = get_embedder(research_config.get('embedder', 'openai'))
+        index = ResearchIndex(Path.cwd() / "research" / research.stem, embedder)
+        logger.debug("Using research index for context: %s", index.path)
+        return ContextRetriever(index, topic_content, top_k=top_k, token_budget=token_budget, model=model)
+
+    if not retrieval_config.get('enabled', False) and context_tokens is None:
+        return ContextRetriever(None, topic_content, model=model)
+
+    embedder = get_embedder(retrieval_config.get('embedder', 'hashing'))
+    return ContextRetriever.from_topic(topic_content, embedder, top_k=top_k, token_budget=token_budget, model=model)
+
+@span("generate_outline")
 def generate_outline(
     topic_content: str,
     editorial_guidelines: str,
@@ -190,13 +401,15 @@ def generate_outline(
         prompt_template | chat_model
     )
 
-    result = outline_chain.invoke({
-        "topic_content": topic_content,
-        "editorial_guidelines": editorial_guidelines
-    })
+    with run_metrics.timer("write.outline_latency"):
+        result = outline_chain.invoke({
+            "topic_content": topic_content,
+            "editorial_guidelines": editorial_guidelines
+        })
 
     return result.content
 
+@span("generate_utterance")
 def generate_utterance(
     speaker: str, 
     other_speaker: str, 
@@ -207,8 +420,7 @@ def generate_utterance(
     utterance_count: dict,
     total_utterances: int,
     is_final_utterance: bool,
-    topic_content: str,
-    retry_count: int = 0
+    topic_content: str
 ) -> str:
     """
     Generate a single utterance for a given speaker.
@@ -225,20 +437,104 @@ def generate_utterance(
 
     It's a critical part of the script generation process, essentially simulating
     a dynamic conversation between two AI entities.
+
+    With ``utterance_candidates`` above 1 in the config, several candidates are
+    sampled in one request and the one least similar to the conversation so far
+    is kept. If every candidate repeats the conversation, fallback requests are
+    sent concurrently rather than one after another.
     """
-    logger.debug(f"Generating utterance for {speaker}")
+    logger.debug("Generating utterance for %s", speaker)
     from langchain_openai import ChatOpenAI
-    from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
     from langchain_community.callbacks.manager import get_openai_callback
 
-    editorial_guidelines = config.get('editorial_guidelines', '')
     utterance_generation_model = config.get('utterance_generation_model', 'gpt-4o-mini')
 
-    logger.debug(f"Using model: {utterance_generation_model}")
+    logger.debug("Using model: %s", utterance_generation_model)
 
-    system_prompt = AVA_SYSTEM_PROMPT if speaker.lower() == 'ava' else MARVIN_SYSTEM_PROMPT
+    candidates = config.get('utterance_candidates', 1)
+    candidate_temperature = config.get('candidate_temperature', 0.7)
+
+    # A single candidate keeps the deterministic behavior; several candidates
+    # need sampling, or they would all be the same text
+    chat_model = ChatOpenAI(
+        model=utterance_generation_model,
+        temperature=0 if candidates == 1 else candidate_temperature,
+        n=candidates
+    )
+
+    formatted_prompt = build_utterance_prompt(
+        speaker, other_speaker, full_conversation_history, section, config,
+        utterance_count, is_final_utterance, topic_content
+    )
+
+    logger.debug("Invoking ChatOpenAI for %s", speaker)
+    with get_openai_callback() as cb, run_metrics.timer("write.utterance_latency"):
+        options = request_candidates(chat_model, formatted_prompt)
+        logger.debug("Received %s candidates for %s", len(options), speaker)
+        logger.debug("OpenAI API usage: %s", cb)
+    run_metrics.increment("write.candidates", len(options))
+
+    similarity = SimilarityIndex(full_conversation_history.split('\n'))
+    utterance, score = similarity.best(options)
+
+    # Check for repetition
+    if score > SIMILARITY_THRESHOLD:
+        logger.warning("All %s candidates repeat the conversation. Requesting fallbacks concurrently.", len(options))
+        run_metrics.increment("write.similarity_rejections", len(options))
+        retry_started = time.perf_counter()
+        sampler = ChatOpenAI(model=utterance_generation_model, temperature=candidate_temperature, n=candidates)
+        with ThreadPoolExecutor(max_workers=FALLBACK_REQUESTS) as executor:
+            fallbacks = executor.map(lambda _: request_candidates(sampler, formatted_prompt), range(FALLBACK_REQUESTS))
+            options = [option for batch in fallbacks for option in batch]
+        run_metrics.increment("write.retries", FALLBACK_REQUESTS)
+        run_metrics.observe("write.retry_seconds", time.perf_counter() - retry_started)
+        run_metrics.increment("write.candidates", len(options))
+
+        utterance, score = similarity.best(options)
+        if score > SIMILARITY_THRESHOLD:
+            run_metrics.increment("write.similarity_rejections", len(options))
+            logger.warning("Fallbacks repeat the conversation too. Generating a transition to the next topic.")
+            utterance = generate_transition(speaker, section)
+
+    logger.debug("Generated utterance: %s", utterance)
+
+    # Log reasoning trace
+    logger.debug("Reasoning trace for %s:", speaker)
+    trace.debug("Input context: %s", section)
+    logger.debug("Is final utterance: %s", is_final_utterance)
+    logger.debug("Current utterance count: %s", utterance_count)
+    logger.debug("Total utterances: %s", total_utterances)
+
+    # Update name usage count and utterance count
+    if other_speaker.lower() in utterance.lower():
+        name_usage_count[other_speaker.lower()] += 1
+    utterance_count[speaker.lower()] += 1
+
+    logger.debug("Updated name usage count: %s", name_usage_count)
+    logger.debug("Updated utterance count: %s", utterance_count)
+
+    return utterance
+
+def build_utterance_prompt(
+    speaker: str,
+    other_speaker: str,
+    full_conversation_history: str,
+    section: str,
+    config: dict,
+    utterance_count: dict,
+    is_final_utterance: bool,
+    topic_content: str
+) -> list:
+    """
+    Build the chat messages that ask a speaker for their next utterance.
+
+    :return: System and human messages, ready to send to the chat model
+    :rtype: list
+    """
+    from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 
-    chat_model = ChatOpenAI(model=utterance_generation_model, temperature=0)
+    editorial_guidelines = config.get('editorial_guidelines', '')
+    system_prompt = AVA_SYSTEM_PROMPT if speaker.lower() == 'ava' else MARVIN_SYSTEM_PROMPT
 
     should_use_name = (
         (speaker.lower() == 'ava' and utterance_count['ava'] == 1) or
@@ -255,7 +551,7 @@ def generate_utterance(
     else:
         name_usage_instruction = f"IMPORTANT: Do not use {other_speaker}'s name in your response."
 
-    logger.debug(f"Name usage instruction: {name_usage_instruction}")
+    logger.debug("Name usage instruction: %s", name_usage_instruction)
 
     if speaker.lower() == 'ava' and utterance_count['ava'] > 1 and not is_final_utterance:
         extended_response_instruction = (
@@ -268,86 +564,97 @@ def generate_utterance(
             "Keep your response brief, ideally one or two sentences at most."
         )
 
+    # Everything that stays the same from one call to the next comes first, so the
+    # provider can serve it from its prompt cache. The conversation history only
+    # ever grows at the end of that prefix. The topic context is retrieved per
+    # section, so it goes after the history, together with the per-turn instructions.
     prompt = ChatPromptTemplate.from_messages([
-        SystemMessagePromptTemplate.from_template(system_prompt),
+        SystemMessagePromptTemplate.from_template(
+            "{system_prompt}\n"
+            "Editorial Guidelines:\n{editorial_guidelines}\n\n"
+            "{utterance_instructions}"
+        ),
         HumanMessagePromptTemplate.from_template(
-            "Overall Podcast Topic:\n{topic_content}\n\n"
             "Full Conversation History:\n{full_conversation_history}\n\n"
+            "Podcast Topic Context:\n{topic_content}\n\n"
             "Current Podcast Section:\n{section}\n\n"
-            "Editorial Guidelines:\n{editorial_guidelines}\n\n"
-            "{name_usage_instruction}\n\n"
-            "{speaker}, please provide your next response.\n"
-            "Ensure your response maintains continuity with the recent conversation and relates to the overall podcast topic.\n"
-            "Do not include your name at the beginning of your response.\n"
-            "Provide your response as plain text without any markdown or formatting.\n"
-            "{extended_response_instruction}\n"
-            "Advance the conversation with new information or a unique perspective related to the current section.\n"
-            "If you're Marvin, ask a question that hasn't been asked before or provide a unique insight.\n"
-            "If you're Ava, provide a concise explanation or introduce a new aspect of the topic that hasn't been discussed.\n"
-            "Be creative and try to approach the topic from a different angle than what has been discussed so far.\n"
-            "If you're struggling to add new information, try to summarize or conclude the current subtopic and transition to the next one."
+            "{name_usage_instruction}\n"
+            "{extended_response_instruction}\n\n"
+            "{speaker}, please provide your next response."
         )
     ])
 
     formatted_prompt = prompt.format_prompt(
-        topic_content=topic_content,  # Add this line
+        system_prompt=system_prompt,
+        editorial_guidelines=editorial_guidelines,
+        utterance_instructions=UTTERANCE_INSTRUCTIONS,
+        topic_content=topic_content,
         full_conversation_history=full_conversation_history,
         section=section,
-        editorial_guidelines=editorial_guidelines,
         name_usage_instruction=name_usage_instruction,
         extended_response_instruction=extended_response_instruction,
         speaker=speaker.capitalize(),
-        other_speaker=other_speaker.capitalize(),
     ).to_messages()
 
-    logger.debug(f"Formatted prompt for {speaker}:\n{formatted_prompt}")
-
-    logger.debug(f"Invoking ChatOpenAI for {speaker}")
-    with get_openai_callback() as cb:
-        response = chat_model.invoke(formatted_prompt)
-        logger.debug(f"Received response for {speaker}")
-        logger.debug(f"OpenAI API usage: {cb}")
+    trace.debug("Formatted prompt for %s:\n%s", speaker, formatted_prompt)
+    return formatted_prompt
 
-    utterance = response.content.strip()
-    logger.debug(f"Generated utterance: {utterance}")
+def request_candidates(chat_model, prompt: list) -> list:
+    """
+    Request one or more candidate utterances in a single call.
+
+    :param chat_model: Chat model configured with the number of candidates (``n``)
+    :type chat_model: ChatOpenAI
+    :param prompt: Messages to send
+    :type prompt: list
+    :return: The candidate utterances
+    :rtype: list
+    """
+    if (getattr(chat_model, "n", None) or 1) > 1:
+        result = chat_model.generate([prompt])
+        messages = [generation.message for generation in result.generations[0]]
+    else:
+        messages = [chat_model.invoke(prompt)]
 
-    # Log reasoning trace
-    logger.debug(f"Reasoning trace for {speaker}:")
-    logger.debug(f"Input context: {section}")
-    logger.debug(f"Name usage instruction: {name_usage_instruction}")
-    logger.debug(f"Is final utterance: {is_final_utterance}")
-    logger.debug(f"Current utterance count: {utterance_count}")
-    logger.debug(f"Total utterances: {total_utterances}")
+    # Every candidate shares the prompt, so its usage is only counted once
+    prompt_tokens, cached_tokens = prompt_token_usage(messages[0])
+    run_metrics.increment("write.prompt_tokens", prompt_tokens)
+    run_metrics.increment("write.cached_prompt_tokens", cached_tokens)
+    run_metrics.increment("write.completion_tokens", completion_token_usage(messages[0]))
+    logger.debug("Prompt tokens: %s, served from cache: %s", prompt_tokens, cached_tokens)
+    return [message.content.strip() for message in messages]
 
-    # Update name usage count and utterance count
-    if other_speaker.lower() in utterance.lower():
-        name_usage_count[other_speaker.lower()] += 1
-    utterance_count[speaker.lower()] += 1
+def prompt_token_usage(response) -> tuple:
+    """
+    Extract the prompt token count and the cached part of it from a model response.
 
-    logger.debug(f"Updated name usage count: {name_usage_count}")
-    logger.debug(f"Updated utterance count: {utterance_count}")
+    :return: Total prompt tokens and prompt tokens served from the provider's cache
+    :rtype: tuple
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return usage.get("input_tokens", 0), details.get("cache_read", 0) or 0
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return token_usage.get("prompt_tokens", 0), details.get("cached_tokens", 0) or 0
+
+def completion_token_usage(response) -> int:
+    """
+    Extract the completion token count from a model response.
 
-    # Check for repetition
-    if is_too_similar(utterance, full_conversation_history):
-        logger.warning("Detected similarity. Attempting to regenerate utterance.")
-        if retry_count < 3:  # Limit the number of retries
-            return generate_utterance(
-                speaker, other_speaker, full_conversation_history, section, config,
-                name_usage_count, utterance_count, total_utterances, is_final_utterance, topic_content,
-                retry_count + 1
-            )
-        else:
-            logger.warning("Max retries reached. Generating a transition to the next topic.")
-            return generate_transition(speaker, section)
+    With several candidates, this covers all of them.
 
-    return utterance
+    :rtype: int
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        return usage.get("output_tokens", 0)
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("completion_tokens", 0)
 
-def is_too_similar(new_utterance: str, conversation_history: str, threshold: float = 0.8) -> bool:
-    for utterance in conversation_history.split('\n'):
-        similarity = difflib.SequenceMatcher(None, new_utterance.lower(), utterance.lower()).ratio()
-        if similarity > threshold:
-            return True
-    return False
+def is_too_similar(new_utterance: str, conversation_history: str, threshold: float = SIMILARITY_THRESHOLD) -> bool:
+    return SimilarityIndex(conversation_history.split('\n')).max_similarity(new_utterance) > threshold
 
 def generate_transition(speaker: str, section: str) -> str:
     transitions = [
@@ -368,7 +675,7 @@ def extract_next_subtopic(section: str) -> str:
 
 def split_outline_into_sections(outline: str) -> list:
     logger.debug("Splitting outline into sections")
-    logger.debug(f"Outline content:\n{outline}")
+    trace.debug("Outline content:\n%s", outline)
     
     # Split the outline into lines
     lines = outline.split('\n')
@@ -388,13 +695,13 @@ def split_outline_into_sections(outline: str) -> list:
     if current_section:
         sections.append(current_section.strip())
     
-    logger.debug(f"Found {len(sections)} sections")
+    logger.debug("Found %s sections", len(sections))
     
     if len(sections) == 0:
         logger.warning("No sections found in the outline.")
     else:
         for i, section in enumerate(sections, 1):
-            logger.debug(f"Section {i}:\n{section}\n")
+            trace.debug("Section %s:\n%s\n", i, section)
     
     return sections
 
@@ -418,14 +725,27 @@ You are Marvin, a business user who is not tech-savvy.
 - Ask short, focused questions to encourage Ava to explain further.
 """
 
+# Fixed instructions shared by every utterance prompt. Keep per-turn details out of
+# this text so the prompt prefix stays byte-identical between calls.
+UTTERANCE_INSTRUCTIONS = """
+Ensure your response maintains continuity with the recent conversation and relates to the overall podcast topic.
+Do not include your name at the beginning of your response.
+Provide your response as plain text without any markdown or formatting.
+Advance the conversation with new information or a unique perspective related to the current section.
+If you're Marvin, ask a question that hasn't been asked before or provide a unique insight.
+If you're Ava, provide a concise explanation or introduce a new aspect of the topic that hasn't been discussed.
+Be creative and try to approach the topic from a different angle than what has been discussed so far.
+If you're struggling to add new information, try to summarize or conclude the current subtopic and transition to the next one.
+""".strip()
+
 def generate_pause(current_utterance, next_speaker, next_section):
     # Analyze the relationship between utterances
     engagement_level = analyze_engagement(current_utterance, next_speaker, next_section)
     topic_change = detect_topic_change(current_utterance, next_section)
     is_answering_question = is_question(current_utterance)
 
-    logger.debug(f"Generating pause for {next_speaker}")
-    logger.debug(f"Engagement level: {engagement_level}, Topic change: {topic_change}, Answering question: {is_answering_question}")
+    logger.debug("Generating pause for %s", next_speaker)
+    logger.debug("Engagement level: %s, Topic change: %s, Answering question: %s", engagement_level, topic_change, is_answering_question)
 
     if is_answering_question:
         return f'<break time="{random.uniform(0.3, 0.6):.1f}s"/>'
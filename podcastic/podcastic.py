@@ -7,15 +7,60 @@ various functionalities like script writing, audio generation, and compilation
 through a unified command-line interface.
 """
 
+from pathlib import Path
 import typer
-from podcastic.commands import generate, compile, research, write
+from rich.console import Console
+from podcastic.commands import generate, compile, live, produce, research, segments, write
+from podcastic.utils.logging_config import DEFAULT_LEVEL, configure_logging, stop_logging
+from podcastic.utils.profiling import PROFILERS, Profiler
 
 app = typer.Typer()
+console = Console()
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="Profile the command and write a flame graph and summary"),
+    profiler: str = typer.Option("sampling", help=f"Profiler to use with --profile ({' or '.join(PROFILERS)})"),
+    profile_dir: Path = typer.Option(Path("generated/profiles"), help="Directory for the profile files"),
+    profile_top: int = typer.Option(25, help="Number of entries in each section of the profile summary"),
+    log_level: str = typer.Option(DEFAULT_LEVEL, "--log-level", help="Level of the log written to the console (DEBUG, INFO, WARNING or ERROR)"),
+    log_file: Path = typer.Option(None, "--log-file", help="Also write the log to this file"),
+    trace_file: Path = typer.Option(None, "--trace-file", help="Write prompts, outlines and scripts to this file"),
+    trace_sample: float = typer.Option(1.0, "--trace-sample", help="Fraction of prompts and scripts to keep in the trace file")
+):
+    """
+    Podcastic: write, research, generate and compile podcasts.
+    """
+    try:
+        configure_logging(log_level, log_file, trace_file, trace_sample)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        raise typer.Exit(code=1)
+    ctx.call_on_close(stop_logging)
+
+    if not profile:
+        return
+    try:
+        command_profiler = Profiler(ctx.invoked_subcommand, profile_dir, method=profiler, top=profile_top)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {str(e)}")
+        raise typer.Exit(code=1)
+    command_profiler.start()
+
+    def report():
+        summary_path = command_profiler.stop()
+        console.print(f"[bold green]Profile written:[/bold green] {summary_path}")
+
+    ctx.call_on_close(report)
 
 app.command(name="generate")(generate.run)
 app.command(name="compile")(compile.run)
 app.command(name="research")(research.run)
 app.command(name="write")(write.run)
+app.command(name="produce")(produce.run)
+app.command(name="live")(live.run)
+app.command(name="segments")(segments.run)
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -0,0 +1,34 @@
+import logging
+import tempfile
+from pathlib import Path
+
+from podcastic.utils.logging_config import SampleFilter, configure_logging, get_trace_logger, stop_logging
+
+
+def test_trace_payloads_go_only_to_the_sampled_trace_file():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        logger = logging.getLogger("podcastic.commands.example")
+        trace = get_trace_logger("podcastic.commands.example")
+        try:
+            configure_logging("info", root / "main.log", root / "trace.log")
+            logger.debug("Hidden at INFO")
+            logger.info("Wrote %s utterances", 3)
+            trace.debug("Formatted prompt:\n%s", "A very long prompt")
+            stop_logging()
+
+            main_log = (root / "main.log").read_text()
+            assert "Wrote 3 utterances" in main_log
+            assert "Hidden at INFO" not in main_log and "A very long prompt" not in main_log
+            assert "A very long prompt" in (root / "trace.log").read_text()
+
+            # Without a trace file, trace records are dropped before being formatted
+            configure_logging("DEBUG")
+            assert not trace.isEnabledFor(logging.DEBUG)
+        finally:
+            stop_logging()
+            logging.getLogger().setLevel(logging.WARNING)
+
+    values = iter([0.1, 0.9, 0.2, 0.6])
+    sample = SampleFilter(0.5, rng=lambda: next(values))
+    assert [sample.filter(None) for _ in range(4)] == [True, False, True, False]
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import wave
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from podcastic.utils.audio_utils import stitch_audio_files
+from podcastic.utils.mp3 import silent_frames
+from podcastic.utils.pcm_cache import PCMCache, PCMFormat, ffmpeg_encode_mp3
+
+
+class FakeDecoder:
+    """Stands in for ffmpeg: writes one second of a constant sample per segment."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, jobs, fmt):
+        self.batches.append([source.name for source, _ in jobs])
+        for source, destination in jobs:
+            value = int(source.stem.split("_")[0])
+            with wave.open(str(destination), "wb") as out:
+                out.setnchannels(fmt.channels)
+                out.setsampwidth(fmt.sample_width)
+                out.setframerate(fmt.sample_rate)
+                out.writeframes(value.to_bytes(2, "little") * fmt.sample_rate * fmt.channels)
+
+
+def make_segments(directory, count):
+    paths = []
+    for i in range(count):
+        path = directory / f"{i + 1:03d}_Ava.mp3"
+        path.write_bytes(silent_frames(0.1 * (i + 1), 24000))
+        paths.append(path)
+    return paths
+
+
+def test_pcm_cache_decodes_in_batches_and_only_when_segments_change():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        segments = make_segments(root, 5)
+        decoder = FakeDecoder()
+        cache = PCMCache(root / ".pcm", decoder=decoder, batch_size=2)
+        fmt = cache.target_format(segments)
+        assert fmt == PCMFormat(24000, 1, 2)
+
+        assert cache.ensure(segments, fmt) == 5
+        assert sorted(len(batch) for batch in decoder.batches) == [1, 2, 2]
+
+        # A fresh cache instance reads the index from disk
+        cache = PCMCache(root / ".pcm", decoder=decoder)
+        assert cache.ensure(segments, fmt) == 0
+
+        # Touched but unchanged: the hash confirms the sidecar is still valid
+        os.utime(segments[0], ns=(0, 0))
+        assert cache.ensure(segments, fmt) == 0
+
+        segments[1].write_bytes(silent_frames(1.0, 24000))
+        assert cache.ensure(segments, fmt) == 1
+        assert decoder.batches[-1] == ["002_Ava.mp3"]
+
+
+def test_stitch_audio_files_streams_cached_pcm_to_one_encoder():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        first, second = make_segments(root, 2)
+        encoded = []
+
+        views = []
+
+        def fake_encoder(buffers, output_path, fmt):
+            chunks = []
+            for buffer in buffers:
+                # The sidecar of the previous segment is unmapped once the encoder moves on
+                for view in views:
+                    with pytest.raises(ValueError):
+                        bytes(view)
+                chunks.append(bytes(buffer))
+                if isinstance(buffer, memoryview):
+                    views.append(buffer)
+            encoded.append(b"".join(chunks))
+            Path(output_path).write_bytes(b"mp3")
+
+        cache = PCMCache(root / ".pcm", decoder=FakeDecoder())
+        audio_files = [("audio", first), ("pause", 0.5), ("audio", second)]
+        stitch_audio_files(audio_files, root / "episode_full_podcast.mp3", cache=cache, encoder=fake_encoder)
+
+        pcm = encoded[0]
+        assert len(pcm) == (24000 + 12000 + 24000) * 2
+        assert pcm[:2] == (1).to_bytes(2, "little")
+        assert pcm[24000 * 2:36000 * 2] == bytes(24000)
+        assert pcm[-2:] == (2).to_bytes(2, "little")
+
+
+def test_ffmpeg_encoder_that_exits_early_reports_its_error():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        converter = Path(temp_dir) / "ffmpeg"
+        converter.write_text("#!/bin/sh\necho 'Invalid sample format' >&2\nexit 1\n")
+        converter.chmod(0o755)
+        buffers = (bytes(1 << 20) for _ in range(16))
+        with patch("pydub.AudioSegment.converter", str(converter)):
+            with pytest.raises(RuntimeError, match="Invalid sample format"):
+                ffmpeg_encode_mp3(buffers, Path(temp_dir) / "out.mp3", PCMFormat(24000, 1, 2))
@@ -4,11 +4,14 @@ import logging
 from pathlib import Path  # Add this import
 from typer.testing import CliRunner
 from podcastic.podcastic import app
+from podcastic.utils.mp3 import silent_frames
 from unittest.mock import patch, MagicMock
 import io
+import pytest
 
 runner = CliRunner()
 
+
 @patch('podcastic.commands.generate.process_ssml')
 @patch('podcastic.commands.generate.compile_run')
 def test_generate_command(mock_compile_run, mock_process_ssml):
@@ -20,7 +23,9 @@ def test_generate_command(mock_compile_run, mock_process_ssml):
         temp_file_path = temp_file.name
 
     try:
-        result = runner.invoke(app, ["generate", "--input", temp_file_path, "--service", "openai"])
+        with tempfile.TemporaryDirectory() as temp_project_root, \
+                patch('pathlib.Path.cwd', return_value=Path(temp_project_root)):
+            result = runner.invoke(app, ["generate", "--input", temp_file_path, "--service", "openai"])
         print(f"Generate command output: {result.output}")
         print(f"Generate command exit code: {result.exit_code}")
         assert result.exit_code == 0
@@ -28,6 +33,7 @@ def test_generate_command(mock_compile_run, mock_process_ssml):
     finally:
         os.unlink(temp_file_path)
 
+
 @patch('podcastic.commands.compile.stitch_audio_files')
 def test_compile_command(mock_stitch_audio_files):
     mock_stitch_audio_files.return_value = "mocked_full_podcast.mp3"
@@ -46,8 +52,8 @@ def test_compile_command(mock_stitch_audio_files):
         generated_dir.mkdir(parents=True, exist_ok=True)
 
         # Create some mock audio files in the correct location
-        (generated_dir / "file1.mp3").touch()
-        (generated_dir / "file2.mp3").touch()
+        (generated_dir / "file1.mp3").write_bytes(silent_frames(0.5))
+        (generated_dir / "file2.mp3").write_bytes(silent_frames(0.5))
 
         # Create a temporary input file
         input_file = Path(temp_project_root) / f"{input_file_name}.ssml"
@@ -66,6 +72,7 @@ def test_compile_command(mock_stitch_audio_files):
         finally:
             logging.getLogger().removeHandler(handler)
 
+
 @patch('podcastic.commands.write.generate_outline')
 @patch('podcastic.commands.write.generate_utterance')
 def test_write_command(mock_generate_utterance, mock_generate_outline):
@@ -78,7 +85,9 @@ def test_write_command(mock_generate_utterance, mock_generate_outline):
 
     try:
         output_file = tempfile.NamedTemporaryFile(mode='w', suffix='.ssml', delete=False).name
-        result = runner.invoke(app, ["write", "--topic", temp_file_path, "--output", output_file])
+        with tempfile.TemporaryDirectory() as temp_project_root, \
+                patch('pathlib.Path.cwd', return_value=Path(temp_project_root)):
+            result = runner.invoke(app, ["write", "--topic", temp_file_path, "--output", output_file])
         print(f"Write command output: {result.output}")
         print(f"Write command exit code: {result.exit_code}")
         assert result.exit_code == 0
@@ -89,4 +98,497 @@ def test_write_command(mock_generate_utterance, mock_generate_outline):
     finally:
         os.unlink(temp_file_path)
         if os.path.exists(output_file):
-            os.unlink(output_file)
\ No newline at end of file
+            os.unlink(output_file)
+
+
+@patch('podcastic.commands.write.generate_outline')
+@patch('podcastic.commands.write.generate_utterance')
+def test_write_command_retrieves_section_context(mock_generate_utterance, mock_generate_outline):
+    mock_generate_outline.return_value = "1. Llama husbandry\n2. Volcano geology"
+    mock_generate_utterance.return_value = "This is a mocked utterance."
+
+    filler = " ".join(f"Unrelated filler sentence number {i} about nothing in particular." for i in range(300))
+    topic = (
+        f"{filler}\n\nLlama husbandry means feeding llamas hay and shearing llama wool every spring.\n\n"
+        f"{filler}\n\nVolcano geology studies magma chambers and volcano eruptions.\n\n{filler}"
+    )
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as temp_file:
+        temp_file.write(topic)
+        temp_file_path = temp_file.name
+
+    try:
+        output_file = tempfile.NamedTemporaryFile(mode='w', suffix='.ssml', delete=False).name
+        with tempfile.TemporaryDirectory() as temp_project_root, \
+                patch('pathlib.Path.cwd', return_value=Path(temp_project_root)):
+            result = runner.invoke(app, ["write", "--topic", temp_file_path, "--output", output_file,
+                                         "--context-tokens", "400"])
+        assert result.exit_code == 0
+        assert "Prompt tokens saved by context retrieval" in result.output
+
+        contexts = [call.args[9] for call in mock_generate_utterance.call_args_list]
+        assert all(len(context) < len(topic) / 4 for context in contexts)
+        assert "shearing llama wool" in contexts[0]
+        assert "magma chambers" in contexts[-1]
+    finally:
+        os.unlink(temp_file_path)
+        if os.path.exists(output_file):
+            os.unlink(output_file)
+
+
+def test_generate_utterance_keeps_a_stable_prompt_prefix():
+    from langchain_core.messages import AIMessage
+    from podcastic.commands import write
+    from podcastic.utils.metrics import run_metrics
+
+    captured = []
+
+    class FakeChatModel:
+        def __init__(self, **kwargs):
+            pass
+
+        def invoke(self, messages):
+            replies = ["Llamas hum when they are curious.", "Volcanoes vent magma through fissures.",
+                       "Quarterly budgets rarely survive contact with reality."]
+            captured.append(messages)
+            return AIMessage(
+                content=replies[len(captured) - 1],
+                usage_metadata={"input_tokens": 1200, "output_tokens": 20, "total_tokens": 1220,
+                                "input_token_details": {"cache_read": 1024}}
+            )
+
+    config = {"editorial_guidelines": "Keep it friendly.", "utterance_generation_model": "gpt-4o-mini"}
+    run_metrics.reset()
+    with patch('langchain_openai.ChatOpenAI', FakeChatModel):
+        history = ""
+        for section in ("1. Intro", "1. Intro", "2. Details"):
+            utterance = write.generate_utterance(
+                "ava", "marvin", history, section, config, {"ava": 0, "marvin": 0},
+                {"ava": 2, "marvin": 2}, 8, False, "The topic text."
+            )
+            history += f"Ava: {utterance}\n\n"
+
+    system_messages = [messages[0].content for messages in captured]
+    assert len(set(system_messages)) == 1
+    assert "Keep it friendly." in system_messages[0]
+    assert "The topic text." not in system_messages[0]
+    human_messages = [messages[1].content for messages in captured]
+    assert human_messages[1].startswith("Full Conversation History:\nAva: Llamas hum when they are curious.")
+    assert "Podcast Topic Context:\nThe topic text." in human_messages[1]
+    assert human_messages[2].rstrip().endswith("Ava, please provide your next response.")
+    counters = run_metrics.snapshot()["counters"]
+    assert counters["write.prompt_tokens"] == 3600
+    assert counters["write.cached_prompt_tokens"] == 3072
+
+
+def test_utterance_prompt_prefix_covers_the_history_across_sections():
+    import os.path
+    from podcastic.commands.write import build_utterance_prompt
+    from podcastic.utils.embeddings import HashingEmbedder
+    from podcastic.utils.retrieval import ContextRetriever
+
+    topic = " ".join(
+        f"Llamas carry packs across the Andes, fact {i}. Volcanoes vent magma through fissures, fact {i}."
+        for i in range(200)
+    )
+    retriever = ContextRetriever.from_topic(topic, HashingEmbedder(dim=64), top_k=2, token_budget=100,
+                                            max_words=20, overlap=0)
+    config = {"editorial_guidelines": "Keep it friendly."}
+    try:
+        assert retriever.index is not None
+        first_context = retriever.context_for("1. Llamas carry packs")
+        second_context = retriever.context_for("2. Volcanoes vent magma")
+        history = "Ava: Welcome to the show.\n\nMarvin: Glad to be here.\n\n"
+        first = build_utterance_prompt("ava", "marvin", history, "1. Llamas carry packs", config,
+                                       {"ava": 2, "marvin": 1}, False, first_context)
+        history += "Ava: Llamas are strong.\n\nMarvin: And stubborn.\n\n"
+        second = build_utterance_prompt("ava", "marvin", history, "2. Volcanoes vent magma", config,
+                                        {"ava": 3, "marvin": 2}, False, second_context)
+    finally:
+        retriever.close()
+
+    assert first_context != second_context
+    assert first[0].content == second[0].content
+    # The earlier history is part of the cached prefix even though the section context changed
+    shared = os.path.commonprefix([first[1].content, second[1].content])
+    assert shared == "Full Conversation History:\n" + "Ava: Welcome to the show.\n\nMarvin: Glad to be here.\n\n"
+
+
+@patch('podcastic.commands.produce.compile_run')
+@patch('podcastic.commands.produce.get_tts_service')
+@patch('podcastic.commands.write.generate_outline')
+@patch('podcastic.commands.write.generate_utterance')
+def test_produce_command_synthesizes_while_writing(mock_generate_utterance, mock_generate_outline,
+                                                   mock_get_tts_service, mock_compile_run):
+    import threading
+    import time
+
+    events = []
+    lock = threading.Lock()
+
+    def fake_utterance(*args, **kwargs):
+        time.sleep(0.02)
+        with lock:
+            events.append("utterance")
+        return f"Utterance {len(events)}."
+
+    class FakeTTS:
+        def generate_audio(self, text, output_path, voice):
+            with lock:
+                events.append("audio")
+            Path(output_path).write_bytes(silent_frames(1.0))
+
+    mock_generate_outline.return_value = "1. Introduction\n2. Conclusion"
+    mock_generate_utterance.side_effect = fake_utterance
+    mock_get_tts_service.return_value = FakeTTS()
+
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        topic_file = root / "topic.md"
+        topic_file.write_text("Sample topic content")
+        output_file = root / "episode.ssml"
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["produce", "--topic", str(topic_file), "--output", str(output_file)])
+
+        assert result.exit_code == 0
+        script = output_file.read_text()
+        assert script.count("<speak") == 8
+        assert script.count("<break") == 7
+        generated = sorted(path.name for path in (root / "generated" / "episode").glob("*.mp3"))
+        assert generated[0] == "001_Ava.mp3"
+        assert len(generated) == 8
+        # Synthesis started before the last utterance was written
+        assert events.index("audio") < len(events) - 1 - events[::-1].index("utterance")
+        mock_compile_run.assert_called_once()
+
+
+@patch('podcastic.commands.produce.compile_run')
+@patch('podcastic.commands.produce.get_tts_service')
+@patch('podcastic.commands.write.generate_outline')
+@patch('podcastic.commands.write.generate_utterance')
+def test_produce_command_stops_writing_when_synthesis_fails(mock_generate_utterance, mock_generate_outline,
+                                                            mock_get_tts_service, mock_compile_run):
+    import time
+
+    def fake_utterance(*args, **kwargs):
+        time.sleep(0.05)
+        return "An utterance."
+
+    class FailingTTS:
+        def generate_audio(self, text, output_path, voice):
+            raise RuntimeError("Voice not found")
+
+    mock_generate_outline.return_value = "1. Introduction\n2. Conclusion"
+    mock_generate_utterance.side_effect = fake_utterance
+    mock_get_tts_service.return_value = FailingTTS()
+
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        topic_file = root / "topic.md"
+        topic_file.write_text("Sample topic content")
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["produce", "--topic", str(topic_file), "--output", str(root / "episode.ssml")])
+
+        assert result.exit_code == 1
+        assert "Voice not found" in result.output
+        # The first failure ends the run long before all 8 utterances are written
+        assert mock_generate_utterance.call_count < 4
+        mock_compile_run.assert_not_called()
+
+
+@patch('podcastic.commands.write.generate_outline')
+def test_live_command_streams_sentences_as_they_are_written(mock_generate_outline):
+    from langchain_core.messages import AIMessageChunk
+
+    class FakeChatModel:
+        calls = 0
+
+        def __init__(self, **kwargs):
+            pass
+
+        def stream(self, messages):
+            type(self).calls += 1
+            reply = f"Reply number {self.calls} starts here. It has a second sentence too!"
+            for token in reply.split(" "):
+                yield AIMessageChunk(content=token + " ")
+
+    mock_generate_outline.return_value = "1. Introduction\n2. Conclusion"
+
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        topic_file = root / "topic.md"
+        topic_file.write_text("Sample topic content")
+        output_file = root / "live.ssml"
+
+        with patch('langchain_openai.ChatOpenAI', FakeChatModel), patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["live", "--topic", str(topic_file), "--output", str(output_file),
+                                         "--port", "0", "--no-keep-serving"])
+
+        assert result.exit_code == 0, result.output
+        assert "Time to first audio" in result.output
+        script = output_file.read_text()
+        assert script.count("<speak") == 8
+        assert script.count("<break") == 7
+        assert (root / "generated" / "live" / "run_metrics.json").exists()
+
+
+@patch('podcastic.commands.live.get_tts_service')
+@patch('podcastic.commands.write.generate_outline')
+def test_live_command_stops_writing_when_synthesis_fails(mock_generate_outline, mock_get_tts_service):
+    import time
+    from langchain_core.messages import AIMessageChunk
+    from podcastic.utils.retrieval import ContextRetriever
+
+    class FakeChatModel:
+        calls = 0
+
+        def __init__(self, **kwargs):
+            pass
+
+        def stream(self, messages):
+            type(self).calls += 1
+            time.sleep(0.05)
+            yield AIMessageChunk(content="A sentence that will never be heard. ")
+
+    class FailingTTS:
+        def synthesize(self, text, voice):
+            raise RuntimeError("Voice not found")
+
+    mock_generate_outline.return_value = "1. Introduction\n2. Conclusion"
+    mock_get_tts_service.return_value = FailingTTS()
+
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        topic_file = root / "topic.md"
+        topic_file.write_text("Sample topic content")
+
+        with patch('langchain_openai.ChatOpenAI', FakeChatModel), patch('pathlib.Path.cwd', return_value=root), \
+                patch.object(ContextRetriever, 'close', autospec=True, side_effect=ContextRetriever.close) as close:
+            result = runner.invoke(app, ["live", "--topic", str(topic_file), "--port", "0", "--no-keep-serving"])
+
+        assert result.exit_code == 1
+        assert "Voice not found" in result.output
+        close.assert_called_once()
+        # The first failure ends the run long before all 8 utterances are streamed
+        assert FakeChatModel.calls < 4
+
+
+@patch('podcastic.commands.compile.stitch_audio_files')
+def test_profile_option_writes_flame_graph_and_summary(mock_stitch_audio_files):
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        script = root / "episode.ssml"
+        script.write_text('<speak voice="Ava">Hello</speak>')
+        audio_dir = root / "generated" / "episode"
+        audio_dir.mkdir(parents=True)
+        (audio_dir / "001_Ava.mp3").write_bytes(silent_frames(1.0))
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["--profile", "--profile-dir", str(root / "profiles"),
+                                         "compile", "--input", str(script)])
+
+        assert result.exit_code == 0, result.output
+        assert "Profile written" in result.output
+        assert (root / "profiles" / "compile.folded").exists()
+        summary = (root / "profiles" / "compile.txt").read_text()
+        assert "Top functions:" in summary
+        assert "Peak traced memory" in summary
+
+
+def test_generate_utterance_picks_the_least_repetitive_candidate():
+    import threading
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, LLMResult
+    from podcastic.commands import write
+    from podcastic.utils.metrics import run_metrics
+
+    history = "Ava: Neural networks learn from examples.\n\n"
+    calls = []
+
+    class FakeChatModel:
+        replies = []
+        fallbacks_in_flight = None
+
+        def __init__(self, n=1, **kwargs):
+            self.n = n
+
+        def generate(self, prompts):
+            calls.append(threading.get_ident())
+            if self.fallbacks_in_flight and len(calls) > 1:
+                # Only passes once all three fallbacks are in flight at the same time
+                self.fallbacks_in_flight.wait()
+            generations = [ChatGeneration(message=AIMessage(content=reply)) for reply in self.replies[:self.n]]
+            return LLMResult(generations=[generations])
+
+    config = {"utterance_generation_model": "gpt-4o-mini", "utterance_candidates": 3}
+    counts = lambda: ({"ava": 0, "marvin": 0}, {"ava": 1, "marvin": 1})
+
+    FakeChatModel.replies = ["Neural networks learn from examples!", "So how much data do they need?",
+                             "Neural networks learn from examples."]
+    run_metrics.reset()
+    with patch('langchain_openai.ChatOpenAI', FakeChatModel):
+        utterance = write.generate_utterance("marvin", "ava", history, "1. Intro", config, *counts(), 8, False, "Topic")
+    assert utterance == "So how much data do they need?"
+    assert len(calls) == 1
+    assert "write.retries" not in run_metrics.snapshot()["counters"]
+
+    FakeChatModel.replies = ["Neural networks learn from examples."] * 3
+    FakeChatModel.fallbacks_in_flight = threading.Barrier(3, timeout=5)
+    calls.clear()
+    with patch('langchain_openai.ChatOpenAI', FakeChatModel), \
+            patch.object(write, 'generate_transition', return_value="Moving on."):
+        utterance = write.generate_utterance("marvin", "ava", history, "1. Intro", config, *counts(), 8, False, "Topic")
+    assert utterance == "Moving on."
+    # One request, then three fallbacks side by side rather than one after another
+    assert len(calls) == 4
+    assert len(set(calls[1:])) == 3
+    assert not FakeChatModel.fallbacks_in_flight.broken
+    snapshot = run_metrics.snapshot()
+    assert snapshot["counters"]["write.retries"] == 3
+    assert snapshot["timings"]["write.retry_seconds"]["count"] == 1
+
+
+@patch('podcastic.commands.compile.stitch_audio_files')
+def test_compile_command_rejects_cut_off_segments(mock_stitch_audio_files):
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        script = root / "episode.ssml"
+        script.write_text('<speak voice="Ava">One two three four five six seven eight nine ten eleven twelve</speak>'
+                          '<break time="1s"/><speak voice="Marvin">Hi there</speak>')
+        audio_dir = root / "generated" / "episode"
+        audio_dir.mkdir(parents=True)
+        (audio_dir / "001_Ava.mp3").write_bytes(silent_frames(0.5))
+        (audio_dir / "003_Marvin.mp3").write_bytes(silent_frames(1.0)[:-10])
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["compile", "--input", str(script)])
+
+        assert result.exit_code == 1
+        assert "001_Ava.mp3: 0.50s is too short for 12 words" in result.output
+        assert "003_Marvin.mp3: last frame cut off" in result.output
+        mock_stitch_audio_files.assert_not_called()
+
+
+@patch('podcastic.commands.generate.get_tts_service')
+def test_generate_dry_run_estimates_from_previous_runs(mock_get_tts_service):
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        script = root / "episode.ssml"
+        script.write_text('<speak voice="Ava">One two three four five</speak><break time="2s"/>'
+                          '<speak voice="Marvin">Six seven</speak><break time="500ms"/>'
+                          '<speak voice="Ava">Eight nine ten</speak>')
+        previous = root / "generated" / "earlier"
+        previous.mkdir(parents=True)
+        (previous / "run_metrics.json").write_text(
+            '{"counters": {"tts.openai.characters": 400}, "gauges": {},'
+            ' "timings": {"tts.openai.latency": {"count": 10, "total": 20.0, "p95": 3.0}}}'
+        )
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["generate", "--input", str(script), "--dry-run", "--concurrency", "2"])
+
+        output = " ".join(result.output.split())
+        assert result.exit_code == 0
+        assert "shimmer" in output and "echo" in output
+        assert "Pauses: 2, 2.5s in total" in output
+        assert "at concurrency 2 (latencies measured over 1 previous runs)" in output
+        mock_get_tts_service.assert_not_called()
+        assert not (root / "generated" / "episode").exists()
+
+
+@patch('podcastic.commands.write.generate_outline')
+def test_write_dry_run_makes_no_model_calls(mock_generate_outline):
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        topic = root / "topic.md"
+        topic.write_text("Llamas are members of the camel family. " * 50)
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["write", "--topic", str(topic), "--output", str(root / "out.ssml"),
+                                         "--dry-run", "--candidates", "3"])
+
+        assert result.exit_code == 0
+        assert "Utterances: 20, 3 candidate(s) each" in result.output
+        assert "Estimated cost: $" in result.output
+        mock_generate_outline.assert_not_called()
+        assert not (root / "out.ssml").exists()
+
+
+@patch('podcastic.commands.compile.stitch_audio_files')
+def test_compile_command_leaves_out_the_previous_podcast(mock_stitch_audio_files):
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        script = root / "episode.ssml"
+        script.write_text('<speak voice="Ava">Hi there</speak>')
+        audio_dir = root / "generated" / "episode"
+        audio_dir.mkdir(parents=True)
+        (audio_dir / "001_Ava.mp3").write_bytes(silent_frames(1.0))
+        (audio_dir / "episode_full_podcast.mp3").write_bytes(silent_frames(1.0))
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["compile", "--input", str(script)])
+
+        assert result.exit_code == 0
+        audio_files = mock_stitch_audio_files.call_args.args[0]
+        assert audio_files == [("audio", audio_dir / "001_Ava.mp3")]
+
+
+@patch('podcastic.utils.preview.stitch_audio_files')
+def test_segments_option_synthesizes_only_what_the_preview_needs(mock_stitch_audio_files):
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        script = root / "episode.ssml"
+        lines = ['<speak voice="Ava">One two three four five</speak>', '<break time="2s"/>',
+                 '<speak voice="Marvin">Six seven eight</speak>', '<break time="500ms"/>',
+                 '<speak voice="Ava">Nine ten</speak>', '<speak voice="Marvin">Eleven twelve</speak>']
+        script.write_text("\n".join(lines))
+        audio_dir = root / "generated" / "episode"
+
+        def previewed():
+            audio_files = mock_stitch_audio_files.call_args.args[0]
+            return [file_info if file_type == "pause" else file_info.name for file_type, file_info in audio_files]
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["generate", "--input", str(script), "--service", "offline",
+                                         "--segments", "3-5", "--lead-in", "0"])
+            assert result.exit_code == 0
+            assert "Synthesized 2 missing segments" in result.output
+            assert sorted(path.name for path in audio_dir.glob("*.mp3")) == ["003_Marvin.mp3", "005_Ava.mp3"]
+            assert previewed() == ["003_Marvin.mp3", 0.5, "005_Ava.mp3"]
+
+            # An edited segment no longer has usable audio
+            script.write_text("\n".join(lines[:4] + ['<speak voice="Ava">Nine ten, edited</speak>'] + lines[5:]))
+            result = runner.invoke(app, ["compile", "--input", str(script), "--segments", "5-6"])
+            assert result.exit_code == 1
+            assert "No usable audio for 005_Ava.mp3, 006_Marvin.mp3" in " ".join(result.output.split())
+
+            result = runner.invoke(app, ["generate", "--input", str(script), "--service", "offline",
+                                         "--segments", "5-6", "--lead-in", "1"])
+            assert result.exit_code == 0
+            assert "Synthesized 2 missing segments" in result.output
+            assert previewed() == ["003_Marvin.mp3", 0.5, "005_Ava.mp3", "006_Marvin.mp3"]
+            assert mock_stitch_audio_files.call_args.args[1] == audio_dir / "previews" / "episode_005-006.mp3"
+
+            # Segment 3 starts 4s in: 2s estimated for segment 1, then a 2s pause
+            result = runner.invoke(app, ["compile", "--input", str(script), "--segments", "4.5s-5.5s",
+                                         "--lead-in", "0"])
+            assert result.exit_code == 0
+            assert previewed() == ["003_Marvin.mp3", 0.5]
+
+            # Audio with no recorded text is used, but flagged as unchecked against the script
+            (audio_dir / "001_Ava.mp3").write_bytes(silent_frames(2.0))
+            result = runner.invoke(app, ["compile", "--input", str(script), "--segments", "1-1"])
+            assert result.exit_code == 0
+            assert "Unverified: 001_Ava.mp3" in " ".join(result.output.split())
+            assert "Unverified" not in runner.invoke(app, ["compile", "--input", str(script),
+                                                           "--segments", "3-3", "--lead-in", "0"]).output
+
+
+def test_parse_window_reads_segment_and_time_ranges():
+    from podcastic.utils.preview import parse_window
+    assert parse_window("40-60") == ("segments", 40, 60)
+    assert parse_window("2:30-4:00") == ("time", 150.0, 240.0)
+    assert parse_window("150s-240s") == ("time", 150.0, 240.0)
+    with pytest.raises(ValueError):
+        parse_window("60-40")
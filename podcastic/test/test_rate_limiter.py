@@ -0,0 +1,162 @@
+import threading
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from podcastic.utils.openai_tts import OpenAITTS
+from podcastic.utils.rate_limiter import AdaptiveRateLimiter, RateLimitExceeded, retry_after_of
+
+
+class ThrottlingTTSHandler(BaseHTTPRequestHandler):
+    """Stand-in for the OpenAI speech endpoint that throttles the first requests."""
+
+    throttle_remaining = 0
+    requests_seen = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            type(self).requests_seen += 1
+            throttled = type(self).throttle_remaining > 0
+            if throttled:
+                type(self).throttle_remaining -= 1
+        if throttled:
+            body = b'{"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}'
+            self.send_response(429)
+            self.send_header("Retry-After-Ms", "20")
+            self.send_header("Content-Type", "application/json")
+        else:
+            body = b"ID3fake-mp3-audio"
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def throttling_server():
+    ThrottlingTTSHandler.throttle_remaining = 2
+    ThrottlingTTSHandler.requests_seen = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingTTSHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+class FakeThrottle(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_openai_tts_backs_off_and_retries_on_429(throttling_server):
+    tts = OpenAITTS(api_key="test-key-throttling", base_url=throttling_server)
+    limiter = tts.rate_limiter
+    initial_rate = limiter.bucket.rate
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = Path(temp_dir) / "001_Ava.mp3"
+        tts.generate_audio("Hello there.", output_path, "Ava")
+        assert output_path.read_bytes() == b"ID3fake-mp3-audio"
+
+    assert ThrottlingTTSHandler.requests_seen == 3
+    stats = limiter.stats()
+    assert stats["throttled"] == 2
+    assert stats["retries"] == 2
+    assert stats["requests_per_second"] < initial_rate
+
+
+def test_aimd_increases_concurrency_while_latency_is_healthy():
+    limiter = AdaptiveRateLimiter("test-healthy", initial_concurrency=1, max_concurrency=4,
+                                  requests_per_second=1000, burst=1000, latency_target=1.0)
+    for _ in range(20):
+        limiter.call(lambda: None)
+    assert limiter.limit == 4
+
+    limiter.record_success(5.0)  # Slow responses do not raise the limit further
+    assert limiter.limit == 4
+
+    limiter.record_throttle()
+    assert limiter.limit == 2
+
+
+def test_burst_of_throttles_cuts_the_limit_once():
+    limiter = AdaptiveRateLimiter("test-burst", initial_concurrency=4, max_concurrency=4, decrease_factor=0.5,
+                                  requests_per_second=1000, burst=1000, base_backoff=0.001)
+    in_flight = threading.Barrier(4, timeout=5)
+    limits_on_retry = []
+    lock = threading.Lock()
+    attempts = {}
+
+    def request(worker):
+        with lock:
+            attempts[worker] = attempts.get(worker, 0) + 1
+            first = attempts[worker] == 1
+            if not first:
+                limits_on_retry.append(limiter.concurrency)
+        if first:
+            # All four requests are in flight when the provider throttles them
+            in_flight.wait()
+            raise FakeThrottle(429)
+
+    threads = [threading.Thread(target=limiter.call, args=(request, worker)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert limiter.throttled == 4
+    assert limits_on_retry[0] == 2.0
+
+
+def test_limiter_gives_up_after_max_retries():
+    sleeps = []
+    limiter = AdaptiveRateLimiter("test-exhausted", max_retries=2, requests_per_second=1000,
+                                  sleep=sleeps.append)
+
+    def always_unavailable():
+        raise FakeThrottle(503)
+
+    with pytest.raises(RateLimitExceeded):
+        limiter.call(always_unavailable)
+    assert limiter.throttled == 3
+    assert len(sleeps) == 2
+
+
+def test_limiter_does_not_retry_client_errors():
+    limiter = AdaptiveRateLimiter("test-client-error", requests_per_second=1000)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise FakeThrottle(400)
+
+    with pytest.raises(FakeThrottle):
+        limiter.call(bad_request)
+    assert len(calls) == 1
+    assert limiter.throttled == 0
+
+    def conflict():
+        calls.append(1)
+        raise FakeThrottle(409)
+
+    with pytest.raises(FakeThrottle):
+        limiter.call(conflict)
+    assert len(calls) == 2
+    assert limiter.throttled == 0
+
+
+def test_retry_after_header_parsing():
+    assert retry_after_of(FakeThrottle(429, {"Retry-After": "3"})) == 3.0
+    assert retry_after_of(FakeThrottle(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after_of(FakeThrottle(429)) is None
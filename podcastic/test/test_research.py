@@ -0,0 +1,292 @@
+import asyncio
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from typer.testing import CliRunner
+
+from podcastic.podcastic import app
+from podcastic.utils.embeddings import HashingEmbedder
+from podcastic.utils.fetcher import FETCHED, NOT_MODIFIED, HTTPCache, fetch_all, fetch_url
+from podcastic.utils.raptor import ExtractiveSummarizer, RaptorTree, kmeans
+from podcastic.utils.research_index import ResearchIndex
+from podcastic.utils.vector_store import VectorStore
+
+runner = CliRunner()
+
+
+class ArticleHandler(BaseHTTPRequestHandler):
+    """Stand-in web server that honors If-None-Match and tracks concurrency."""
+
+    pages = {}
+    full_responses = 0
+    in_flight = 0
+    max_in_flight = 0
+    delay = 0.0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(cls.delay)
+            body = cls.pages[self.path].encode("utf-8")
+            etag = f'"{hash(body) & 0xffffffff:x}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            with cls.lock:
+                cls.full_responses += 1
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def article_server():
+    ArticleHandler.pages = {
+        f"/article-{i}": f"<html><body><h1>Article {i}</h1><p>Topic number {i} is about llamas.</p></body></html>"
+        for i in range(6)
+    }
+    ArticleHandler.full_responses = 0
+    ArticleHandler.max_in_flight = 0
+    ArticleHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArticleHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_vector_store_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((3000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = VectorStore(Path(temp_dir) / "store", dim=32)
+        # Append in several batches to exercise incremental growth
+        for start in range(0, 3000, 700):
+            batch = vectors[start:start + 700]
+            store.add(batch, [{"row": start + i} for i in range(len(batch))])
+
+        reopened = VectorStore(Path(temp_dir) / "store")
+        assert len(reopened) == 3000
+        query = vectors[1234]
+        results = reopened.search(query, k=5, block_size=512)
+        expected = np.argsort(-(vectors @ query))[:5]
+        assert [result.index for result in results] == list(expected)
+        assert results[0].metadata == {"row": 1234}
+
+        reopened.delete([1234])
+        assert 1234 not in [result.index for result in reopened.search(query, k=5, block_size=512)]
+
+
+def test_vector_store_merges_deletions_and_compacts():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((1000, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = VectorStore(Path(temp_dir) / "store", dim=16)
+        store.add(vectors, [{"row": i} for i in range(1000)])
+        store.delete(range(100, 200))
+        store.delete([99, 200, 500])
+        store.delete(range(300, 700))
+        assert store.header["deleted"] == [[99, 201], [300, 700]]
+        assert store.deleted_count == 502
+        assert store.needs_compaction()
+
+        query = vectors[42]
+        live = np.ones(1000, dtype=bool)
+        live[99:201] = live[300:700] = False
+        expected = [int(i) for i in np.argsort(-(vectors @ query)) if live[i]][:5]
+        assert [result.index for result in store.search(query, k=5, block_size=64)] == expected
+
+        remap = store.compact()
+        assert len(store) == 498 and store.header["deleted"] == []
+        assert remap[99] == -1 and remap[201] == 99
+        results = VectorStore(Path(temp_dir) / "store").search(query, k=5, block_size=64)
+        assert [result.metadata["row"] for result in results] == expected
+        assert [result.index for result in results] == [int(remap[i]) for i in expected]
+
+
+def test_research_command_indexes_incrementally():
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        (root / "llamas.md").write_text("Llamas are domesticated South American camelids used as pack animals.")
+        (root / "rust.md").write_text("Rust is a systems programming language focused on memory safety.")
+        research_file = root / "topic.yaml"
+        research_file.write_text("embedder: hashing\nsummarizer: extractive\nfiles:\n  - llamas.md\n  - rust.md\n")
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["research", str(research_file)])
+            assert result.exit_code == 0
+            assert result.output.count("Indexed:") == 2
+
+            (root / "rust.md").write_text("Rust is a language that guarantees memory safety without garbage collection.")
+            result = runner.invoke(app, ["research", str(research_file)])
+            assert result.exit_code == 0
+            assert result.output.count("Unchanged:") == 1
+            assert result.output.count("Indexed:") == 1
+
+            result = runner.invoke(app, ["research", str(research_file), "--query", "pack animals", "--top-k", "1"])
+            assert result.exit_code == 0
+            assert "llamas.md" in result.output
+
+
+def test_hashing_embedder_is_deterministic():
+    embedder = HashingEmbedder(dim=64)
+    first, second = embedder.embed(["the same text", "the same text"])
+    assert np.array_equal(first, second)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+
+
+class CountingSummarizer(ExtractiveSummarizer):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def summarize(self, texts):
+        with self.lock:
+            self.calls += 1
+        return super().summarize(texts)
+
+
+def test_kmeans_separates_clusters():
+    rng = np.random.default_rng(1)
+    blobs = np.concatenate([rng.normal(center, 0.05, size=(20, 2)) for center in (0.0, 5.0, 10.0)])
+    labels, _ = kmeans(blobs, 3)
+    for start in (0, 20, 40):
+        assert len(set(labels[start:start + 20].tolist())) == 1
+    assert len(set(labels.tolist())) == 3
+
+
+def test_raptor_tree_only_rebuilds_new_sources():
+    words = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index = ResearchIndex(Path(temp_dir), HashingEmbedder(dim=64))
+        for source in ("a", "b"):
+            text = " ".join(f"{source}{word} {words[i % len(words)]}." for i, word in enumerate(words * 20))
+            index.update_source(source, text, max_words=20, overlap=5)
+
+        summarizer = CountingSummarizer()
+        stats = RaptorTree(index, summarizer, cluster_size=3).update()
+        assert stats["rebuilt_sources"] == 2
+        first_build_calls = summarizer.calls
+        assert first_build_calls > 0
+
+        summarizer.calls = 0
+        tree = RaptorTree(index, summarizer, cluster_size=3)
+        stats = tree.update()
+        assert stats == {"rebuilt_sources": 0, "reused_sources": 2, "summaries_generated": 0, "cache_hits": 1}
+        assert summarizer.calls == 0
+
+        index.update_source("c", "A brand new source about llamas. Llamas carry packs.", max_words=20, overlap=5)
+        stats = RaptorTree(index, summarizer, cluster_size=3).update()
+        assert stats["rebuilt_sources"] == 1
+        assert stats["reused_sources"] == 2
+        assert summarizer.calls < first_build_calls
+        assert index.search("llamas carry packs", k=1)[0].metadata["source"] == "c"
+
+
+def test_raptor_tree_keeps_repeated_chunks_and_prunes_unused_summaries():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index = ResearchIndex(Path(temp_dir), HashingEmbedder(dim=64))
+        index.update_source("a", " ".join(["Llamas hum when they are curious."] * 40), max_words=20, overlap=0)
+        rows = index.manifest["a"]["rows"]
+
+        tree = RaptorTree(index, CountingSummarizer(), cluster_size=3)
+        tree.update()
+        leaves = [node for node in tree.nodes.values() if node["store"] == "chunks"]
+        assert len(leaves) == rows[1] - rows[0]
+
+        index.update_source("a", "Alpacas are smaller than llamas. " * 30, max_words=20, overlap=0)
+        tree = RaptorTree(index, CountingSummarizer(), cluster_size=3)
+        tree.update()
+        assert tree.summary_cache
+        assert set(tree.summary_cache) <= set(tree.nodes)
+
+        # The replaced chunks were compacted away and the tree follows the renumbered rows
+        assert index.store.header["deleted"] == []
+        assert index.manifest["a"]["rows"][0] == 0
+        assert all(tree.text(node_id).startswith("Alpacas") for node_id, node in tree.nodes.items()
+                   if node["store"] == "chunks")
+        assert tree.text(tree.root)
+
+
+def test_research_command_skips_unchanged_urls(article_server):
+    with tempfile.TemporaryDirectory() as temp_project_root:
+        root = Path(temp_project_root)
+        research_file = root / "web.yaml"
+        urls = "".join(f"  - {article_server}/article-{i}\n" for i in range(3))
+        research_file.write_text(f"embedder: hashing\nsummarizer: extractive\nurls:\n{urls}")
+
+        with patch('pathlib.Path.cwd', return_value=root):
+            result = runner.invoke(app, ["research", str(research_file)])
+            assert result.exit_code == 0
+            assert result.output.count("Indexed:") == 3
+            assert ArticleHandler.full_responses == 3
+
+            ArticleHandler.pages["/article-1"] = "<p>Article 1 was rewritten to discuss alpacas.</p>"
+            result = runner.invoke(app, ["research", str(research_file)])
+            assert result.exit_code == 0
+            assert result.output.count("Not modified:") == 2
+            assert result.output.count("Indexed:") == 1
+            assert ArticleHandler.full_responses == 4
+
+
+def test_fetch_all_bounds_per_host_concurrency(article_server):
+    ArticleHandler.delay = 0.05
+    urls = [f"{article_server}/article-{i}" for i in range(6)]
+
+    async def collect(cache):
+        return [result async for result in fetch_all(urls, cache, max_per_host=2, max_connections=8)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = HTTPCache(Path(temp_dir))
+        results = asyncio.run(collect(cache))
+        assert sorted(result.url for result in results) == sorted(urls)
+        assert {result.status for result in results} == {FETCHED}
+        assert ArticleHandler.max_in_flight == 2
+
+        results = asyncio.run(collect(cache))
+        assert {result.status for result in results} == {NOT_MODIFIED}
+        assert "llamas" in results[0].content
+
+
+def test_fetch_url_refetches_when_a_revalidated_copy_is_gone(article_server):
+    url = f"{article_server}/article-0"
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = HTTPCache(Path(temp_dir))
+        assert fetch_url(url, cache).status == FETCHED
+        validators = cache.validators(url)
+
+        # The cache is cleared after the conditional request was built
+        for path in Path(temp_dir).iterdir():
+            path.unlink()
+        with patch.object(HTTPCache, "validators", return_value=validators):
+            result = fetch_url(url, cache)
+        assert result.status == FETCHED
+        assert "llamas" in result.content
+        assert ArticleHandler.full_responses == 2
@@ -0,0 +1,91 @@
+import os
+import tempfile
+from pathlib import Path
+
+from podcastic.test.test_pcm_cache import FakeDecoder
+from podcastic.utils.audio_utils import SynthesisPool, stitch_audio_files
+from podcastic.utils.mp3 import silent_frames
+from podcastic.utils.offline_tts import OfflineTTS
+from podcastic.utils.pcm_cache import PCMCache
+from podcastic.utils.segment_store import INDEX_FILE, PACK_FILE, SegmentPack
+
+
+def test_segment_pack_replaces_recovers_compacts_and_exports():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        pack = SegmentPack(root)
+        pack.put("001_Ava.mp3", b"first take", text="Hello")
+        pack.put("003_Marvin.mp3", b"marvin")
+        pack.put("001_Ava.mp3", b"second take", text="Hello")
+        assert bytes(pack.get("001_Ava.mp3").data) == b"second take"
+        assert pack.get("001_Ava.mp3").entry["text"] == "Hello"
+        pack.close()
+
+        # A lost index is rebuilt from the records, and a cut-off record is dropped
+        size = (root / PACK_FILE).stat().st_size
+        with open(root / PACK_FILE, "ab") as f:
+            f.write(b"PSEG\x10\x00")
+        os.remove(root / INDEX_FILE)
+        pack = SegmentPack(root)
+        assert (root / PACK_FILE).stat().st_size == size
+        assert [segment.name for segment in pack.segments()] == ["001_Ava.mp3", "003_Marvin.mp3"]
+        assert bytes(pack.get("001_Ava.mp3").data) == b"second take"
+
+        assert pack.compact() > 0
+        assert pack.wasted_bytes < size - len(b"second take") - len(b"marvin")
+        assert bytes(SegmentPack(root).get("003_Marvin.mp3").data) == b"marvin"
+
+        paths = pack.export(root / "loose")
+        assert [path.read_bytes() for path in paths] == [b"second take", b"marvin"]
+        pack.close()
+
+
+def test_segments_synthesized_into_a_pack_are_stitched_from_it():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        pack = SegmentPack(root)
+        pool = SynthesisPool(OfflineTTS(), root, store=pack)
+        pool.add(0, ("speech", "Ava", "One two three"))
+        pool.add(1, ("pause", 0.5))
+        pool.add(2, ("speech", "Marvin", "Four five"))
+        audio_files = pool.wait()
+
+        assert not list(root.glob("*.mp3"))
+        assert [file_info.name for file_type, file_info in audio_files if file_type == "audio"] == \
+            ["001_Ava.mp3", "003_Marvin.mp3"]
+        assert bytes(pack.get("003_Marvin.mp3").data) == silent_frames(2 / 2.5)
+
+        encoded = []
+
+        def fake_encoder(buffers, output_path, fmt):
+            encoded.append(b"".join(bytes(buffer) for buffer in buffers))
+
+        decoder = FakeDecoder()
+        cache = PCMCache(root / ".pcm", decoder=decoder)
+        stitch_audio_files(audio_files, root / "episode_full_podcast.mp3", cache=cache, encoder=fake_encoder)
+        assert len(encoded[0]) == (24000 + 12000 + 24000) * 2
+        assert str(pack.get("001_Ava.mp3")).startswith("subfile,,start,")
+
+        # Unchanged packed segments are recognized by their hash and not decoded again
+        cache = PCMCache(root / ".pcm", decoder=decoder)
+        assert cache.ensure(pack.segments(), cache.target_format(pack.segments())) == 0
+        pack.close()
+
+
+def test_segment_pack_keeps_one_live_map_as_it_grows():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pack = SegmentPack(Path(temp_dir))
+        for index in range(50):
+            segment = pack.put(f"{index + 1:03d}_Ava.mp3", b"take %d" % index)
+            assert segment.read() == b"take %d" % index
+            assert bytes(segment.data) == b"take %d" % index
+        # Maps replaced while the pack grew are closed once no views of them remain
+        assert len(pack._stale_maps) <= 1
+
+        view = pack.get("001_Ava.mp3").data
+        pack.put("051_Ava.mp3", b"take 50")
+        pack.get("051_Ava.mp3").data.release()
+        assert len(pack._stale_maps) == 1
+        view.release()
+        pack.close()
+        assert pack._stale_maps == [] and pack._map is None
@@ -0,0 +1,99 @@
+import threading
+import urllib.request
+
+from podcastic.utils.mp3 import duration_of, iter_frames, scan, silent_frames
+from podcastic.utils.offline_tts import OfflineTTS
+from podcastic.utils.streaming import AudioStreamServer, LiveAudioPipeline, SentenceSplitter
+
+
+def test_sentence_splitter_waits_for_complete_sentences():
+    splitter = SentenceSplitter(min_chars=10)
+    sentences = []
+    for token in "Dr. Smith joined us today. Right. She studies volcanoes! What".split(" "):
+        sentences += splitter.feed(token + " ")
+    sentences += splitter.flush()
+    assert sentences == ["Dr. Smith joined us today.", "Right. She studies volcanoes!", "What"]
+
+
+def test_silent_frames_have_the_requested_duration():
+    audio = silent_frames(1.5, 24000)
+    assert abs(duration_of(audio) - 1.5) < 0.03
+    assert all(header.sample_rate == 24000 for _, header in iter_frames(audio))
+    assert abs(duration_of(silent_frames(0.5, 44100)) - 0.5) < 0.03
+
+
+def test_scan_finds_truncation_junk_and_frame_count_mismatches():
+    audio = silent_frames(2.0, 24000)
+    frame = audio[:96]
+    assert scan(audio).frames == 83
+    assert scan(audio).problems == []
+
+    tagged = b"ID3\x04\x00\x00\x00\x00\x00\x04abcd" + audio + b"TAG" + bytes(125)
+    assert scan(tagged).frames == 83 and scan(tagged).problems == []
+
+    cut = scan(audio[:-10])
+    assert cut.frames == 82 and cut.truncated_bytes == 86
+
+    garbled = scan(audio[:960] + b"garbage" + audio[960:])
+    assert garbled.frames == 83 and garbled.junk_bytes == 7
+
+    # An Info tag frame declaring 83 frames, followed by only 80 of them
+    info_frame = bytearray(frame)
+    info_frame[4 + 9:4 + 9 + 12] = b"Info" + (1).to_bytes(4, "big") + (83).to_bytes(4, "big")
+    short = scan(bytes(info_frame) + audio[:80 * 96])
+    assert short.declared_frames == 83
+    assert short.problems == ["header declares 83 frames but 80 were found"]
+
+
+def test_pipeline_streams_audio_in_order_to_a_listener():
+    server = AudioStreamServer()
+    server.start()
+    received = []
+
+    def listen():
+        with urllib.request.urlopen(server.url, timeout=10) as response:
+            assert response.headers["Content-Type"] == "audio/mpeg"
+            received.append(response.read())
+
+    listener = threading.Thread(target=listen)
+    listener.start()
+    try:
+        pipeline = LiveAudioPipeline(OfflineTTS(latency=0.01), server)
+        pipeline.start_utterance()
+        pipeline.say("Ava", "One two three four five.")
+        pipeline.say("Ava", "Six seven.")
+        pipeline.pause(1.0)
+        pipeline.start_utterance()
+        pipeline.say("Marvin", "Eight nine ten.")
+        pipeline.finish()
+        listener.join(timeout=10)
+    finally:
+        server.stop()
+
+    # 5, 2 and 3 words at 2.5 words per second, plus the pause
+    assert abs(duration_of(received[0]) - 5.0) < 0.1
+    assert pipeline.time_to_first_audio > 0
+    assert len(pipeline.gaps) == 1
+
+
+def test_synthesis_pool_synthesizes_cut_off_segments_again():
+    import tempfile
+    from pathlib import Path
+    from podcastic.utils.audio_utils import SynthesisPool
+
+    class FlakyTTS:
+        calls = 0
+
+        def generate_audio(self, text, output_path, voice):
+            type(self).calls += 1
+            audio = silent_frames(1.0)
+            Path(output_path).write_bytes(audio[:-20] if self.calls == 1 else audio)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pool = SynthesisPool(FlakyTTS(), Path(temp_dir))
+        pool.add(0, ("speech", "Ava", "Hello there."))
+        pool.add(1, ("pause", 0.5))
+        audio_files = pool.wait()
+
+    assert FlakyTTS.calls == 2
+    assert [kind for kind, _ in audio_files] == ["audio", "pause"]
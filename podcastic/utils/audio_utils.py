@@ -4,15 +4,268 @@ Module for audio processing utilities.
 This module provides functions for processing SSML content and stitching audio files.
 """
 
+import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from pathlib import Path
-from pydub import AudioSegment
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.mp3 import scan, scan_file
+from podcastic.utils.pcm_cache import PCMCache, ffmpeg_encode_mp3
+from podcastic.utils.segment_store import PackedSegment, SegmentPack
+from podcastic.utils.profiling import span
 
 console = Console()
 
-def process_ssml(content: str, service, output_dir: Path):
+# Faster than anyone speaks: audio this short for its text was cut off
+MAX_WORDS_PER_SECOND = 6.0
+
+# Text each loose MP3 segment was synthesized from; packs keep it in their index
+SEGMENT_TEXTS_FILE = "segment_texts.json"
+
+SSML_PATTERN = r'<speak\s+voice="(\w+)">(.*?)</speak>|<break\s+(?:strength|time)="([\d.]+)(m?s)"\s*/>'
+
+def parse_ssml(content: str):
+    """
+    Parse SSML content into speech segments and pauses.
+
+    Pauses may be given as ``<break strength="..."/>`` or ``<break time="..."/>``,
+    in seconds ("1.5s") or milliseconds ("1500ms").
+
+    :param content: SSML content to parse
+    :type content: str
+    :return: List of ("speech", speaker, text) and ("pause", seconds) tuples
+    :rtype: list
+    """
+    segments = []
+    for match in re.findall(SSML_PATTERN, content, re.DOTALL):
+        if match[0]:  # Speaker content
+            segments.append(("speech", match[0], match[1].strip()))
+        else:  # Break
+            duration = float(match[2])
+            if match[3] == "ms":
+                duration /= 1000  # Convert milliseconds to seconds
+            segments.append(("pause", duration))
+    return segments
+
+def segment_filename(index: int, speaker: str) -> str:
+    """
+    Name of the audio file for the segment at a given position in the script.
+
+    :param index: Zero-based position of the segment in the script
+    :type index: int
+    :param speaker: Name of the speaker
+    :type speaker: str
+    :rtype: str
+    """
+    return f"{index+1:03d}_{speaker}.mp3"
+
+def check_segment(path: Path, text: str = None) -> tuple:
+    """
+    Check that a generated segment is a complete MP3 file, without decoding it.
+
+    :param path: The segment's audio file, or the segment in a pack
+    :type path: Path or PackedSegment
+    :param text: The text the segment speaks, to check its duration against
+    :type text: str or None
+    :return: The segment's exact duration in seconds and a list of problems
+        (empty if the segment can be used)
+    :rtype: tuple
+    """
+    if isinstance(path, PackedSegment):
+        result = scan(path.read())
+    elif not Path(path).exists():
+        return 0.0, ["file is missing"]
+    else:
+        result = scan_file(path)
+    problems = list(result.problems)
+    if text and result.frames:
+        words = len(text.split())
+        if words / result.duration > MAX_WORDS_PER_SECOND:
+            problems.append(f"{result.duration:.2f}s is too short for {words} words")
+    return result.duration, problems
+
+def check_segments(audio_files, texts=None) -> dict:
+    """
+    Check every audio file of an episode.
+
+    :param audio_files: List of audio files and pauses, as passed to stitch_audio_files
+    :type audio_files: list
+    :param texts: Text spoken in each file, by file name
+    :type texts: dict or None
+    :return: Problems by path, for the files that need to be synthesized again
+    :rtype: dict
+    """
+    texts = texts or {}
+    flagged = {}
+    for file_type, file_info in audio_files:
+        if file_type == "audio":
+            name = file_info.name if isinstance(file_info, PackedSegment) else Path(file_info).name
+            _, problems = check_segment(file_info, texts.get(name))
+            if problems:
+                flagged[file_info] = problems
+    return flagged
+
+def script_texts(content: str) -> dict:
+    """
+    Map the audio file name of every speech segment of a script to its text.
+
+    :param content: SSML content
+    :type content: str
+    :rtype: dict
+    """
+    return {
+        segment_filename(i, segment[1]): segment[2]
+        for i, segment in enumerate(parse_ssml(content)) if segment[0] == "speech"
+    }
+
+def load_segment_texts(output_dir: Path) -> dict:
+    """
+    Load the text each loose MP3 segment of an episode was synthesized from.
+
+    :param output_dir: The episode's output directory
+    :type output_dir: Path
+    :return: Text by file name (empty for segments written before texts were recorded)
+    :rtype: dict
+    """
+    path = Path(output_dir) / SEGMENT_TEXTS_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+def save_segment_texts(output_dir: Path, texts: dict):
+    """
+    Record the text of newly synthesized loose MP3 segments.
+
+    :param output_dir: The episode's output directory
+    :type output_dir: Path
+    :param texts: Text by file name, merged into the texts already recorded
+    :type texts: dict
+    """
+    merged = {**load_segment_texts(output_dir), **texts}
+    temp_path = Path(output_dir) / f"{SEGMENT_TEXTS_FILE}.tmp"
+    temp_path.write_text(json.dumps(merged, indent=2, sort_keys=True))
+    os.replace(temp_path, Path(output_dir) / SEGMENT_TEXTS_FILE)
+
+class SynthesisPool:
+    """
+    A worker pool that synthesizes script segments concurrently.
+
+    Segments can be added while earlier ones are still being synthesized; the
+    service's rate limiter decides how many requests are actually in flight.
+    Every segment is checked once it is written, and segments that come back
+    cut off or corrupt are synthesized again. Segments are written as MP3 files,
+    or appended to a SegmentPack if one is given.
+    """
+
+    def __init__(self, service, output_dir: Path, store: SegmentPack = None):
+        """
+        Initialize the SynthesisPool instance.
+
+        :param service: TTS service to use for audio generation
+        :type service: OpenAITTS or ElevenLabsTTS
+        :param output_dir: Directory to save generated audio files
+        :type output_dir: Path
+        :param store: Pack to store the segments in instead of separate files
+        :type store: SegmentPack or None
+        """
+        rate_limiter = getattr(service, "rate_limiter", None)
+        self.service = service
+        self.output_dir = output_dir
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=rate_limiter.max_concurrency if rate_limiter else 1)
+        self.futures = {}
+        self.audio_files = {}
+        self.segments = {}
+
+    def add(self, index: int, segment: tuple):
+        """
+        Add a segment to the episode, starting its synthesis if it is speech.
+
+        :param index: Zero-based position of the segment in the script
+        :type index: int
+        :param segment: A segment as returned by parse_ssml
+        :type segment: tuple
+        """
+        if segment[0] == "pause":
+            self.audio_files[index] = ("pause", segment[1])
+            return
+        self.segments[index] = segment
+        self._submit(index)
+
+    def raise_if_failed(self):
+        """
+        Raise the error of a segment whose synthesis has already failed.
+
+        Lets a caller that is still adding segments stop early instead of
+        finding out at wait().
+        """
+        for future in self.futures:
+            if future.done() and not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+
+    def _submit(self, index):
+        future = self.executor.submit(self._synthesize, index)
+        self.futures[future] = index
+
+    def _synthesize(self, index):
+        _, speaker, text = self.segments[index]
+        name = segment_filename(index, speaker)
+        if self.store is not None:
+            return self.store.put(name, self.service.synthesize(text, speaker), speaker=speaker, text=text)
+        output_path = self.output_dir / name
+        self.service.generate_audio(text, output_path, speaker)
+        return output_path
+
+    def wait(self, on_generated=None, attempts=2):
+        """
+        Wait for every added segment to be synthesized.
+
+        :param on_generated: Called with the path of each audio file as it completes
+        :type on_generated: callable or None
+        :param attempts: Times a segment is synthesized before a bad file is an error
+        :type attempts: int
+        :return: List of generated audio files and pauses, in script order
+        :rtype: list
+        :raises RuntimeError: If a segment is still cut off or corrupt after every attempt
+        """
+        try:
+            for attempt in range(1, attempts + 1):
+                flagged = {}
+                for future in as_completed(list(self.futures)):
+                    index = self.futures.pop(future)
+                    output_path = future.result()
+                    _, problems = check_segment(output_path, self.segments[index][2])
+                    if problems:
+                        flagged[index] = problems
+                        continue
+                    self.audio_files[index] = ("audio", output_path)
+                    if on_generated:
+                        on_generated(output_path)
+                if not flagged:
+                    break
+                run_metrics.increment("tts.resynthesized", len(flagged))
+                for index, problems in sorted(flagged.items()):
+                    name = segment_filename(index, self.segments[index][1])
+                    if attempt == attempts:
+                        raise RuntimeError(f"Segment {name} is still unusable: {'; '.join(problems)}")
+                    console.print(f"[yellow]Synthesizing {name} again:[/yellow] {'; '.join(problems)}")
+                    self._submit(index)
+        except Exception:
+            for future in self.futures:
+                future.cancel()
+            raise
+        finally:
+            self.executor.shutdown(wait=False)
+        if self.store is None and self.segments:
+            save_segment_texts(self.output_dir, {
+                segment_filename(index, speaker): text for index, (_, speaker, text) in self.segments.items()
+            })
+        return [self.audio_files[index] for index in sorted(self.audio_files)]
+
+@span("process_ssml")
+def process_ssml(content: str, service, output_dir: Path, store: SegmentPack = None):
     """
     Process SSML content and generate audio files.
 
@@ -22,64 +275,77 @@ def process_ssml(content: str, service, output_dir: Path):
     :type service: OpenAITTS or ElevenLabsTTS
     :param output_dir: Directory to save generated audio files
     :type output_dir: Path
+    :param store: Pack to store the segments in instead of separate files
+    :type store: SegmentPack or None
     :return: List of generated audio files and pauses
     :rtype: list
     """
-    pattern = r'<speak\s+voice="(\w+)">(.*?)</speak>|<break\s+strength="([\d.]+)(m?s)"\s*/>'
-    matches = re.findall(pattern, content, re.DOTALL)
-    
-    audio_files = []
+    segments = parse_ssml(content)
+    pool = SynthesisPool(service, output_dir, store)
+
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
         console=console,
     ) as progress:
-        task = progress.add_task("Generating audio files...", total=len(matches))
-        for i, match in enumerate(matches):
-            if match[0]:  # Speaker content
-                speaker, text = match[0], match[1]
-                output_filename = f"{i+1:03d}_{speaker}.mp3"
-                output_path = output_dir / output_filename
-                service.generate_audio(text.strip(), output_path, speaker)
-                audio_files.append(("audio", output_path))
-                console.print(f"Generated: {output_filename}")
-            else:  # Break
-                duration = float(match[2])
-                if match[3] == "ms":
-                    duration /= 1000  # Convert milliseconds to seconds
-                audio_files.append(("pause", duration))
-                console.print(f"Added pause: {duration} seconds")
+        task = progress.add_task("Generating audio files...", total=len(segments))
+        for i, segment in enumerate(segments):
+            pool.add(i, segment)
+            if segment[0] == "pause":
+                console.print(f"Added pause: {segment[1]} seconds")
+                progress.advance(task)
+
+        def on_generated(output_path):
+            console.print(f"Generated: {output_path.name}")
             progress.advance(task)
-    
-    return audio_files
 
-def stitch_audio_files(audio_files, output_path: Path):
+        return pool.wait(on_generated)
+
+@span("stitch_audio_files")
+def stitch_audio_files(audio_files, output_path: Path, cache: PCMCache = None, encoder=ffmpeg_encode_mp3):
     """
     Stitch multiple audio files and pauses into a single audio file.
 
+    Segments are read from their decoded PCM sidecars, so only segments that are
+    new or changed since the last compile are decoded, and the result is encoded
+    by a single encoder process.
+
     :param audio_files: List of audio files and pauses to stitch
     :type audio_files: list
     :param output_path: Path to save the stitched audio file
     :type output_path: Path
+    :param cache: Sidecar cache to use; defaults to a ``.pcm`` directory next to the output
+    :type cache: PCMCache
+    :param encoder: Function encoding PCM buffers of a PCMFormat to the output file
+    :type encoder: callable
     :return: Path of the stitched audio file
     :rtype: Path
     """
-    combined = AudioSegment.empty()
+    output_path = Path(output_path)
+    cache = cache or PCMCache(output_path.parent / ".pcm")
+    segments = [file_info for file_type, file_info in audio_files if file_type == "audio"]
+    fmt = cache.target_format(segments)
+    decoded = cache.ensure(segments, fmt)
+    console.print(f"Decoded {decoded} segments, reused {len(segments) - decoded} cached segments")
+
+    frame_size = fmt.channels * fmt.sample_width
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
         console=console,
     ) as progress:
         task = progress.add_task("Stitching audio files...", total=len(audio_files))
-        for file_type, file_info in audio_files:
-            if file_type == "audio":
-                segment = AudioSegment.from_mp3(file_info)
-                combined += segment
-            elif file_type == "pause":
-                pause_duration = int(file_info * 1000)  # Convert to milliseconds
-                silence = AudioSegment.silent(duration=pause_duration)
-                combined += silence
-            progress.advance(task)
-    
-    combined.export(output_path, format="mp3")
-    return output_path
\ No newline at end of file
+
+        def buffers():
+            for file_type, file_info in audio_files:
+                if file_type == "audio":
+                    with cache.pcm(file_info) as samples:
+                        yield samples
+                elif file_type == "pause":
+                    yield bytes(round(file_info * fmt.sample_rate) * frame_size)
+                progress.advance(task)
+
+        # Closing the generator releases the sidecar map it holds if the encoder fails
+        with closing(buffers()) as pcm_buffers:
+            encoder(pcm_buffers, output_path, fmt)
+    return output_path
@@ -0,0 +1,81 @@
+"""
+Module for turning research sources into indexable text chunks.
+
+This module provides functions to extract readable text from HTML pages and to
+split long texts into overlapping, word-based chunks for embedding.
+"""
+
+import re
+from html.parser import HTMLParser
+
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+BLOCK_TAGS = {"p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+              "section", "article", "blockquote", "pre", "tr", "table"}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+
+def extract_text(content: str, content_type: str = "text/html") -> str:
+    """
+    Extract readable text from a fetched document.
+
+    :param content: Raw document content
+    :type content: str
+    :param content_type: MIME type of the document; only HTML is parsed
+    :type content_type: str
+    :return: Text with markup removed and whitespace collapsed
+    :rtype: str
+    """
+    if "html" in (content_type or ""):
+        parser = _TextExtractor()
+        parser.feed(content)
+        parser.close()
+        content = "".join(parser.parts)
+    lines = (re.sub(r"[ \t\r\f\v]+", " ", line).strip() for line in content.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def chunk_text(text: str, max_words: int = 200, overlap: int = 40) -> list:
+    """
+    Split text into overlapping chunks of at most max_words words.
+
+    :param text: Text to split
+    :type text: str
+    :param max_words: Maximum number of words per chunk
+    :type max_words: int
+    :param overlap: Number of words shared by consecutive chunks
+    :type overlap: int
+    :return: List of chunk strings
+    :rtype: list
+    """
+    if overlap >= max_words:
+        raise ValueError("Chunk overlap must be smaller than the chunk size")
+    words = text.split()
+    chunks = []
+    step = max_words - overlap
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
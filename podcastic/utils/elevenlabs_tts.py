@@ -9,6 +9,8 @@ from elevenlabs import VoiceSettings
 from elevenlabs.client import ElevenLabs
 from pathlib import Path
 from rich.console import Console
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.rate_limiter import get_rate_limiter, load_rate_limit_settings
 
 console = Console()
 
@@ -26,6 +28,7 @@ class ElevenLabsTTS:
         """
         self.client = ElevenLabs(api_key=api_key)
         self.voice_mapping = self.load_voice_mapping()
+        self.rate_limiter = get_rate_limiter('elevenlabs', api_key, **load_rate_limit_settings('elevenlabs'))
 
     def load_voice_mapping(self):
         """
@@ -38,6 +41,35 @@ class ElevenLabsTTS:
             config = yaml.safe_load(f)
         return {name: data['voice_id'] for name, data in config['elevenlabs'].items()}
 
+    def synthesize(self, text, voice):
+        """
+        Synthesize text to MP3 audio in memory.
+
+        :param text: Text to convert to speech
+        :type text: str
+        :param voice: Name of the voice to use for TTS
+        :type voice: str
+        :return: The MP3 audio
+        :rtype: bytes
+        """
+        voice_id = self.voice_mapping.get(voice.lower())
+        if not voice_id:
+            raise ValueError(f"Voice '{voice}' not found in configuration")
+
+        def request():
+            # Errors can surface while the stream is consumed, so the whole
+            # download runs under the rate limiter. Retries are left to it too.
+            audio_stream = self.client.text_to_speech.convert(
+                voice_id=voice_id,
+                text=text,
+                voice_settings=VoiceSettings(stability=0.5, similarity_boost=0.5),
+                request_options={"max_retries": 0}
+            )
+            return b"".join(chunk for chunk in audio_stream if chunk)
+
+        run_metrics.increment("tts.elevenlabs.characters", len(text))
+        return self.rate_limiter.call(request)
+
     def generate_audio(self, text, output_path, voice):
         """
         Generate audio from text using ElevenLabs' TTS API.
@@ -55,16 +87,7 @@ class ElevenLabsTTS:
 
         console.print(f"Generating audio for {voice} (voice_id: {voice_id})")
 
-        audio_stream = self.client.text_to_speech.convert(
-            voice_id=voice_id,
-            text=text,
-            voice_settings=VoiceSettings(stability=0.5, similarity_boost=0.5)
-        )
-        
         output_path = Path(output_path)
-        with open(output_path, 'wb') as file_out:
-            for chunk in audio_stream:
-                if chunk:
-                    file_out.write(chunk)
+        output_path.write_bytes(self.synthesize(text, voice))
         
-        console.print(f"Generated: {output_path.name}")
\ No newline at end of file
+        console.print(f"Generated: {output_path.name}")
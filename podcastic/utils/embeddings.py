@@ -0,0 +1,129 @@
+"""
+Module for text embedding functions.
+
+This module provides the embedders used to index research material. Each embedder
+turns a list of texts into an L2-normalized float32 matrix, so any of them can be
+plugged into the vector store.
+"""
+
+import hashlib
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """
+    A deterministic, offline embedder based on feature hashing.
+
+    Every word (and every pair of adjacent words) is hashed into one of ``dim``
+    buckets with a hashed sign. It needs no network access or model download and
+    always produces the same vector for the same text, which makes it suitable
+    for tests and offline runs.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim=256):
+        """
+        Initialize the HashingEmbedder instance.
+
+        :param dim: Number of dimensions of the produced vectors
+        :type dim: int
+        """
+        self.dim = dim
+
+    def _bucket(self, token):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if (value >> 63) & 1 else -1.0
+
+    def embed(self, texts):
+        """
+        Embed a list of texts.
+
+        :param texts: Texts to embed
+        :type texts: list
+        :return: Matrix of shape (len(texts), dim)
+        :rtype: numpy.ndarray
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                column, sign = self._bucket(feature)
+                vectors[row, column] += sign
+        return normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """
+    An embedder using OpenAI's embedding models through LangChain.
+    """
+
+    name = "openai"
+
+    def __init__(self, model="text-embedding-3-small", dim=1536):
+        """
+        Initialize the OpenAIEmbedder instance.
+
+        :param model: Name of the OpenAI embedding model
+        :type model: str
+        :param dim: Number of dimensions the model produces
+        :type dim: int
+        """
+        from langchain_openai import OpenAIEmbeddings
+
+        self.model = model
+        self.dim = dim
+        self.client = OpenAIEmbeddings(model=model, dimensions=dim)
+
+    def embed(self, texts):
+        """
+        Embed a list of texts.
+
+        :param texts: Texts to embed
+        :type texts: list
+        :return: Matrix of shape (len(texts), dim)
+        :rtype: numpy.ndarray
+        """
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        vectors = np.asarray(self.client.embed_documents(list(texts)), dtype=np.float32)
+        return normalize(vectors)
+
+
+def normalize(vectors):
+    """
+    L2-normalize the rows of a matrix in place.
+
+    :param vectors: Matrix of row vectors
+    :type vectors: numpy.ndarray
+    :return: The same matrix with unit-length rows (zero rows are left as is)
+    :rtype: numpy.ndarray
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def get_embedder(embedder_name, **kwargs):
+    """
+    Get an embedder by name.
+
+    :param embedder_name: Name of the embedder ('hashing' or 'openai')
+    :type embedder_name: str
+    :return: An instance of the requested embedder
+    :rtype: HashingEmbedder or OpenAIEmbedder
+    :raises ValueError: If an unknown embedder is requested
+    """
+    if embedder_name == 'hashing':
+        return HashingEmbedder(**kwargs)
+    elif embedder_name == 'openai':
+        return OpenAIEmbedder(**kwargs)
+    else:
+        raise ValueError(f"Unknown embedder: {embedder_name}")
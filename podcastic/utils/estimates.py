@@ -0,0 +1,162 @@
+"""
+Module for estimating the cost and duration of a run before making it.
+
+This module backs the ``--dry-run`` option. Latencies are taken from the metrics
+saved by previous runs under ``generated/``, falling back to typical values when
+there are none, and prices come from the ``pricing`` section of config.yaml.
+Nothing in this module calls a provider.
+"""
+
+import heapq
+from pathlib import Path
+
+from podcastic.utils.metrics import load_metrics
+
+DEFAULT_TTS_LATENCY = 3.0
+DEFAULT_UTTERANCE_LATENCY = 2.5
+DEFAULT_OUTLINE_LATENCY = 8.0
+DEFAULT_UTTERANCE_TOKENS = 45
+DEFAULT_OUTLINE_TOKENS = 350
+METRICS_FILES = ("run_metrics.json", "write_metrics.json")
+
+
+def load_history(root: Path) -> dict:
+    """
+    Combine the metrics saved by previous runs.
+
+    Counters are summed and timings are merged by count, so means are weighted
+    by the number of observations. For p95 the highest value of any run is kept.
+
+    :param root: Directory holding one output directory per episode
+    :type root: Path
+    :return: Combined counters and timings, and the number of metrics files read
+    :rtype: dict
+    """
+    history = {"counters": {}, "timings": {}, "runs": 0}
+    for path in sorted(Path(root).glob("*/*.json")):
+        if path.name not in METRICS_FILES:
+            continue
+        snapshot = load_metrics(path)
+        if not snapshot:
+            continue
+        history["runs"] += 1
+        for name, value in snapshot.get("counters", {}).items():
+            history["counters"][name] = history["counters"].get(name, 0) + value
+        for name, timing in snapshot.get("timings", {}).items():
+            merged = history["timings"].setdefault(name, {"count": 0, "total": 0.0, "p95": 0.0})
+            merged["count"] += timing.get("count", 0)
+            merged["total"] += timing.get("total", 0.0)
+            merged["p95"] = max(merged["p95"], timing.get("p95", 0.0))
+    return history
+
+
+def mean_latency(history: dict, name: str, default: float) -> tuple:
+    """
+    Look up the mean of a timing across previous runs.
+
+    :return: The mean in seconds and whether it was measured (False if it is the default)
+    :rtype: tuple
+    """
+    timing = history["timings"].get(name)
+    if timing and timing["count"]:
+        return timing["total"] / timing["count"], True
+    return default, False
+
+
+def schedule(durations, concurrency: int) -> float:
+    """
+    Compute how long a list of requests takes on a fixed number of workers.
+
+    Requests start in order, each on the first worker to become free.
+
+    :param durations: Duration of each request in seconds
+    :type durations: list
+    :param concurrency: Number of requests in flight at once
+    :type concurrency: int
+    :return: Time until the last request finishes
+    :rtype: float
+    """
+    workers = [0.0] * max(1, concurrency)
+    for duration in durations:
+        heapq.heapreplace(workers, workers[0] + duration)
+    return max(workers)
+
+
+def tts_request_latencies(texts, service: str, history: dict) -> tuple:
+    """
+    Estimate the latency of a TTS request for each text.
+
+    With character counts from previous runs, half of the mean latency is taken
+    as fixed overhead and half scales with the length of the text.
+
+    :return: One latency per text, and whether they are based on measurements
+    :rtype: tuple
+    """
+    mean, measured = mean_latency(history, f"tts.{service}.latency", DEFAULT_TTS_LATENCY)
+    requests = history["timings"].get(f"tts.{service}.latency", {}).get("count", 0)
+    characters = history["counters"].get(f"tts.{service}.characters", 0)
+    if not (requests and characters):
+        return [mean for _ in texts], measured
+    mean_characters = characters / requests
+    return [mean * (0.5 + 0.5 * len(text) / mean_characters) for text in texts], measured
+
+
+def script_tokens(utterances: int, fixed_tokens: int, utterance_tokens: int, candidates: int = 1) -> tuple:
+    """
+    Estimate the tokens of writing a script whose history grows with every turn.
+
+    Every prompt carries the fixed part (persona, guidelines, instructions and
+    topic context) plus the conversation so far, so prompt tokens grow
+    quadratically with the number of utterances.
+
+    :param utterances: Number of utterances in the script
+    :type utterances: int
+    :param fixed_tokens: Tokens in every prompt besides the history
+    :type fixed_tokens: int
+    :param utterance_tokens: Tokens in an average utterance
+    :type utterance_tokens: int
+    :param candidates: Candidates requested per utterance
+    :type candidates: int
+    :return: Total prompt tokens and total completion tokens
+    :rtype: tuple
+    """
+    # "Ava: " and the blank line that follow each utterance in the history
+    history_tokens = utterance_tokens + 4
+    prompt = utterances * fixed_tokens + history_tokens * utterances * (utterances - 1) // 2
+    completion = utterances * candidates * utterance_tokens
+    return prompt, completion
+
+
+def llm_cost(config: dict, model: str, prompt_tokens: int, completion_tokens: int):
+    """
+    Price LLM usage with the rates in config.yaml.
+
+    :return: Cost in US dollars, or None if the model has no price configured
+    :rtype: float or None
+    """
+    prices = ((config.get('pricing') or {}).get('llm') or {}).get(model)
+    if not prices:
+        return None
+    return (prompt_tokens * prices['input'] + completion_tokens * prices['output']) / 1_000_000
+
+
+def tts_cost(config: dict, service: str, characters: int):
+    """
+    Price TTS usage with the rates in config.yaml.
+
+    :return: Cost in US dollars, or None if the service has no price configured
+    :rtype: float or None
+    """
+    price = ((config.get('pricing') or {}).get('tts') or {}).get(service)
+    if price is None:
+        return None
+    return characters * price / 1_000_000
+
+
+def format_cost(cost) -> str:
+    return "unknown (no price in config.yaml)" if cost is None else f"${cost:.4f}"
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
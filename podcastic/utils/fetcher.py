@@ -0,0 +1,186 @@
+"""
+Module for fetching research sources over HTTP.
+
+This module provides an asynchronous fetch stage with bounded concurrency per host
+and an on-disk HTTP cache. Cached responses are revalidated with their ETag and
+Last-Modified validators, so pages that have not changed come back as a cheap
+304 and can be skipped by the indexer.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+
+from podcastic.utils.metrics import run_metrics
+
+FetchResult = namedtuple("FetchResult", ["url", "status", "content", "content_type", "error"])
+
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"
+FAILED = "failed"
+
+
+class HTTPCache:
+    """
+    An on-disk cache of HTTP response bodies and their validators.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Initialize the HTTPCache instance.
+
+        :param path: Directory holding the cached responses
+        :type path: Path
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def entry(self, url):
+        """
+        Return the cached metadata for a URL.
+
+        :param url: URL of the cached response
+        :type url: str
+        :return: Metadata with the etag, last_modified and content_type, or None
+        :rtype: dict or None
+        """
+        meta_path = self.path / f"{self._key(url)}.json"
+        body_path = self.path / f"{self._key(url)}.body"
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        return json.loads(meta_path.read_text())
+
+    def validators(self, url):
+        """
+        Build the conditional request headers for a URL.
+
+        :param url: URL about to be requested
+        :type url: str
+        :return: If-None-Match and/or If-Modified-Since headers
+        :rtype: dict
+        """
+        entry = self.entry(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def body(self, url):
+        """
+        Read the cached body for a URL.
+
+        :param url: URL of the cached response
+        :type url: str
+        :return: Cached response body
+        :rtype: str
+        """
+        return (self.path / f"{self._key(url)}.body").read_text(encoding="utf-8")
+
+    def store(self, url, response):
+        """
+        Store a successful response in the cache.
+
+        :param url: URL that was requested
+        :type url: str
+        :param response: The response to cache
+        :type response: requests.Response
+        """
+        key = self._key(url)
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type", ""),
+        }
+        # Body first, metadata last: an entry only counts once both exist
+        for suffix, data in (("body", response.text), ("json", json.dumps(entry))):
+            tmp_path = self.path / f"{key}.{suffix}.tmp"
+            tmp_path.write_text(data, encoding="utf-8")
+            os.replace(tmp_path, self.path / f"{key}.{suffix}")
+
+
+def fetch_url(url, cache, timeout=30):
+    """
+    Fetch a single URL, revalidating any cached copy.
+
+    :param url: URL to fetch
+    :type url: str
+    :param cache: Cache used for conditional requests
+    :type cache: HTTPCache
+    :param timeout: Request timeout in seconds
+    :type timeout: float
+    :return: The outcome of the request
+    :rtype: FetchResult
+    """
+    try:
+        response = requests.get(url, headers=cache.validators(url), timeout=timeout)
+        if response.status_code == 304:
+            entry = cache.entry(url)
+            if entry is not None:
+                run_metrics.increment("research.fetch.not_modified")
+                return FetchResult(url, NOT_MODIFIED, cache.body(url), entry["content_type"], None)
+            # The cached copy is gone, or was never there: ask for the full page
+            response = requests.get(url, timeout=timeout)
+            if response.status_code == 304:
+                run_metrics.increment("research.fetch.failed")
+                return FetchResult(url, FAILED, None, None, "304 Not Modified, but no cached copy to use")
+        response.raise_for_status()
+        cache.store(url, response)
+        run_metrics.increment("research.fetch.fetched")
+        run_metrics.increment("research.fetch.bytes", len(response.content))
+        return FetchResult(url, FETCHED, response.text, response.headers.get("Content-Type", ""), None)
+    except (requests.RequestException, OSError) as e:
+        run_metrics.increment("research.fetch.failed")
+        return FetchResult(url, FAILED, None, None, str(e))
+
+
+async def fetch_all(urls, cache, max_per_host=2, max_connections=8, timeout=30):
+    """
+    Fetch URLs concurrently, yielding each result as soon as it arrives.
+
+    At most ``max_per_host`` requests go to the same host at once and at most
+    ``max_connections`` are in flight overall.
+
+    :param urls: URLs to fetch; duplicates are fetched once
+    :type urls: list
+    :param cache: Cache used for conditional requests
+    :type cache: HTTPCache
+    :param max_per_host: Maximum concurrent requests per host
+    :type max_per_host: int
+    :param max_connections: Maximum concurrent requests overall
+    :type max_connections: int
+    :param timeout: Request timeout in seconds
+    :type timeout: float
+    :return: Asynchronous iterator of FetchResult, in completion order
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_connections)
+    overall = asyncio.Semaphore(max_connections)
+    per_host = {}
+
+    async def fetch_one(url):
+        host_limit = per_host.setdefault(urlsplit(url).netloc, asyncio.Semaphore(max_per_host))
+        async with host_limit, overall:
+            return await loop.run_in_executor(executor, fetch_url, url, cache, timeout)
+
+    tasks = [asyncio.ensure_future(fetch_one(url)) for url in dict.fromkeys(urls)]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False)
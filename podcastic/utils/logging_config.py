@@ -0,0 +1,124 @@
+"""
+Module for configuring logging.
+
+This module sets up logging once, from the options of the CLI, instead of at
+import time. Records are put on a queue by a QueueHandler and written by a
+QueueListener thread, so the pipeline never waits on the console or a log file.
+Bulky payloads such as prompts, outlines and scripts go to trace loggers, which
+are silent unless a trace file is given, and can be sampled.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+DEFAULT_LEVEL = "WARNING"
+TRACE_LOGGER = "podcastic.trace"
+
+_installed = []
+
+
+def get_trace_logger(name: str) -> logging.Logger:
+    """
+    Get the trace logger of a module, for payloads too bulky for the main log.
+
+    Its records only go to the trace file, if one is configured.
+
+    :param name: Name of the module
+    :type name: str
+    :rtype: logging.Logger
+    """
+    return logging.getLogger(f"{TRACE_LOGGER}.{name}")
+
+
+class SampleFilter(logging.Filter):
+    """
+    Let through a random fraction of records.
+    """
+
+    def __init__(self, rate: float, rng=random.random):
+        """
+        Initialize the SampleFilter instance.
+
+        :param rate: Fraction of records to keep, between 0 and 1
+        :type rate: float
+        :param rng: Function returning a random float in [0, 1)
+        :type rng: callable
+        """
+        super().__init__()
+        self.rate = rate
+        self.rng = rng
+
+    def filter(self, record):
+        return self.rng() < self.rate
+
+
+def configure_logging(level: str = DEFAULT_LEVEL, log_file=None, trace_file=None, trace_sample: float = 1.0):
+    """
+    Route log records through a background queue to the console and log files.
+
+    Calling it again replaces the previous configuration.
+
+    :param level: Level of the main log, such as "DEBUG" or "WARNING"
+    :type level: str
+    :param log_file: File to write the main log to, besides the console
+    :type log_file: str or Path or None
+    :param trace_file: File to write prompts, outlines and scripts to; without it they are not logged
+    :type trace_file: str or Path or None
+    :param trace_sample: Fraction of trace records to keep
+    :type trace_sample: float
+    :raises ValueError: If the level is not a logging level
+    """
+    level = level.upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f"Unknown log level '{level}'")
+    stop_logging()
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, mode="w"))
+    root = logging.getLogger()
+    root.setLevel(level)
+    _install(root, handlers, formatter)
+
+    trace = logging.getLogger(TRACE_LOGGER)
+    trace.propagate = False
+    if not trace_file:
+        # Disabled loggers drop records before their arguments are formatted
+        trace.setLevel(logging.CRITICAL + 1)
+        return
+    trace.setLevel(logging.DEBUG)
+    queue_handler = _install(trace, [logging.FileHandler(trace_file, mode="w")], formatter)
+    if trace_sample < 1.0:
+        queue_handler.addFilter(SampleFilter(trace_sample))
+
+
+def stop_logging():
+    """
+    Write out queued records and remove the handlers installed by configure_logging.
+    """
+    while _installed:
+        logger, queue_handler, listener = _installed.pop()
+        listener.stop()
+        logger.removeHandler(queue_handler)
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _install(logger, handlers, formatter):
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    logger.addHandler(queue_handler)
+    _installed.append((logger, queue_handler, listener))
+    return queue_handler
+
+
+atexit.register(stop_logging)
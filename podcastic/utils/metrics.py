@@ -0,0 +1,157 @@
+"""
+Module for collecting run metrics.
+
+This module provides a small, thread-safe registry for counters, gauges and
+timings recorded while a command runs. Commands save a snapshot next to their
+output so later runs (and the dry-run planner) can inspect what happened.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class RunMetrics:
+    """
+    A thread-safe collection of counters, gauges and timing observations.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty RunMetrics instance.
+        """
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Discard everything recorded so far.
+        """
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.timings = {}
+
+    def increment(self, name, value=1):
+        """
+        Add a value to a counter.
+
+        :param name: Name of the counter
+        :type name: str
+        :param value: Amount to add
+        :type value: int or float
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """
+        Set a gauge to its current value.
+
+        :param name: Name of the gauge
+        :type name: str
+        :param value: Current value of the gauge
+        :type value: int, float, str or dict
+        """
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        """
+        Record a single timing observation.
+
+        :param name: Name of the timing series
+        :type name: str
+        :param seconds: Observed duration in seconds
+        :type seconds: float
+        """
+        with self._lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Time the enclosed block and record it under the given name.
+
+        :param name: Name of the timing series
+        :type name: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Return a JSON-serializable summary of the recorded metrics.
+
+        :return: Counters, gauges and summarized timings
+        :rtype: dict
+        """
+        with self._lock:
+            timings = {name: summarize_timings(values) for name, values in self.timings.items()}
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings": timings,
+            }
+
+    def save(self, path: Path):
+        """
+        Write a snapshot of the recorded metrics to a JSON file.
+
+        :param path: Path of the JSON file to write
+        :type path: Path
+        :return: Path of the written file
+        :rtype: Path
+        """
+        path = Path(path)
+        path.write_text(json.dumps(self.snapshot(), indent=2, sort_keys=True))
+        return path
+
+
+def summarize_timings(values):
+    """
+    Summarize a list of durations.
+
+    :param values: Observed durations in seconds
+    :type values: list
+    :return: Count, total, mean, p50, p95 and max of the durations
+    :rtype: dict
+    """
+    if not values:
+        return {"count": 0, "total": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    count = len(ordered)
+    return {
+        "count": count,
+        "total": sum(ordered),
+        "mean": sum(ordered) / count,
+        "p50": ordered[int(0.50 * (count - 1))],
+        "p95": ordered[int(0.95 * (count - 1))],
+        "max": ordered[-1],
+    }
+
+
+def load_metrics(path: Path):
+    """
+    Load a metrics snapshot previously written by RunMetrics.save.
+
+    :param path: Path of the JSON file
+    :type path: Path
+    :return: The snapshot, or None if the file does not exist or is unreadable
+    :rtype: dict or None
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+run_metrics = RunMetrics()
@@ -0,0 +1,280 @@
+"""
+Module for working with MPEG audio Layer III frames.
+
+This module provides just enough of the MP3 bitstream format to read frame
+headers, measure durations without decoding, check files for truncation and
+corruption, and write silent frames. Silent frames carry an all-zero side info
+block, which every decoder plays back as silence, so pauses can be produced
+without an encoder.
+"""
+
+import mmap
+import struct
+from collections import namedtuple
+
+FrameHeader = namedtuple("FrameHeader", ["version", "bitrate", "sample_rate", "channels", "frame_length", "samples"])
+ScanResult = namedtuple("ScanResult", ["frames", "duration", "declared_frames", "junk_bytes", "truncated_bytes", "problems"])
+
+VERSIONS = {0b11: "1", 0b10: "2", 0b00: "2.5"}
+VERSION_BITS = {version: bits for bits, version in VERSIONS.items()}
+BITRATES = {
+    "1": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "2": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+BITRATES["2.5"] = BITRATES["2"]
+SAMPLE_RATES = {
+    "1": [44100, 48000, 32000],
+    "2": [22050, 24000, 16000],
+    "2.5": [11025, 12000, 8000],
+}
+MONO = 0b11
+SILENT_BITRATE = 32
+# Size of the side info block, which a Xing/Info tag follows, by version and channels
+SIDE_INFO_SIZE = {("1", 1): 17, ("1", 2): 32, ("2", 1): 9, ("2", 2): 17, ("2.5", 1): 9, ("2.5", 2): 17}
+ID3V1_SIZE = 128
+
+
+def parse_frame_header(data, offset=0):
+    """
+    Parse the Layer III frame header starting at an offset.
+
+    :param data: Buffer holding MP3 data
+    :type data: bytes, bytearray, memoryview or mmap
+    :param offset: Position of the header in the buffer
+    :type offset: int
+    :return: The decoded header, or None if there is no valid header there
+    :rtype: FrameHeader or None
+    """
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = VERSIONS.get((b1 >> 3) & 0b11)
+    layer = (b1 >> 1) & 0b11
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0b11
+    if version is None or layer != 0b01 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    bitrate = BITRATES[version][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 1
+    channels = 1 if (b3 >> 6) == MONO else 2
+    if version == "1":
+        samples = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        frame_length = 72 * bitrate // sample_rate + padding
+    return FrameHeader(version, bitrate, sample_rate, channels, frame_length, samples)
+
+
+def audio_start(data):
+    """
+    Find where the audio starts, after any ID3v2 tag.
+
+    :param data: Buffer holding MP3 data
+    :type data: bytes, bytearray, memoryview or mmap
+    :return: Offset of the first byte after the tag (0 if there is none)
+    :rtype: int
+    """
+    if len(data) >= 10 and bytes(data[:3]) == b"ID3":
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _next_frame(data, start, end):
+    # Returns the first offset in [start, end) holding a frame header that is
+    # followed directly by another one (or by the end), ruling out sync-like
+    # bytes inside tags or junk
+    offset = data.find(b"\xff", start, end)
+    while offset != -1:
+        header = parse_frame_header(data, offset)
+        if header is not None:
+            following = offset + header.frame_length
+            if following >= end or parse_frame_header(data, following) is not None:
+                return offset, header
+        offset = data.find(b"\xff", offset + 1, end)
+    return None
+
+
+def first_frame(data, limit=65536):
+    """
+    Find the first frame header of a file.
+
+    :param data: Buffer holding MP3 data
+    :type data: bytes or mmap
+    :param limit: Number of bytes to scan after the ID3 tag
+    :type limit: int
+    :return: The offset and header of the first frame, or None if there is none
+    :rtype: tuple or None
+    """
+    start = audio_start(data)
+    return _next_frame(data, start, min(len(data), start + limit))
+
+
+def _declared_frames(data, offset, header):
+    # Reads the frame count of a Xing/Info or VBRI tag in the first frame.
+    # Returns (is_tag_frame, frame_count or None).
+    position = offset + 4 + SIDE_INFO_SIZE[(header.version, header.channels)]
+    tag = bytes(data[position:position + 4])
+    if tag in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", data, position + 4)[0] if position + 8 <= len(data) else 0
+        if flags & 1 and position + 12 <= len(data):
+            return True, struct.unpack_from(">I", data, position + 8)[0]
+        return True, None
+    if bytes(data[offset + 36:offset + 40]) == b"VBRI" and offset + 54 <= len(data):
+        return True, struct.unpack_from(">I", data, offset + 50)[0]
+    return False, None
+
+
+def scan(data):
+    """
+    Walk every frame of an MP3 file to check it is complete and measure it.
+
+    Frames are not decoded; only their headers are read, and each distinct
+    header is only parsed once. A Xing/Info or VBRI tag frame is not counted as
+    audio, and its frame count, when present, is checked against the frames
+    found, which catches files cut off at a frame boundary.
+
+    :param data: Contents of the file
+    :type data: bytes or mmap
+    :return: Frame count, exact duration in seconds, declared frame count,
+        bytes skipped to regain sync, bytes of a cut-off final frame, and a
+        description of each problem found
+    :rtype: ScanResult
+    """
+    problems = []
+    start = audio_start(data)
+    end = len(data)
+    if end - start >= ID3V1_SIZE and bytes(data[end - ID3V1_SIZE:end - ID3V1_SIZE + 3]) == b"TAG":
+        end -= ID3V1_SIZE
+    if start >= end:
+        return ScanResult(0, 0.0, None, 0, 0, ["no MPEG audio frames"])
+
+    found = _next_frame(data, start, end)
+    if found is None:
+        return ScanResult(0, 0.0, None, end - start, 0, ["no MPEG audio frames"])
+    offset, header = found
+    junk = offset - start
+    if junk:
+        problems.append(f"{junk} bytes of garbage before the first frame")
+    is_tag_frame, declared = _declared_frames(data, offset, header)
+    if is_tag_frame:
+        offset += header.frame_length
+
+    frames, samples, truncated = 0, 0, 0
+    sample_rate = header.sample_rate
+    known = {}
+    unpack = struct.Struct(">I").unpack_from
+    while offset < end:
+        if offset + 4 > end:
+            truncated = end - offset
+            break
+        word = unpack(data, offset)[0]
+        info = known.get(word)
+        if info is None:
+            header = parse_frame_header(data, offset)
+            if header is None:
+                found = _next_frame(data, offset + 1, end)
+                skipped = (found[0] if found else end) - offset
+                junk += skipped
+                problems.append(f"lost sync at byte {offset}, skipped {skipped} bytes")
+                if found is None:
+                    break
+                offset = found[0]
+                continue
+            if header.sample_rate != sample_rate:
+                problems.append(f"sample rate changes from {sample_rate} to {header.sample_rate} at byte {offset}")
+                sample_rate = header.sample_rate
+            info = known[word] = (header.frame_length, header.samples)
+        length, frame_samples = info
+        if offset + length > end:
+            truncated = end - offset
+            break
+        frames += 1
+        samples += frame_samples
+        offset += length
+
+    if truncated:
+        problems.append(f"last frame cut off ({truncated} bytes)")
+    if declared is not None and declared != frames:
+        problems.append(f"header declares {declared} frames but {frames} were found")
+    return ScanResult(frames, samples / sample_rate, declared, junk, truncated, problems)
+
+
+def scan_file(path):
+    """
+    Scan an MP3 file through a memory map.
+
+    :param path: Path of the file
+    :type path: str or Path
+    :return: The result of scan() (empty files report no frames)
+    :rtype: ScanResult
+    """
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return ScanResult(0, 0.0, None, 0, 0, ["empty file"])
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return scan(data)
+
+
+def iter_frames(data, offset=0):
+    """
+    Walk consecutive frame headers, stopping at the first gap or truncated frame.
+
+    :param data: Buffer holding MP3 data
+    :type data: bytes, bytearray, memoryview or mmap
+    :param offset: Position of the first frame header
+    :type offset: int
+    :return: Iterator of (offset, FrameHeader) pairs
+    """
+    while True:
+        header = parse_frame_header(data, offset)
+        if header is None or offset + header.frame_length > len(data):
+            return
+        yield offset, header
+        offset += header.frame_length
+
+
+def duration_of(data):
+    """
+    Measure the playback duration of a buffer of MP3 frames.
+
+    :param data: Buffer holding MP3 frames
+    :type data: bytes
+    :return: Duration in seconds (0.0 if the buffer holds no valid frames)
+    :rtype: float
+    """
+    return sum(header.samples / header.sample_rate for _, header in iter_frames(data))
+
+
+def silent_frames(seconds, sample_rate=24000):
+    """
+    Build mono MP3 frames that play back as silence.
+
+    :param seconds: Duration of the silence
+    :type seconds: float
+    :param sample_rate: Sample rate of the frames; match the surrounding audio
+    :type sample_rate: int
+    :return: Concatenated silent frames
+    :rtype: bytes
+    """
+    for version, rates in SAMPLE_RATES.items():
+        if sample_rate in rates:
+            break
+    else:
+        raise ValueError(f"Unsupported MP3 sample rate: {sample_rate}")
+    bitrate_index = BITRATES[version].index(SILENT_BITRATE)
+    header = bytes([
+        0xFF,
+        0xE0 | (VERSION_BITS[version] << 3) | (0b01 << 1) | 1,
+        (bitrate_index << 4) | (rates.index(sample_rate) << 2),
+        MONO << 6,
+    ])
+    samples = 1152 if version == "1" else 576
+    frame_length = (144 if version == "1" else 72) * SILENT_BITRATE * 1000 // sample_rate
+    frame = header + bytes(frame_length - len(header))
+    return frame * max(0, round(seconds * sample_rate / samples))
@@ -0,0 +1,65 @@
+"""
+Module for an offline stand-in Text-to-Speech service.
+
+This module provides a TTS service that needs no API key or network access. It
+returns silent MP3 audio whose length follows the text at a typical speaking
+rate, so the full pipeline (timing, pauses, streaming, compiling) can be
+exercised and measured without calling a provider.
+"""
+
+import time
+from pathlib import Path
+from rich.console import Console
+from podcastic.utils.mp3 import silent_frames
+
+console = Console()
+
+WORDS_PER_SECOND = 2.5
+
+
+class OfflineTTS:
+    """
+    A TTS service that produces silence of realistic length.
+    """
+
+    def __init__(self, latency=0.0, sample_rate=24000):
+        """
+        Initialize the OfflineTTS instance.
+
+        :param latency: Seconds each request takes, to simulate a provider
+        :type latency: float
+        :param sample_rate: Sample rate of the generated audio
+        :type sample_rate: int
+        """
+        self.latency = latency
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text, voice):
+        """
+        Synthesize text to silent MP3 audio in memory.
+
+        :param text: Text whose word count sets the duration
+        :type text: str
+        :param voice: Name of the voice (unused)
+        :type voice: str
+        :return: The MP3 audio
+        :rtype: bytes
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        return silent_frames(max(1, len(text.split())) / WORDS_PER_SECOND, self.sample_rate)
+
+    def generate_audio(self, text, output_path, voice):
+        """
+        Generate silent audio of realistic length for text.
+
+        :param text: Text whose word count sets the duration
+        :type text: str
+        :param output_path: Path to save the generated audio
+        :type output_path: str or Path
+        :param voice: Name of the voice (unused)
+        :type voice: str
+        """
+        output_path = Path(output_path)
+        output_path.write_bytes(self.synthesize(text, voice))
+        console.print(f"Generated: {output_path.name}")
@@ -8,6 +8,8 @@ import yaml
 from openai import OpenAI
 from pathlib import Path
 from rich.console import Console
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.rate_limiter import get_rate_limiter, load_rate_limit_settings
 
 console = Console()
 
@@ -16,15 +18,19 @@ class OpenAITTS:
     A class to handle Text-to-Speech conversion using OpenAI's API.
     """
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url=None):
         """
         Initialize the OpenAITTS instance.
 
         :param api_key: OpenAI API key
         :type api_key: str
+        :param base_url: Alternative API base URL, e.g. a local stand-in server
+        :type base_url: str or None
         """
-        self.client = OpenAI(api_key=api_key)
+        # Retries are handled by the shared rate limiter, not the SDK
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
         self.voice_mapping = self.load_voice_mapping()
+        self.rate_limiter = get_rate_limiter('openai', api_key, **load_rate_limit_settings('openai'))
 
     def load_voice_mapping(self):
         """
@@ -37,6 +43,30 @@ class OpenAITTS:
             config = yaml.safe_load(f)
         return {name: data['voice'] for name, data in config['openai'].items()}
 
+    def synthesize(self, text, voice):
+        """
+        Synthesize text to MP3 audio in memory.
+
+        :param text: Text to convert to speech
+        :type text: str
+        :param voice: Voice to use for TTS
+        :type voice: str
+        :return: The MP3 audio
+        :rtype: bytes
+        """
+        mapped_voice = self.voice_mapping.get(voice.lower(), 'alloy')
+
+        def request():
+            response = self.client.audio.speech.create(
+                model="tts-1",
+                voice=mapped_voice,
+                input=text
+            )
+            return response.content
+
+        run_metrics.increment("tts.openai.characters", len(text))
+        return self.rate_limiter.call(request)
+
     def generate_audio(self, text, output_path, voice):
         """
         Generate audio from text using OpenAI's TTS API.
@@ -51,13 +81,7 @@ class OpenAITTS:
         mapped_voice = self.voice_mapping.get(voice.lower(), 'alloy')
         console.print(f"Generating audio for {voice} (mapped to {mapped_voice})")
         
-        response = self.client.audio.speech.create(
-            model="tts-1",
-            voice=mapped_voice,
-            input=text
-        )
-
         output_path = Path(output_path)
-        response.stream_to_file(output_path)
+        output_path.write_bytes(self.synthesize(text, voice))
         
-        console.print(f"Generated: {output_path.name}")
\ No newline at end of file
+        console.print(f"Generated: {output_path.name}")
@@ -0,0 +1,299 @@
+"""
+Module for caching decoded PCM audio next to the generated MP3 segments.
+
+This module keeps one WAV sidecar per MP3 segment in a ``.pcm`` directory, so a
+recompile reads memory-mapped PCM instead of spawning a decoder per segment.
+Sidecars are invalidated when their MP3 changes: size and modification time are
+checked first, and the content hash settles the case where a file was touched
+but not changed. Segments that do need decoding are decoded in batches, with
+many inputs per decoder process and a few processes at a time.
+
+Segments can be MP3 files or segments of a SegmentPack, which are decoded
+straight from the pack and identified by the hash kept in its index.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import subprocess
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.mp3 import first_frame
+from podcastic.utils.segment_store import PackedSegment
+
+PCMFormat = namedtuple("PCMFormat", ["sample_rate", "channels", "sample_width"])
+
+DEFAULT_FORMAT = PCMFormat(24000, 1, 2)
+INDEX_FILE = "index.json"
+
+
+def _converter():
+    from pydub import AudioSegment
+    return AudioSegment.converter
+
+
+def ffmpeg_decode_batch(jobs, fmt):
+    """
+    Decode several MP3 files to WAV with a single ffmpeg process.
+
+    :param jobs: Pairs of MP3 path and WAV path to write
+    :type jobs: list
+    :param fmt: Format every WAV file is converted to
+    :type fmt: PCMFormat
+    :raises RuntimeError: If ffmpeg fails
+    """
+    command = [_converter(), "-hide_banner", "-loglevel", "error", "-y"]
+    for source, _ in jobs:
+        command += ["-i", str(source)]
+    for i, (_, destination) in enumerate(jobs):
+        command += [
+            "-map", f"{i}:a:0", "-map_metadata", "-1", "-bitexact",
+            "-ac", str(fmt.channels), "-ar", str(fmt.sample_rate),
+            "-c:a", f"pcm_s{8 * fmt.sample_width}le", "-f", "wav", str(destination),
+        ]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {len(jobs)} segments: {result.stderr.decode(errors='replace')}")
+
+
+def ffmpeg_encode_mp3(buffers, output_path, fmt):
+    """
+    Encode a sequence of PCM buffers to one MP3 file with a single ffmpeg process.
+
+    :param buffers: Raw PCM buffers, written to the encoder in order
+    :type buffers: iterable
+    :param output_path: Path of the MP3 file to write
+    :type output_path: Path
+    :param fmt: Format of the PCM buffers
+    :type fmt: PCMFormat
+    :raises RuntimeError: If ffmpeg fails, including when it exits before reading all of the buffers
+    """
+    command = [
+        _converter(), "-hide_banner", "-loglevel", "error", "-y",
+        "-f", f"s{8 * fmt.sample_width}le", "-ar", str(fmt.sample_rate), "-ac", str(fmt.channels),
+        "-i", "-", "-f", "mp3", str(output_path),
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Drained while the buffers are written, so a full stderr pipe cannot stall ffmpeg
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    broken_pipe = False
+    try:
+        try:
+            for buffer in buffers:
+                process.stdin.write(buffer)
+        finally:
+            process.stdin.close()
+    except BrokenPipeError:
+        # ffmpeg exited before reading everything; its error output says why
+        broken_pipe = True
+    returncode = process.wait()
+    reader.join()
+    if returncode != 0 or broken_pipe:
+        message = b"".join(stderr).decode(errors="replace").strip() or f"exit status {returncode}"
+        raise RuntimeError(f"ffmpeg failed to encode {output_path}: {message}")
+
+
+def wav_data(buffer):
+    """
+    Locate the format and the sample data of a WAV file.
+
+    :param buffer: The WAV file contents
+    :type buffer: bytes or mmap
+    :return: The format, the offset of the sample data and its length
+    :rtype: tuple
+    :raises ValueError: If the buffer is not a PCM WAV file
+    """
+    if bytes(buffer[:4]) != b"RIFF" or bytes(buffer[8:12]) != b"WAVE":
+        raise ValueError("Not a WAV file")
+    offset, fmt = 12, None
+    while offset + 8 <= len(buffer):
+        chunk_id = bytes(buffer[offset:offset + 4])
+        size = struct.unpack_from("<I", buffer, offset + 4)[0]
+        if chunk_id == b"fmt ":
+            _, channels, sample_rate = struct.unpack_from("<HHI", buffer, offset + 8)
+            bits = struct.unpack_from("<H", buffer, offset + 22)[0]
+            fmt = PCMFormat(sample_rate, channels, bits // 8)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            # Streamed WAV files may leave the size unset; the data runs to the end
+            length = min(size, len(buffer) - offset - 8)
+            return fmt, offset + 8, length
+        offset += 8 + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def _segment(path):
+    return path if isinstance(path, PackedSegment) else Path(path)
+
+
+def _head(segment, size):
+    if isinstance(segment, PackedSegment):
+        return segment.read(size)
+    with open(segment, "rb") as f:
+        return f.read(size)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PCMCache:
+    """
+    Decoded PCM sidecars for the MP3 segments of one episode.
+    """
+
+    def __init__(self, directory: Path, decoder=ffmpeg_decode_batch, batch_size=32, max_workers=4):
+        """
+        Initialize the PCMCache instance.
+
+        :param directory: Directory holding the sidecars and their index
+        :type directory: Path
+        :param decoder: Function decoding a batch of (MP3, WAV) pairs to a PCMFormat
+        :type decoder: callable
+        :param batch_size: Maximum number of segments per decoder process
+        :type batch_size: int
+        :param max_workers: Maximum number of decoder processes at once
+        :type max_workers: int
+        """
+        self.directory = Path(directory)
+        self.decoder = decoder
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        index_path = self.directory / INDEX_FILE
+        self.index = json.loads(index_path.read_text()) if index_path.exists() else {}
+
+    def sidecar(self, mp3_path: Path) -> Path:
+        return self.directory / f"{_segment(mp3_path).stem}.wav"
+
+    def target_format(self, mp3_paths) -> PCMFormat:
+        """
+        Pick one PCM format that every segment can be decoded to without loss.
+
+        The format is read from the MP3 frame headers, so no decoder is needed.
+
+        :param mp3_paths: Segments that will be stitched together
+        :type mp3_paths: list
+        :return: Highest sample rate and channel count among the segments
+        :rtype: PCMFormat
+        """
+        sample_rate, channels = 0, 0
+        for path in mp3_paths:
+            found = first_frame(_head(_segment(path), 1 << 16))
+            if found:
+                sample_rate = max(sample_rate, found[1].sample_rate)
+                channels = max(channels, found[1].channels)
+        return PCMFormat(sample_rate or DEFAULT_FORMAT.sample_rate, channels or DEFAULT_FORMAT.channels,
+                         DEFAULT_FORMAT.sample_width)
+
+    def is_fresh(self, mp3_path: Path, fmt: PCMFormat) -> bool:
+        """
+        Check whether a segment's sidecar is still valid.
+
+        :param mp3_path: The segment
+        :type mp3_path: Path or PackedSegment
+        :param fmt: The format the sidecar must have
+        :type fmt: PCMFormat
+        :return: True if the sidecar can be used as is
+        :rtype: bool
+        """
+        entry = self.index.get(_segment(mp3_path).name)
+        if not entry or PCMFormat(*entry["format"]) != fmt or not self.sidecar(mp3_path).exists():
+            return False
+        if isinstance(mp3_path, PackedSegment):
+            return mp3_path.size == entry["size"] and mp3_path.sha256 == entry["sha256"]
+        stat = os.stat(mp3_path)
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry.get("mtime_ns"):
+            return True
+        if stat.st_size == entry["size"] and _sha256(mp3_path) == entry["sha256"]:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            return True
+        return False
+
+    def ensure(self, mp3_paths, fmt: PCMFormat) -> int:
+        """
+        Decode every segment whose sidecar is missing or stale.
+
+        :param mp3_paths: Segments that need sidecars
+        :type mp3_paths: list
+        :param fmt: Format to decode to
+        :type fmt: PCMFormat
+        :return: Number of segments decoded
+        :rtype: int
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stale = [_segment(path) for path in dict.fromkeys(mp3_paths) if not self.is_fresh(path, fmt)]
+        batches = [stale[i:i + self.batch_size] for i in range(0, len(stale), self.batch_size)]
+
+        def decode(batch):
+            jobs = [(path, self.sidecar(path).with_suffix(".tmp.wav")) for path in batch]
+            self.decoder(jobs, fmt)
+            for path, temp_path in jobs:
+                os.replace(temp_path, self.sidecar(path))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for _ in executor.map(decode, batches):
+                pass
+
+        for path in stale:
+            if isinstance(path, PackedSegment):
+                self.index[path.name] = {"size": path.size, "sha256": path.sha256, "format": list(fmt)}
+                continue
+            stat = path.stat()
+            self.index[path.name] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": _sha256(path),
+                "format": list(fmt),
+            }
+        self._save_index()
+        run_metrics.increment("compile.pcm_cache.decoded", len(stale))
+        run_metrics.increment("compile.pcm_cache.reused", len(mp3_paths) - len(stale))
+        return len(stale)
+
+    @contextmanager
+    def pcm(self, mp3_path: Path):
+        """
+        Memory-map the decoded samples of a segment for the duration of a with block.
+
+        The map is closed when the block exits, so a stitch holds one sidecar
+        open at a time.
+
+        :param mp3_path: The segment
+        :type mp3_path: Path
+        :return: The raw PCM samples, valid inside the with block
+        :rtype: memoryview
+        """
+        with open(self.sidecar(mp3_path), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            _, offset, length = wav_data(mapped)
+            with memoryview(mapped)[offset:offset + length] as samples:
+                yield samples
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                # The encoder kept a view of the samples; the map is released with it
+                pass
+
+    def _save_index(self):
+        temp_path = self.directory / f"{INDEX_FILE}.tmp"
+        temp_path.write_text(json.dumps(self.index, indent=2))
+        os.replace(temp_path, self.directory / INDEX_FILE)
@@ -0,0 +1,232 @@
+"""
+Module for previewing part of an episode.
+
+This module selects a window of a script, either by segment number or by time.
+It synthesizes the segments in that window that have no usable audio for their
+current text, and renders just the window to a preview file, preceded by a
+short lead-in of the segments before it. The work done depends on the size of
+the window, not on the length of the episode.
+"""
+
+import re
+from collections import namedtuple
+from pathlib import Path
+
+from podcastic.utils.audio_utils import (
+    SynthesisPool, check_segment, load_segment_texts, segment_filename, stitch_audio_files
+)
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.offline_tts import WORDS_PER_SECOND
+from podcastic.utils.pcm_cache import PCMCache
+from podcastic.utils.segment_store import SegmentPack
+
+DEFAULT_LEAD_IN = 3.0
+PREVIEW_DIR = "previews"
+
+SEGMENT_WINDOW_PATTERN = re.compile(r"^(\d+)-(\d+)$")
+TIME_PATTERN = re.compile(r"^(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d+)?)s?$")
+
+Preview = namedtuple("Preview", ["path", "synthesized", "unverified"])
+
+
+def parse_time(text: str) -> float:
+    """
+    Parse a time such as "90", "90s", "1:30" or "1:01:30" into seconds.
+
+    :raises ValueError: If the time cannot be parsed
+    :rtype: float
+    """
+    match = TIME_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid time '{text}'")
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds)
+
+
+def parse_window(spec: str) -> tuple:
+    """
+    Parse a window of a script.
+
+    Plain numbers such as "40-60" are segment numbers, counted from 1 like the
+    audio file names and including pauses. Anything with a colon or an "s"
+    suffix, such as "2:30-4:00" or "150s-240s", is a time range.
+
+    :param spec: The window
+    :type spec: str
+    :return: ("segments", first, last) or ("time", start, end)
+    :rtype: tuple
+    :raises ValueError: If the window cannot be parsed or is empty
+    """
+    spec = spec.strip()
+    match = SEGMENT_WINDOW_PATTERN.match(spec)
+    if match:
+        first, last = int(match.group(1)), int(match.group(2))
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid segment range '{spec}'")
+        return "segments", first, last
+    start, _, end = spec.partition("-")
+    if not end:
+        raise ValueError(f"Invalid window '{spec}': expected a range such as 40-60 or 2:30-4:00")
+    start, end = parse_time(start), parse_time(end)
+    if end <= start:
+        raise ValueError(f"Invalid time range '{spec}'")
+    return "time", start, end
+
+
+def locate_audio(segments, output_dir: Path, store: SegmentPack = None) -> dict:
+    """
+    Find the usable audio of every speech segment of a script.
+
+    Segments with no audio, with audio that is cut off or corrupt, or with audio
+    synthesized from a different text are left out. Audio with no recorded text,
+    such as files from before texts were recorded, is kept but marked unverified:
+    it may not match an edited script.
+
+    :param segments: Segments as returned by parse_ssml
+    :type segments: list
+    :param output_dir: The episode's output directory
+    :type output_dir: Path
+    :param store: The episode's segment pack, if it has one
+    :type store: SegmentPack or None
+    :return: The audio file (or packed segment), its duration and whether its text
+        was verified, by segment index
+    :rtype: dict
+    """
+    recorded = load_segment_texts(output_dir) if store is None else {}
+    found = {}
+    for index, segment in enumerate(segments):
+        if segment[0] != "speech":
+            continue
+        name = segment_filename(index, segment[1])
+        if store is not None:
+            if name not in store:
+                continue
+            audio = store.get(name)
+            text = audio.entry.get("text")
+        else:
+            audio = Path(output_dir) / name
+            if not audio.exists():
+                continue
+            text = recorded.get(name)
+        if text is not None and text != segment[2]:
+            continue
+        duration, problems = check_segment(audio, segment[2])
+        if not problems:
+            found[index] = (audio, duration, text is not None)
+    return found
+
+
+def durations(segments, audio: dict) -> list:
+    """
+    Duration of every segment: exact where audio exists, estimated from the word count otherwise.
+
+    :rtype: list
+    """
+    result = []
+    for index, segment in enumerate(segments):
+        if segment[0] == "pause":
+            result.append(segment[1])
+        elif index in audio:
+            result.append(audio[index][1])
+        else:
+            result.append(max(1, len(segment[2].split())) / WORDS_PER_SECOND)
+    return result
+
+
+def select_window(segments, window: tuple, segment_durations: list) -> range:
+    """
+    Select the segments of a script that fall in a window.
+
+    :param segments: Segments as returned by parse_ssml
+    :type segments: list
+    :param window: A window as returned by parse_window
+    :type window: tuple
+    :param segment_durations: Duration of each segment
+    :type segment_durations: list
+    :return: Indexes of the segments in the window
+    :rtype: range
+    :raises ValueError: If the window lies outside the script
+    """
+    kind, start, end = window
+    if kind == "segments":
+        if start > len(segments):
+            raise ValueError(f"The script has only {len(segments)} segments")
+        return range(start - 1, min(end, len(segments)))
+    selected, elapsed = [], 0.0
+    for index, duration in enumerate(segment_durations):
+        if elapsed < end and elapsed + duration > start:
+            selected.append(index)
+        elapsed += duration
+    if not selected:
+        raise ValueError(f"The script is only about {elapsed:.0f}s long")
+    return range(selected[0], selected[-1] + 1)
+
+
+def lead_in(first: int, segment_durations: list, seconds: float) -> range:
+    """
+    Select the segments just before a window that make up its lead-in.
+
+    Whole segments are taken, going back until at least ``seconds`` are covered.
+
+    :rtype: range
+    """
+    begin, covered = first, 0.0
+    while begin > 0 and covered < seconds:
+        begin -= 1
+        covered += segment_durations[begin]
+    return range(begin, first)
+
+
+def render_preview(segments, output_dir: Path, stem: str, window: tuple, lead_in_seconds: float = DEFAULT_LEAD_IN,
+                   store: SegmentPack = None, service=None) -> tuple:
+    """
+    Render a preview of a window of a script.
+
+    :param segments: Segments of the script, as returned by parse_ssml
+    :type segments: list
+    :param output_dir: The episode's output directory
+    :type output_dir: Path
+    :param stem: Name of the episode, used to name the preview
+    :type stem: str
+    :param window: A window as returned by parse_window
+    :type window: tuple
+    :param lead_in_seconds: Context to play before the window
+    :type lead_in_seconds: float
+    :param store: The episode's segment pack, if it has one
+    :type store: SegmentPack or None
+    :param service: TTS service for segments without usable audio; if None, they are an error
+    :type service: OpenAITTS, ElevenLabsTTS or None
+    :return: Path of the preview, number of segments synthesized and names of the
+        segments used without a recorded text to check against the script
+    :rtype: Preview
+    :raises ValueError: If the window is invalid, or audio is missing and no service is given
+    """
+    audio = locate_audio(segments, output_dir, store)
+    segment_durations = durations(segments, audio)
+    selected = select_window(segments, window, segment_durations)
+    needed = list(lead_in(selected.start, segment_durations, lead_in_seconds)) + list(selected)
+
+    missing = [index for index in needed if segments[index][0] == "speech" and index not in audio]
+    if missing and service is None:
+        names = ", ".join(segment_filename(index, segments[index][1]) for index in missing)
+        raise ValueError(f"No usable audio for {names}; run 'generate' with the same window to synthesize it")
+    if missing:
+        pool = SynthesisPool(service, output_dir, store)
+        for index in missing:
+            pool.add(index, segments[index])
+        pool.wait()
+        for index in missing:
+            audio[index] = (pool.audio_files[index][1], None, True)
+    run_metrics.increment("preview.synthesized", len(missing))
+
+    audio_files = [
+        ("pause", segments[index][1]) if segments[index][0] == "pause" else ("audio", audio[index][0])
+        for index in needed
+    ]
+    preview_path = Path(output_dir) / PREVIEW_DIR / f"{stem}_{selected.start + 1:03d}-{selected.stop:03d}.mp3"
+    preview_path.parent.mkdir(parents=True, exist_ok=True)
+    stitch_audio_files(audio_files, preview_path, cache=PCMCache(Path(output_dir) / ".pcm"))
+    unverified = [
+        segment_filename(index, segments[index][1]) for index in needed if index in audio and not audio[index][2]
+    ]
+    return Preview(preview_path, len(missing), unverified)
@@ -0,0 +1,226 @@
+"""
+Module for profiling Podcastic commands.
+
+This module provides the profiler behind the global ``--profile`` option and the
+named spans placed around the expensive stages of the pipeline. A profiled run
+writes three files per command:
+
+- ``<command>.folded`` (sampling profiler) or ``<command>.pstats`` (cProfile):
+  folded stacks load directly into flamegraph.pl, speedscope or inferno, and the
+  pstats dump into snakeviz or flameprof
+- ``<command>.txt``: the top functions, the time spent in each named span, and
+  the top allocation sites and peak memory from tracemalloc
+
+The sampling profiler walks the stacks of every thread, so time spent waiting on
+LLM and TTS requests in worker threads, or on ffmpeg subprocesses, shows up under
+the call that is waiting for it.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILERS = ("sampling", "cprofile")
+
+_active = None
+
+
+@contextmanager
+def span(name):
+    """
+    Time a named stage of the pipeline while a profiler is active.
+
+    Works as a context manager and as a function decorator. Outside profiled
+    runs it does nothing beyond a global lookup.
+
+    :param name: Name of the span in the profile summary
+    :type name: str
+    """
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_span(name, time.perf_counter() - started)
+
+
+class StackSampler:
+    """
+    Sample the Python stacks of all threads at a fixed interval.
+    """
+
+    def __init__(self, interval=0.005):
+        """
+        Initialize the StackSampler instance.
+
+        :param interval: Seconds between samples
+        :type interval: float
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="podcastic-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_folded(self, path):
+        """
+        Write the samples in the folded stack format used by flame graph tools.
+
+        :param path: File to write
+        :type path: Path
+        """
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, n):
+        """
+        Summarize the functions that were on the stack most often.
+
+        :param n: Number of functions to list
+        :type n: int
+        :return: Lines of the summary
+        :rtype: list
+        """
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        total = sum(self.stacks.values()) or 1
+        lines = [f"{'self %':>7} {'total %':>7}  function"]
+        for frame, count in own.most_common(n):
+            lines.append(f"{100 * count / total:7.1f} {100 * inclusive[frame] / total:7.1f}  {frame}")
+        return lines
+
+
+class Profiler:
+    """
+    Profile one command: CPU time, named spans and memory allocations.
+    """
+
+    def __init__(self, command, output_dir, method="sampling", top=25, interval=0.005):
+        """
+        Initialize the Profiler instance.
+
+        :param command: Name of the command being profiled
+        :type command: str
+        :param output_dir: Directory the profile files are written to
+        :type output_dir: Path
+        :param method: 'sampling' for folded stacks, or 'cprofile' for deterministic profiling
+        :type method: str
+        :param top: Number of entries in each section of the summary
+        :type top: int
+        :param interval: Seconds between samples for the sampling profiler
+        :type interval: float
+        """
+        if method not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {method} (expected one of {', '.join(PROFILERS)})")
+        self.command = command
+        self.output_dir = Path(output_dir)
+        self.method = method
+        self.top = top
+        self.spans = defaultdict(list)
+        self._lock = threading.Lock()
+        self._profile = cProfile.Profile() if method == "cprofile" else None
+        self._sampler = StackSampler(interval) if method == "sampling" else None
+        self._started = None
+        self._elapsed = None
+
+    def record_span(self, name, seconds):
+        with self._lock:
+            self.spans[name].append(seconds)
+
+    def start(self):
+        """
+        Start profiling and make this profiler the target of named spans.
+        """
+        global _active
+        _active = self
+        tracemalloc.start()
+        self._started = time.perf_counter()
+        if self._profile is not None:
+            self._profile.enable()
+        else:
+            self._sampler.start()
+
+    def stop(self):
+        """
+        Stop profiling and write the profile files.
+
+        :return: Path of the summary file
+        :rtype: Path
+        """
+        global _active
+        if self._profile is not None:
+            self._profile.disable()
+        else:
+            self._sampler.stop()
+        self._elapsed = time.perf_counter() - self._started
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _active = None
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self._profile is not None:
+            self._profile.dump_stats(self.output_dir / f"{self.command}.pstats")
+            stream = io.StringIO()
+            pstats.Stats(self._profile, stream=stream).sort_stats("cumulative").print_stats(self.top)
+            functions = stream.getvalue().strip().splitlines()
+        else:
+            self._sampler.write_folded(self.output_dir / f"{self.command}.folded")
+            functions = self._sampler.top(self.top)
+
+        lines = [f"Profile of '{self.command}' ({self.method}): {self._elapsed:.2f}s wall time", ""]
+        lines += ["Top functions:"] + functions + [""]
+        lines.append("Spans:")
+        lines.append(f"{'count':>7} {'total s':>9} {'mean s':>9}  span")
+        for name, durations in sorted(self.spans.items(), key=lambda item: -sum(item[1])):
+            lines.append(f"{len(durations):7d} {sum(durations):9.3f} {sum(durations) / len(durations):9.3f}  {name}")
+        lines += ["", f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB", "Top allocation sites:"]
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            lines.append(f"  {stat}")
+
+        summary_path = self.output_dir / f"{self.command}.txt"
+        summary_path.write_text("\n".join(lines) + "\n")
+        return summary_path
@@ -0,0 +1,434 @@
+"""
+Module for building RAPTOR summary trees over a research index.
+
+This module implements the recursive part of RAPTOR: the chunks of each source are
+clustered by embedding similarity, every cluster is summarized, the summaries are
+embedded and clustered again, and so on until a single root remains. The roots of
+all sources are then combined the same way into one tree.
+
+Each source gets its own subtree, and every summary node is identified by a hash
+of its children, so when sources are added or changed only their own branches and
+the few nodes above them are re-clustered and re-summarized.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+TREE_FILE = "tree.json"
+SUMMARY_CACHE_FILE = "summaries.json"
+TOP_GROUP = None
+
+
+class LLMSummarizer:
+    """
+    A summarizer using an OpenAI chat model through LangChain.
+    """
+
+    def __init__(self, model="gpt-4o-mini"):
+        """
+        Initialize the LLMSummarizer instance.
+
+        :param model: Name of the chat model used for summaries
+        :type model: str
+        """
+        self.model = model
+
+    def summarize(self, texts):
+        """
+        Summarize a cluster of related texts.
+
+        :param texts: Texts belonging to one cluster
+        :type texts: list
+        :return: A single summary of the texts
+        :rtype: str
+        """
+        from langchain_openai import ChatOpenAI
+
+        chat_model = ChatOpenAI(temperature=0, model=self.model)
+        joined = "\n\n---\n\n".join(texts)
+        response = chat_model.invoke(
+            "Write a detailed summary of the following related passages, keeping every key fact, "
+            "name and number. Do not add information that is not in the passages.\n\n" + joined
+        )
+        return response.content.strip()
+
+
+class ExtractiveSummarizer:
+    """
+    A deterministic, offline summarizer that keeps the lead sentence of each text.
+    """
+
+    def __init__(self, max_words=120):
+        """
+        Initialize the ExtractiveSummarizer instance.
+
+        :param max_words: Maximum number of words in a summary
+        :type max_words: int
+        """
+        self.max_words = max_words
+
+    def summarize(self, texts):
+        """
+        Summarize a cluster of related texts.
+
+        :param texts: Texts belonging to one cluster
+        :type texts: list
+        :return: The lead sentences of the texts, truncated to max_words
+        :rtype: str
+        """
+        leads = [re.split(r"(?<=[.!?])\s+", text.strip(), maxsplit=1)[0] for text in texts if text.strip()]
+        words = " ".join(leads).split()
+        return " ".join(words[:self.max_words])
+
+
+def get_summarizer(summarizer_name, **kwargs):
+    """
+    Get a summarizer by name.
+
+    :param summarizer_name: Name of the summarizer ('openai' or 'extractive')
+    :type summarizer_name: str
+    :return: An instance of the requested summarizer
+    :rtype: LLMSummarizer or ExtractiveSummarizer
+    :raises ValueError: If an unknown summarizer is requested
+    """
+    if summarizer_name == 'openai':
+        return LLMSummarizer(**kwargs)
+    elif summarizer_name == 'extractive':
+        return ExtractiveSummarizer(**kwargs)
+    else:
+        raise ValueError(f"Unknown summarizer: {summarizer_name}")
+
+
+def _squared_distances(vectors, centroids):
+    return np.maximum(
+        (vectors ** 2).sum(axis=1)[:, None] - 2.0 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)[None, :],
+        0.0,
+    )
+
+
+def kmeans(vectors, k, iterations=25, seed=0):
+    """
+    Cluster row vectors with k-means++ initialization and Lloyd iterations.
+
+    :param vectors: Matrix of shape (n, dim)
+    :type vectors: numpy.ndarray
+    :param k: Number of clusters
+    :type k: int
+    :param iterations: Maximum number of Lloyd iterations
+    :type iterations: int
+    :param seed: Seed for the initialization, so results are reproducible
+    :type seed: int
+    :return: Cluster label per row and the cluster centroids
+    :rtype: tuple
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    n = len(vectors)
+    if k >= n:
+        return np.arange(n), vectors.copy()
+    rng = np.random.default_rng(seed)
+    centroids = np.empty((k, vectors.shape[1]))
+    centroids[0] = vectors[rng.integers(n)]
+    closest = _squared_distances(vectors, centroids[:1])[:, 0]
+    for i in range(1, k):
+        total = closest.sum()
+        index = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centroids[i] = vectors[index]
+        closest = np.minimum(closest, _squared_distances(vectors, centroids[i:i + 1])[:, 0])
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = _squared_distances(vectors, centroids).argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return labels, centroids
+
+
+def gmm(vectors, k, iterations=50, seed=0, tol=1e-4):
+    """
+    Cluster row vectors with a spherical Gaussian mixture fitted by EM.
+
+    The mixture is initialized from k-means and every row is assigned to its most
+    likely component.
+
+    :param vectors: Matrix of shape (n, dim)
+    :type vectors: numpy.ndarray
+    :param k: Number of mixture components
+    :type k: int
+    :param iterations: Maximum number of EM iterations
+    :type iterations: int
+    :param seed: Seed for the k-means initialization
+    :type seed: int
+    :param tol: Stop when the mean log-likelihood improves less than this
+    :type tol: float
+    :return: Component label per row and the component means
+    :rtype: tuple
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    n, dim = vectors.shape
+    labels, means = kmeans(vectors, k, seed=seed)
+    if k >= n:
+        return labels, means
+    counts = np.bincount(labels, minlength=k).astype(np.float64)
+    weights = np.maximum(counts, 1.0) / n
+    variances = np.full(k, max(_squared_distances(vectors, means).min(axis=1).mean() / dim, 1e-6))
+    previous = -np.inf
+    for _ in range(iterations):
+        squared = _squared_distances(vectors, means)
+        log_p = np.log(weights)[None, :] - 0.5 * dim * np.log(2 * np.pi * variances)[None, :] \
+            - squared / (2 * variances[None, :])
+        peak = log_p.max(axis=1, keepdims=True)
+        log_norm = peak[:, 0] + np.log(np.exp(log_p - peak).sum(axis=1))
+        responsibilities = np.exp(log_p - log_norm[:, None])
+        likelihood = log_norm.mean()
+        if likelihood - previous < tol:
+            break
+        previous = likelihood
+        totals = responsibilities.sum(axis=0) + 1e-10
+        weights = totals / n
+        means = (responsibilities.T @ vectors) / totals[:, None]
+        variances = (responsibilities * _squared_distances(vectors, means)).sum(axis=0) / (dim * totals) + 1e-6
+    return responsibilities.argmax(axis=1), means
+
+
+CLUSTERING_METHODS = {"kmeans": kmeans, "gmm": gmm}
+
+
+class RaptorTree:
+    """
+    A RAPTOR summary tree built on top of a ResearchIndex.
+    """
+
+    def __init__(self, index, summarizer, cluster_size=6, method="kmeans", max_workers=8):
+        """
+        Initialize the RaptorTree instance.
+
+        :param index: Research index holding the chunks and summary stores
+        :type index: ResearchIndex
+        :param summarizer: Summarizer used for every cluster
+        :type summarizer: LLMSummarizer or ExtractiveSummarizer
+        :param cluster_size: Target number of nodes per cluster
+        :type cluster_size: int
+        :param method: Clustering method ('kmeans' or 'gmm')
+        :type method: str
+        :param max_workers: Maximum number of concurrent summarization calls
+        :type max_workers: int
+        """
+        if method not in CLUSTERING_METHODS:
+            raise ValueError(f"Unknown clustering method: {method}")
+        if cluster_size < 2:
+            raise ValueError("Cluster size must be at least 2")
+        self.index = index
+        self.summarizer = summarizer
+        self.cluster_size = cluster_size
+        self.cluster = CLUSTERING_METHODS[method]
+        self.max_workers = max_workers
+        self.path = Path(index.path)
+        tree_path = self.path / TREE_FILE
+        self.tree = json.loads(tree_path.read_text()) if tree_path.exists() else {"sources": {}, "nodes": {}, "root": None}
+        cache_path = self.path / SUMMARY_CACHE_FILE
+        self.summary_cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+
+    @property
+    def root(self):
+        """
+        Identifier of the root node, or None for an empty tree.
+
+        :rtype: str or None
+        """
+        return self.tree["root"]
+
+    @property
+    def nodes(self):
+        """
+        All nodes of the tree keyed by identifier.
+
+        :rtype: dict
+        """
+        return self.tree["nodes"]
+
+    def update(self):
+        """
+        Bring the tree up to date with the sources in the index.
+
+        Unchanged sources keep their subtrees as they are. Changed and new sources
+        are built level by level, all in lockstep, so the summaries of one level are
+        requested concurrently across every source being rebuilt. Vector stores
+        left mostly made of deleted rows are compacted at the end.
+
+        :return: Counts of rebuilt and reused sources, summaries generated and cache hits
+        :rtype: dict
+        """
+        self._stats = {"rebuilt_sources": 0, "reused_sources": 0, "summaries_generated": 0, "cache_hits": 0}
+        old_nodes = self.tree["nodes"]
+        nodes = {}
+        roots = {}
+        pending = {}
+        for source, entry in self.index.manifest.items():
+            previous = self.tree["sources"].get(source)
+            if previous and previous["sha256"] == entry["sha256"] and previous["root"] in old_nodes:
+                self._copy_subtree(previous["root"], old_nodes, nodes)
+                roots[source] = previous["root"]
+                self._stats["reused_sources"] += 1
+            else:
+                pending[source] = self._leaves(source, entry, nodes)
+                self._stats["rebuilt_sources"] += 1
+
+        while pending:
+            for source in [source for source, ids in pending.items() if len(ids) <= 1]:
+                ids = pending.pop(source)
+                if ids:
+                    roots[source] = ids[0]
+            if pending:
+                pending = self._build_level(pending, nodes, old_nodes)
+
+        top = [roots[source] for source in self.index.manifest if source in roots]
+        while len(top) > 1:
+            top = self._build_level({TOP_GROUP: top}, nodes, old_nodes)[TOP_GROUP]
+
+        stale_rows = {node["row"] for node in old_nodes.values() if node["store"] == "summaries"} \
+            - {node["row"] for node in nodes.values() if node["store"] == "summaries"}
+        if stale_rows:
+            self.index.summaries.delete(stale_rows)
+        for store_name, remap in self.index.compact().items():
+            for node in nodes.values():
+                if node["store"] == store_name:
+                    node["row"] = int(remap[node["row"]])
+
+        self.tree = {
+            "sources": {
+                source: {"sha256": self.index.manifest[source]["sha256"], "root": root}
+                for source, root in roots.items()
+            },
+            "nodes": nodes,
+            "root": top[0] if top else None,
+        }
+        self._save()
+        return self._stats
+
+    def text(self, node_id):
+        """
+        Return the text of a node: the chunk for leaves, the summary otherwise.
+
+        :param node_id: Identifier of the node
+        :type node_id: str
+        :rtype: str
+        """
+        return self._node_text(node_id, self.tree["nodes"])
+
+    def _leaves(self, source, entry, nodes):
+        ids = []
+        first, last = entry["rows"]
+        for row in range(first, last):
+            text = self.index.store.metadata(row)["text"]
+            # The position keeps repeated chunks of a source apart
+            node_id = _hash("leaf", source, str(row - first), text)
+            nodes[node_id] = {"level": 0, "store": "chunks", "row": row, "source": source, "children": []}
+            ids.append(node_id)
+        return ids
+
+    def _copy_subtree(self, node_id, old_nodes, nodes):
+        stack = [node_id]
+        while stack:
+            current = stack.pop()
+            if current not in nodes:
+                nodes[current] = old_nodes[current]
+                stack.extend(old_nodes[current]["children"])
+
+    def _node_text(self, node_id, nodes):
+        node = nodes[node_id]
+        if node["store"] == "chunks":
+            return self.index.store.metadata(node["row"])["text"]
+        return node["text"]
+
+    def _vectors(self, ids, nodes):
+        vectors = np.empty((len(ids), self.index.embedder.dim), dtype=np.float32)
+        for store_name, store in (("chunks", self.index.store), ("summaries", self.index.summaries)):
+            positions = [i for i, node_id in enumerate(ids) if nodes[node_id]["store"] == store_name]
+            if positions:
+                vectors[positions] = store.vectors([nodes[ids[i]]["row"] for i in positions])
+        return vectors
+
+    def _build_level(self, groups, nodes, old_nodes):
+        """
+        Cluster every group's nodes and summarize all new clusters concurrently.
+
+        :return: The node identifiers of the next level, per group
+        :rtype: dict
+        """
+        next_level = {group: [] for group in groups}
+        to_summarize = []
+        for group, ids in groups.items():
+            k = math.ceil(len(ids) / self.cluster_size)
+            labels = self.cluster(self._vectors(ids, nodes), k)[0] if k > 1 else np.zeros(len(ids), dtype=int)
+            for label in dict.fromkeys(labels.tolist()):
+                members = [node_id for node_id, member_label in zip(ids, labels) if member_label == label]
+                if len(members) == 1:
+                    next_level[group].append(members[0])
+                    continue
+                level = max(nodes[member]["level"] for member in members) + 1
+                node_id = _hash("summary", str(level), *sorted(members))
+                next_level[group].append(node_id)
+                if node_id in nodes:
+                    continue
+                if node_id in old_nodes:
+                    nodes[node_id] = old_nodes[node_id]
+                    self._stats["cache_hits"] += 1
+                    continue
+                nodes[node_id] = {"level": level, "store": "summaries", "row": None,
+                                  "source": group, "children": members}
+                to_summarize.append(node_id)
+
+        if to_summarize:
+            summaries = {}
+            missing = []
+            for node_id in to_summarize:
+                if node_id in self.summary_cache:
+                    summaries[node_id] = self.summary_cache[node_id]
+                    self._stats["cache_hits"] += 1
+                else:
+                    missing.append(node_id)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                texts = [[self._node_text(child, nodes) for child in nodes[node_id]["children"]] for node_id in missing]
+                for node_id, summary in zip(missing, executor.map(self.summarizer.summarize, texts)):
+                    summaries[node_id] = summary
+                    self.summary_cache[node_id] = summary
+            self._stats["summaries_generated"] += len(missing)
+
+            vectors = self.index.embedder.embed([summaries[node_id] for node_id in to_summarize])
+            metadatas = [
+                {"source": nodes[node_id]["source"], "node": node_id, "level": nodes[node_id]["level"],
+                 "text": summaries[node_id]}
+                for node_id in to_summarize
+            ]
+            rows = self.index.summaries.add(vectors, metadatas)
+            for node_id, row in zip(to_summarize, rows):
+                nodes[node_id]["text"] = summaries[node_id]
+                nodes[node_id]["row"] = row
+        return next_level
+
+    def _save(self):
+        # Summaries of nodes that are no longer in the tree would otherwise pile up
+        self.summary_cache = {
+            node_id: summary for node_id, summary in self.summary_cache.items() if node_id in self.tree["nodes"]
+        }
+        for file_name, data in ((TREE_FILE, self.tree), (SUMMARY_CACHE_FILE, self.summary_cache)):
+            tmp_path = self.path / (file_name + ".tmp")
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, self.path / file_name)
+
+
+def _hash(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
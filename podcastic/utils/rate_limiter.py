@@ -0,0 +1,375 @@
+"""
+Module for adaptive rate limiting of TTS provider requests.
+
+This module provides a token bucket for request pacing and an AIMD (additive
+increase, multiplicative decrease) controller for in-flight concurrency. One
+limiter is shared per provider and API key, so every worker talking to the same
+account backs off together when the provider throttles.
+"""
+
+import email.utils
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import yaml
+
+from podcastic.utils.metrics import run_metrics
+
+DEFAULT_SETTINGS = {
+    "initial_concurrency": 2,
+    "min_concurrency": 1,
+    "max_concurrency": 8,
+    "requests_per_second": 2.0,
+    "max_requests_per_second": 10.0,
+    "burst": 4,
+    "latency_target": 10.0,
+    "decrease_factor": 0.5,
+    "max_retries": 5,
+    "base_backoff": 1.0,
+    "max_backoff": 60.0,
+}
+
+# Timeouts and throttling; 5xx responses are retried as well
+RETRYABLE_STATUS_CODES = {408, 429}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a request is still throttled after all retries are used up.
+    """
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket that paces requests to a given rate.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        """
+        Initialize the TokenBucket instance.
+
+        :param rate: Tokens added per second
+        :type rate: float
+        :param capacity: Maximum number of tokens the bucket can hold
+        :type capacity: float
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1.0):
+        """
+        Take tokens from the bucket, blocking until enough are available.
+
+        :param tokens: Number of tokens to take
+        :type tokens: float
+        :return: Seconds spent waiting
+        :rtype: float
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class AdaptiveRateLimiter:
+    """
+    A limiter combining a token bucket with an AIMD concurrency controller.
+
+    While requests succeed within the latency target the allowed concurrency and
+    request rate grow additively. A 429 or 5xx response (or a Retry-After header)
+    cuts both multiplicatively, at most once per overload, and pauses new requests
+    until the provider is ready again.
+    """
+
+    def __init__(self, name, clock=time.monotonic, sleep=time.sleep, **settings):
+        """
+        Initialize the AdaptiveRateLimiter instance.
+
+        :param name: Name used for metrics, usually the provider name
+        :type name: str
+        :param settings: Overrides for any key in DEFAULT_SETTINGS
+        """
+        unknown = set(settings) - set(DEFAULT_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown rate limit settings: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.settings = {**DEFAULT_SETTINGS, **settings}
+        self.min_concurrency = self.settings["min_concurrency"]
+        self.max_concurrency = max(self.settings["max_concurrency"], self.min_concurrency)
+        self.concurrency = float(min(max(self.settings["initial_concurrency"], self.min_concurrency),
+                                     self.max_concurrency))
+        self.min_rate = self.settings["requests_per_second"] * 0.1
+        self.max_rate = self.settings["max_requests_per_second"]
+        self.bucket = TokenBucket(self.settings["requests_per_second"], self.settings["burst"],
+                                  clock=clock, sleep=sleep)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = float("-inf")
+        self.throttled = 0
+        self.retries = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._condition = threading.Condition()
+        self._publish()
+
+    @property
+    def limit(self):
+        """
+        The number of requests currently allowed in flight.
+
+        :rtype: int
+        """
+        return max(self.min_concurrency, int(self.concurrency))
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one in-flight slot for the duration of the enclosed request.
+
+        Blocks while the concurrency limit is reached, while a Retry-After pause
+        is active, and until the token bucket allows another request.
+        """
+        with self._condition:
+            while True:
+                pause = self.paused_until - self._clock()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight >= self.limit:
+                    self._condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def record_success(self, latency):
+        """
+        Feed a successful request back into the controller.
+
+        :param latency: Duration of the request in seconds
+        :type latency: float
+        """
+        run_metrics.observe(f"tts.{self.name}.latency", latency)
+        with self._condition:
+            if latency <= self.settings["latency_target"]:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.concurrency)
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + 1.0 / self.concurrency)
+            self._publish()
+            self._condition.notify_all()
+
+    def record_throttle(self, retry_after=None, started=None):
+        """
+        Feed a throttled request back into the controller.
+
+        A request that started before the last decrease reports the same overload
+        that caused it, so its throttle is counted without cutting again. A burst
+        of concurrent 429s therefore makes a single multiplicative decrease.
+
+        :param retry_after: Seconds the provider asked us to wait, if given
+        :type retry_after: float or None
+        :param started: Clock reading when the throttled request started, if known
+        :type started: float or None
+        """
+        factor = self.settings["decrease_factor"]
+        with self._condition:
+            self.throttled += 1
+            if started is None or started > self.last_decrease:
+                self.concurrency = max(float(self.min_concurrency), self.concurrency * factor)
+                self.bucket.rate = max(self.min_rate, self.bucket.rate * factor)
+                self.last_decrease = self._clock()
+            if retry_after:
+                self.paused_until = max(self.paused_until, self._clock() + retry_after)
+            self._publish()
+        run_metrics.increment(f"rate_limit.{self.name}.throttled")
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call a function under the limiter, retrying throttled attempts.
+
+        :param func: Function performing one provider request
+        :type func: callable
+        :return: Whatever the function returns
+        :raises RateLimitExceeded: If the request is still throttled after max_retries
+        """
+        max_retries = self.settings["max_retries"]
+        for attempt in range(max_retries + 1):
+            with self.slot():
+                start = self._clock()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    status = status_code_of(e)
+                    if not is_retryable_status(status):
+                        raise
+                    retry_after = retry_after_of(e)
+                    self.record_throttle(retry_after, started=start)
+                    if attempt == max_retries:
+                        raise RateLimitExceeded(
+                            f"{self.name} still throttled (HTTP {status}) after {max_retries} retries"
+                        ) from e
+                else:
+                    self.record_success(self._clock() - start)
+                    return result
+            with self._condition:
+                self.retries += 1
+            run_metrics.increment(f"rate_limit.{self.name}.retries")
+            if retry_after is None:
+                # With a Retry-After header the slot itself waits out the pause
+                self._sleep(self.backoff(attempt))
+
+    def backoff(self, attempt):
+        """
+        Compute an exponential backoff delay with full jitter.
+
+        :param attempt: Zero-based retry attempt
+        :type attempt: int
+        :return: Seconds to wait before the next attempt
+        :rtype: float
+        """
+        ceiling = min(self.settings["max_backoff"], self.settings["base_backoff"] * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def stats(self):
+        """
+        Describe the current limits of this limiter.
+
+        :return: Current concurrency, request rate and throttle counters
+        :rtype: dict
+        """
+        return {
+            "concurrency": self.limit,
+            "max_concurrency": self.max_concurrency,
+            "requests_per_second": round(self.bucket.rate, 3),
+            "in_flight": self.in_flight,
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
+
+    def _publish(self):
+        run_metrics.set_gauge(f"rate_limit.{self.name}", self.stats())
+
+
+def status_code_of(error):
+    """
+    Extract an HTTP status code from a provider SDK exception.
+
+    :param error: Exception raised by an HTTP client or provider SDK
+    :type error: Exception
+    :return: The HTTP status code, or None if the exception has none
+    :rtype: int or None
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after_of(error):
+    """
+    Extract the Retry-After delay from a provider SDK exception.
+
+    Understands ``retry-after-ms`` as well as ``Retry-After`` given either in
+    seconds or as an HTTP date.
+
+    :param error: Exception raised by an HTTP client or provider SDK
+    :type error: Exception
+    :return: Seconds to wait, or None if no header was sent
+    :rtype: float or None
+    """
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    headers = {key.lower(): value for key, value in dict(headers).items()}
+    if "retry-after-ms" in headers:
+        try:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value) if value else None
+        if parsed is None:
+            return None
+        return max(0.0, parsed.timestamp() - time.time())
+
+
+def is_retryable_status(status):
+    """
+    Decide whether a status code means the provider is throttling or overloaded.
+
+    :param status: HTTP status code
+    :type status: int or None
+    :rtype: bool
+    """
+    return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def load_rate_limit_settings(provider, config=None):
+    """
+    Load the rate limit settings for a provider from the configuration file.
+
+    :param provider: Name of the provider section under ``rate_limits``
+    :type provider: str
+    :param config: Configuration already loaded; read from config.yaml if None
+    :type config: dict or None
+    :return: Settings overriding DEFAULT_SETTINGS
+    :rtype: dict
+    """
+    if config is None:
+        with open("config.yaml", "r") as f:
+            config = yaml.safe_load(f) or {}
+    return dict((config.get("rate_limits") or {}).get(provider) or {})
+
+
+def get_rate_limiter(provider, api_key, **settings):
+    """
+    Get the shared limiter for a provider and API key, creating it if needed.
+
+    :param provider: Name of the provider ('openai' or 'elevenlabs')
+    :type provider: str
+    :param api_key: API key the requests are made with
+    :type api_key: str
+    :param settings: Settings used when the limiter is first created
+    :return: The limiter shared by every client using this key
+    :rtype: AdaptiveRateLimiter
+    """
+    key_id = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+    with _limiters_lock:
+        limiter = _limiters.get((provider, key_id))
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(provider, **settings)
+            _limiters[(provider, key_id)] = limiter
+        return limiter
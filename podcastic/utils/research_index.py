@@ -0,0 +1,144 @@
+"""
+Module for the research index.
+
+This module ties the document chunker, an embedder and the vector store together.
+A research index keeps a manifest of the sources it holds, so re-indexing a source
+whose text has not changed is free and a changed source only replaces its own rows.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from podcastic.utils.documents import chunk_text
+from podcastic.utils.vector_store import VectorStore
+
+CHUNKS_DIR = "chunks"
+SUMMARIES_DIR = "summaries"
+MANIFEST_FILE = "sources.json"
+
+
+class ResearchIndex:
+    """
+    A directory-backed index of chunked, embedded research sources.
+    """
+
+    def __init__(self, path: Path, embedder):
+        """
+        Open a research index, creating it if it does not exist yet.
+
+        :param path: Directory holding the index
+        :type path: Path
+        :param embedder: Embedder used for both documents and queries
+        :type embedder: HashingEmbedder or OpenAIEmbedder
+        """
+        self.path = Path(path)
+        self.embedder = embedder
+        self.store = VectorStore(self.path / CHUNKS_DIR, dim=embedder.dim, embedder=embedder.name)
+        self.summaries = VectorStore(self.path / SUMMARIES_DIR, dim=embedder.dim, embedder=embedder.name)
+        manifest_path = self.path / MANIFEST_FILE
+        self.manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+    @property
+    def sources(self):
+        """
+        Sources currently held by the index.
+
+        :rtype: list
+        """
+        return list(self.manifest)
+
+    def _save_manifest(self):
+        tmp_path = self.path / (MANIFEST_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp_path, self.path / MANIFEST_FILE)
+
+    def update_source(self, source: str, text: str, max_words: int = 200, overlap: int = 40):
+        """
+        Index the text of a source, replacing any earlier version of it.
+
+        :param source: URL or path identifying the source
+        :type source: str
+        :param text: Extracted text of the source
+        :type text: str
+        :param max_words: Maximum number of words per chunk
+        :type max_words: int
+        :param overlap: Number of words shared by consecutive chunks
+        :type overlap: int
+        :return: Number of chunks added (0 if the source was unchanged)
+        :rtype: int
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        previous = self.manifest.get(source)
+        if previous and previous["sha256"] == digest:
+            return 0
+
+        chunks = chunk_text(text, max_words=max_words, overlap=overlap)
+        vectors = self.embedder.embed(chunks)
+        metadatas = [{"source": source, "chunk": i, "text": chunk} for i, chunk in enumerate(chunks)]
+        if previous:
+            self.store.delete(range(*previous["rows"]))
+        rows = self.store.add(vectors, metadatas)
+        self.manifest[source] = {"sha256": digest, "rows": [rows.start, rows.stop]}
+        self._save_manifest()
+        return len(chunks)
+
+    def remove_source(self, source: str):
+        """
+        Remove a source and all of its chunks from the index.
+
+        :param source: URL or path identifying the source
+        :type source: str
+        """
+        previous = self.manifest.pop(source, None)
+        if previous:
+            self.store.delete(range(*previous["rows"]))
+            self._save_manifest()
+
+    def compact(self):
+        """
+        Compact the vector stores that are mostly made of deleted rows.
+
+        Compaction renumbers rows. The manifest is updated here; callers holding
+        other row numbers translate them with the returned maps.
+
+        :return: New index of every old row (-1 if deleted), keyed by "chunks" or
+            "summaries", for each store that was compacted
+        :rtype: dict
+        """
+        remaps = {}
+        if self.store.needs_compaction():
+            remap = remaps["chunks"] = self.store.compact()
+            for entry in self.manifest.values():
+                first, last = entry["rows"]
+                if last > first:
+                    new_first = int(remap[first])
+                    entry["rows"] = [new_first, new_first + last - first]
+            self._save_manifest()
+        if self.summaries.needs_compaction():
+            remaps["summaries"] = self.summaries.compact()
+        return remaps
+
+    def search(self, query: str, k: int = 5, include_summaries: bool = True):
+        """
+        Find the chunks and summaries most relevant to a query.
+
+        Chunks and RAPTOR summaries are searched together ("collapsed tree"
+        retrieval), so broad questions can be answered by a summary while
+        specific ones still hit the original text.
+
+        :param query: Free-text query
+        :type query: str
+        :param k: Number of results to return
+        :type k: int
+        :param include_summaries: Whether to search the summary nodes as well
+        :type include_summaries: bool
+        :return: Results ordered from most to least relevant
+        :rtype: list of SearchResult
+        """
+        query_vector = self.embedder.embed([query])[0]
+        results = self.store.search(query_vector, k=k)
+        if include_summaries:
+            results += self.summaries.search(query_vector, k=k)
+        return sorted(results, key=lambda result: -result.score)[:k]
@@ -0,0 +1,106 @@
+"""
+Module for retrieving topic context for script writing.
+
+This module provides a retriever that picks the passages of a topic file (or of a
+research index) most relevant to the current outline section, within a token
+budget, instead of sending the whole topic with every utterance prompt.
+"""
+
+import tempfile
+from pathlib import Path
+
+from podcastic.utils.research_index import ResearchIndex
+from podcastic.utils.tokens import count_tokens
+
+TOPIC_SOURCE = "topic"
+
+
+class ContextRetriever:
+    """
+    Retrieve token-budgeted context for outline sections.
+    """
+
+    def __init__(self, index, full_text, top_k=4, token_budget=1500, model="gpt-4o-mini"):
+        """
+        Initialize the ContextRetriever instance.
+
+        :param index: Index to retrieve passages from, or None to always use full_text
+        :type index: ResearchIndex or None
+        :param full_text: The text that would be sent without retrieval
+        :type full_text: str
+        :param top_k: Maximum number of passages per section
+        :type top_k: int
+        :param token_budget: Maximum number of context tokens per section
+        :type token_budget: int
+        :param model: Model whose tokenizer is used to count tokens
+        :type model: str
+        """
+        self.index = index
+        self.full_text = full_text
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.model = model
+        self.full_tokens = count_tokens(full_text, model)
+        self.tokens_saved = 0
+        self.lookups = 0
+        self._cache = {}
+        self._temp_dir = None
+
+    @classmethod
+    def from_topic(cls, topic_content, embedder, top_k=4, token_budget=1500, model="gpt-4o-mini",
+                   max_words=120, overlap=20):
+        """
+        Build a retriever over a topic file, indexed into a temporary directory.
+
+        Topics that already fit in the token budget are not indexed at all.
+
+        :param topic_content: Full text of the topic file
+        :type topic_content: str
+        :param embedder: Embedder used for the passages and queries
+        :type embedder: HashingEmbedder or OpenAIEmbedder
+        :return: A retriever for the topic
+        :rtype: ContextRetriever
+        """
+        retriever = cls(None, topic_content, top_k=top_k, token_budget=token_budget, model=model)
+        if retriever.full_tokens <= token_budget:
+            return retriever
+        retriever._temp_dir = tempfile.TemporaryDirectory(prefix="podcastic-topic-")
+        retriever.index = ResearchIndex(Path(retriever._temp_dir.name), embedder)
+        retriever.index.update_source(TOPIC_SOURCE, topic_content, max_words=max_words, overlap=overlap)
+        return retriever
+
+    def context_for(self, section: str) -> str:
+        """
+        Return the context to send with an utterance prompt for a section.
+
+        Passages are looked up once per section and reused for every utterance in it.
+
+        :param section: Current outline section
+        :type section: str
+        :return: The most relevant passages that fit the token budget
+        :rtype: str
+        """
+        self.lookups += 1
+        if self.index is None:
+            return self.full_text
+        if section not in self._cache:
+            passages = []
+            used = 0
+            for result in self.index.search(section, k=self.top_k):
+                tokens = count_tokens(result.metadata["text"], self.model)
+                if used + tokens > self.token_budget:
+                    continue
+                passages.append(result.metadata["text"])
+                used += tokens
+            self._cache[section] = ("\n\n".join(passages), used)
+        context, used = self._cache[section]
+        self.tokens_saved += self.full_tokens - used
+        return context
+
+    def close(self):
+        """
+        Remove the temporary topic index, if one was built.
+        """
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
@@ -0,0 +1,360 @@
+"""
+Module for storing the audio segments of an episode in a single pack file.
+
+This module provides an alternative to writing one MP3 file per segment. Every
+segment is appended to ``segments.pack`` as a record holding its name, its
+metadata and its audio, and an offset index in ``segments.json`` locates the
+latest record of each segment. Segments are read from one open handle on the
+pack, or through a single memory map of it. The index can be rebuilt from the
+records if it is lost or behind the pack. Replacing a segment appends a new
+record; compact() drops the old ones.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+from pathlib import Path
+
+import yaml
+
+PACK_FILE = "segments.pack"
+INDEX_FILE = "segments.json"
+RECORD_MAGIC = b"PSEG"
+# Magic, metadata length and audio length, followed by the metadata and the audio
+RECORD_HEADER = struct.Struct("<4sII")
+
+
+class PackedSegment:
+    """
+    A segment stored in a SegmentPack.
+
+    It has the ``name`` and ``stem`` of the MP3 file it replaces, and converts
+    to an ffmpeg input that reads the segment straight from the pack.
+    """
+
+    def __init__(self, pack, name: str, entry: dict):
+        """
+        Initialize the PackedSegment instance.
+
+        :param pack: The pack holding the segment
+        :type pack: SegmentPack
+        :param name: File name of the segment
+        :type name: str
+        :param entry: The segment's index entry
+        :type entry: dict
+        """
+        self.pack = pack
+        self.name = name
+        self.entry = entry
+
+    @property
+    def stem(self) -> str:
+        return Path(self.name).stem
+
+    @property
+    def size(self) -> int:
+        return self.entry["length"]
+
+    @property
+    def sha256(self) -> str:
+        return self.entry["sha256"]
+
+    @property
+    def data(self) -> memoryview:
+        """
+        The segment's MP3 audio, memory-mapped from the pack.
+
+        :rtype: memoryview
+        """
+        return self.pack.view(self.entry["offset"], self.entry["length"])
+
+    def read(self, size: int = None) -> bytes:
+        """
+        Read the segment's MP3 audio, or its first ``size`` bytes, without mapping the pack.
+
+        :rtype: bytes
+        """
+        length = self.entry["length"] if size is None else min(size, self.entry["length"])
+        return self.pack.read(self.entry["offset"], length)
+
+    def __str__(self):
+        start = self.entry["offset"]
+        return f"subfile,,start,{start},end,{start + self.entry['length']},,:{self.pack.pack_path}"
+
+    def __repr__(self):
+        return f"PackedSegment({self.name!r}, offset={self.entry['offset']}, length={self.entry['length']})"
+
+    def __eq__(self, other):
+        return isinstance(other, PackedSegment) and (self.pack.pack_path, self.name, self.entry["offset"]) == \
+            (other.pack.pack_path, other.name, other.entry["offset"])
+
+    def __hash__(self):
+        return hash((self.pack.pack_path, self.name, self.entry["offset"]))
+
+
+class SegmentPack:
+    """
+    An append-only pack of the audio segments of one episode.
+    """
+
+    def __init__(self, directory: Path):
+        """
+        Initialize the SegmentPack instance, recovering the index if needed.
+
+        :param directory: Directory holding the pack and its index
+        :type directory: Path
+        """
+        self.directory = Path(directory)
+        self.pack_path = self.directory / PACK_FILE
+        self.index_path = self.directory / INDEX_FILE
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        # Replaced maps that still had views when the pack grew
+        self._stale_maps = []
+        self.index = {"pack_size": 0, "segments": {}}
+        if self.index_path.exists():
+            self.index = json.loads(self.index_path.read_text())
+        self._recover()
+
+    @staticmethod
+    def exists(directory: Path) -> bool:
+        return (Path(directory) / PACK_FILE).exists()
+
+    def put(self, name: str, data: bytes, **metadata) -> PackedSegment:
+        """
+        Append a segment to the pack, replacing any segment of the same name.
+
+        :param name: File name of the segment, such as ``001_Ava.mp3``
+        :type name: str
+        :param data: The segment's MP3 audio
+        :type data: bytes
+        :param metadata: JSON-serializable details kept with the segment, such as its text
+        :return: The stored segment
+        :rtype: PackedSegment
+        """
+        header = json.dumps({"name": name, **metadata}).encode()
+        record = RECORD_HEADER.pack(RECORD_MAGIC, len(header), len(data)) + header
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.pack_path, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(record)
+                f.write(data)
+            entry = {
+                "offset": offset + len(record),
+                "length": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+                **metadata,
+            }
+            self.index["segments"][name] = entry
+            self.index["pack_size"] = entry["offset"] + len(data)
+            self._save_index()
+        return PackedSegment(self, name, entry)
+
+    def get(self, name: str) -> PackedSegment:
+        """
+        Look up a segment by file name.
+
+        :raises KeyError: If the pack has no segment of that name
+        :rtype: PackedSegment
+        """
+        return PackedSegment(self, name, self.index["segments"][name])
+
+    def __contains__(self, name):
+        return name in self.index["segments"]
+
+    def __len__(self):
+        return len(self.index["segments"])
+
+    def segments(self) -> list:
+        """
+        List the segments of the pack, sorted by name.
+
+        :rtype: list
+        """
+        return [self.get(name) for name in sorted(self.index["segments"])]
+
+    @property
+    def wasted_bytes(self) -> int:
+        """
+        Bytes of the pack taken by replaced segments and record headers.
+
+        :rtype: int
+        """
+        return self.index["pack_size"] - sum(entry["length"] for entry in self.index["segments"].values())
+
+    def needs_compaction(self) -> bool:
+        """
+        Check whether replaced segments take up more than half of the pack.
+
+        :rtype: bool
+        """
+        return self.wasted_bytes > self.index["pack_size"] // 2
+
+    def read(self, offset: int, length: int) -> bytes:
+        """
+        Read a range of the pack through a single open file handle.
+
+        :rtype: bytes
+        """
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.pack_path, "rb")
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """
+        Memory-map a range of the pack.
+
+        Only one map is live. When segments were appended since it was made, it
+        is replaced by a map of the whole pack, and the old map is closed as
+        soon as no views of it remain.
+
+        :rtype: memoryview
+        """
+        with self._lock:
+            if self._map is None or len(self._map) < offset + length:
+                self._retire_map()
+                with open(self.pack_path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self._map)[offset:offset + length]
+
+    def export(self, destination: Path) -> list:
+        """
+        Write every segment back out as a loose MP3 file.
+
+        :param destination: Directory to write the files to
+        :type destination: Path
+        :return: Paths of the written files
+        :rtype: list
+        """
+        destination = Path(destination)
+        destination.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for segment in self.segments():
+            path = destination / segment.name
+            path.write_bytes(segment.read())
+            paths.append(path)
+        return paths
+
+    def compact(self) -> int:
+        """
+        Rewrite the pack with only the latest record of each segment.
+
+        :return: Bytes reclaimed
+        :rtype: int
+        """
+        before = self.index["pack_size"]
+        shutil.rmtree(self.directory / ".compact", ignore_errors=True)
+        compacted = SegmentPack(self.directory / ".compact")
+        for segment in self.segments():
+            metadata = {key: value for key, value in segment.entry.items()
+                        if key not in ("offset", "length", "sha256")}
+            compacted.put(segment.name, segment.read(), **metadata)
+        compacted.close()
+        with self._lock:
+            self._release()
+            os.replace(compacted.pack_path, self.pack_path)
+            self.index = compacted.index
+            self._save_index()
+        os.remove(compacted.index_path)
+        compacted.directory.rmdir()
+        return before - self.index["pack_size"]
+
+    def close(self):
+        """
+        Release the file handle and memory maps of the pack.
+        """
+        with self._lock:
+            self._release()
+
+    def _release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._retire_map()
+
+    def _retire_map(self):
+        if self._map is not None:
+            self._stale_maps.append(self._map)
+            self._map = None
+        still_viewed = []
+        for mapped in self._stale_maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # A view is still alive; try again the next time a map is retired
+                still_viewed.append(mapped)
+        self._stale_maps = still_viewed
+
+    def _recover(self):
+        """
+        Bring the index in line with the pack after an interrupted write.
+
+        Records the index does not know about are indexed, and a record cut off
+        at the end of the pack is dropped.
+        """
+        size = self.pack_path.stat().st_size if self.pack_path.exists() else 0
+        if size == self.index["pack_size"]:
+            return
+        if size < self.index["pack_size"]:
+            self.index = {"pack_size": 0, "segments": {}}
+            if size == 0:
+                return
+        offset = self.index["pack_size"]
+        with open(self.pack_path, "rb") as f:
+            f.seek(offset)
+            while offset + RECORD_HEADER.size <= size:
+                magic, header_length, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                data_offset = offset + RECORD_HEADER.size + header_length
+                if magic != RECORD_MAGIC or data_offset + length > size:
+                    break
+                metadata = json.loads(f.read(header_length))
+                data = f.read(length)
+                name = metadata.pop("name")
+                self.index["segments"][name] = {
+                    "offset": data_offset,
+                    "length": length,
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                    **metadata,
+                }
+                offset = data_offset + length
+        if offset < size:
+            os.truncate(self.pack_path, offset)
+        self.index["pack_size"] = offset
+        self._save_index()
+
+    def _save_index(self):
+        temp_path = self.directory / f"{INDEX_FILE}.tmp"
+        temp_path.write_text(json.dumps(self.index, indent=2))
+        os.replace(temp_path, self.index_path)
+
+
+def open_episode_pack(output_dir: Path, create: bool = False):
+    """
+    Open the segment pack of an episode, if it stores its segments in one.
+
+    An episode uses a pack if it already has one. With ``create``, a new pack is
+    also started when ``segment_store`` is set to ``pack`` in config.yaml.
+
+    :param output_dir: The episode's output directory
+    :type output_dir: Path
+    :param create: Whether to start a pack for an episode that has none
+    :type create: bool
+    :return: The pack, or None if the episode's segments are loose MP3 files
+    :rtype: SegmentPack or None
+    """
+    if SegmentPack.exists(output_dir):
+        return SegmentPack(output_dir)
+    if create:
+        with open("config.yaml", "r") as f:
+            config = yaml.safe_load(f) or {}
+        if config.get("segment_store", "files") == "pack":
+            return SegmentPack(output_dir)
+    return None
@@ -0,0 +1,70 @@
+"""
+Module for detecting repetition in a conversation.
+
+This module provides an index of the lines said so far that scores new text by
+its closest match, using the same difflib ratio the script writer has always
+used. Candidates are compared against every line, so the cheap upper bounds of
+SequenceMatcher are checked first and the full ratio is only computed for lines
+that could still beat the best match found so far.
+"""
+
+import difflib
+
+SIMILARITY_THRESHOLD = 0.8
+
+
+class SimilarityIndex:
+    """
+    Score text by its similarity to the lines of a conversation.
+    """
+
+    def __init__(self, lines=()):
+        """
+        Initialize the SimilarityIndex instance.
+
+        :param lines: Lines of the conversation so far
+        :type lines: iterable
+        """
+        self.lines = [line.lower() for line in lines]
+
+    def add(self, line):
+        """
+        Add a line to the index.
+
+        :param line: Line of the conversation
+        :type line: str
+        """
+        self.lines.append(line.lower())
+
+    def max_similarity(self, text):
+        """
+        Find how close a text comes to any line in the index.
+
+        :param text: Text to score
+        :type text: str
+        :return: The highest difflib ratio against any line (0.0 for an empty index)
+        :rtype: float
+        """
+        matcher = difflib.SequenceMatcher(None)
+        # SequenceMatcher caches what it learns about seq2, so the candidate goes there
+        matcher.set_seq2(text.lower())
+        best = 0.0
+        for line in self.lines:
+            matcher.set_seq1(line)
+            if matcher.real_quick_ratio() <= best or matcher.quick_ratio() <= best:
+                continue
+            best = max(best, matcher.ratio())
+        return best
+
+    def best(self, candidates):
+        """
+        Pick the candidate least similar to the conversation.
+
+        :param candidates: Candidate texts
+        :type candidates: list
+        :return: The chosen candidate and its similarity score
+        :rtype: tuple
+        """
+        scored = [(self.max_similarity(candidate), candidate) for candidate in candidates]
+        score, candidate = min(scored, key=lambda item: item[0])
+        return candidate, score
@@ -0,0 +1,324 @@
+"""
+Module for streaming a podcast live while it is being written.
+
+This module provides the pieces of the real-time pipeline: a splitter that cuts
+streamed LLM tokens into sentences, a pipeline that synthesizes those sentences
+concurrently but publishes their audio strictly in order, and a small HTTP server
+that serves the published MP3 frames as one continuous ``audio/mpeg`` stream.
+
+The pipeline also keeps a model of the listener's playback position, which gives
+the two latencies that matter for live audio: the time to first audio, and the
+gap a listener hears at the start of an utterance beyond its scripted pause
+because the audio was not ready yet.
+"""
+
+import logging
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from podcastic.utils.metrics import run_metrics
+from podcastic.utils.mp3 import duration_of, iter_frames, silent_frames
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "vs.", "e.g.", "i.e.", "etc."}
+
+
+class SentenceSplitter:
+    """
+    Cut an incoming stream of text into complete sentences.
+    """
+
+    def __init__(self, min_chars=20):
+        """
+        Initialize the SentenceSplitter instance.
+
+        :param min_chars: Shorter sentences are joined with the next one, so the
+            TTS service is not called for fragments like "Right."
+        :type min_chars: int
+        """
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        """
+        Add streamed text and return the sentences it completes.
+
+        A sentence is complete once its closing punctuation is followed by
+        whitespace, so the last sentence of a stream only comes out of flush().
+
+        :param text: Next piece of streamed text
+        :type text: str
+        :return: Completed sentences, in order
+        :rtype: list
+        """
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            sentence = self.buffer[start:match.end()].strip()
+            if sentence.split()[-1].lower() in ABBREVIATIONS or len(sentence) < self.min_chars:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """
+        Return whatever text is left once the stream has ended.
+
+        :return: The final sentence, if there is one
+        :rtype: list
+        """
+        remainder, self.buffer = self.buffer.strip(), ""
+        return [remainder] if remainder else []
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/stream"):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        position = 0
+        try:
+            while True:
+                chunks = self.server.chunks_after(position)
+                if chunks is None:
+                    return
+                position += len(chunks)
+                for chunk in chunks:
+                    self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("Listener disconnected")
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class AudioStreamServer(ThreadingHTTPServer):
+    """
+    Serve published MP3 chunks as one continuous HTTP audio stream.
+
+    Every listener receives the stream from the beginning, and then each new
+    chunk as soon as it is published. The response has no length; it ends when
+    the stream is closed.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        """
+        Initialize the AudioStreamServer instance.
+
+        :param address: Host and port to listen on; port 0 picks a free port
+        :type address: tuple
+        """
+        super().__init__(address, _StreamHandler)
+        self.chunks = []
+        self.closed = False
+        self.condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/stream"
+
+    def start(self):
+        """
+        Start serving listeners in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def publish(self, data):
+        """
+        Append audio to the stream and wake up every listener.
+
+        :param data: MP3 frames
+        :type data: bytes
+        """
+        with self.condition:
+            self.chunks.append(data)
+            self.condition.notify_all()
+
+    def close_stream(self):
+        """
+        Mark the stream as complete, so listeners' responses end.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def chunks_after(self, position):
+        """
+        Wait for chunks beyond a listener's position.
+
+        :param position: Number of chunks the listener already has
+        :type position: int
+        :return: The new chunks, or None once the stream is closed and drained
+        :rtype: list or None
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.chunks) > position or self.closed)
+            if len(self.chunks) > position:
+                return self.chunks[position:]
+            return None
+
+    def stop(self):
+        """
+        Close the stream and stop the server.
+        """
+        self.close_stream()
+        self.shutdown()
+        self.server_close()
+
+
+class LiveAudioPipeline:
+    """
+    Synthesize sentences concurrently and publish their audio in script order.
+    """
+
+    def __init__(self, service, server, started=None, clock=time.perf_counter):
+        """
+        Initialize the LiveAudioPipeline instance.
+
+        :param service: TTS service with a synthesize(text, voice) method
+        :type service: OpenAITTS, ElevenLabsTTS or OfflineTTS
+        :param server: Server the audio is published to
+        :type server: AudioStreamServer
+        :param started: Clock reading the time to first audio is measured from
+        :type started: float or None
+        :param clock: Monotonic clock
+        :type clock: callable
+        """
+        rate_limiter = getattr(service, "rate_limiter", None)
+        self.service = service
+        self.server = server
+        self.clock = clock
+        self.started = clock() if started is None else started
+        self.executor = ThreadPoolExecutor(max_workers=rate_limiter.max_concurrency if rate_limiter else 2)
+        self.items = queue.Queue()
+        self.sample_rate = 24000
+        self.time_to_first_audio = None
+        self.gaps = []
+        self.error = None
+        self._futures = []
+        self._playhead = None
+        self._new_utterance = True
+        self._publisher = threading.Thread(target=self._publish_loop, daemon=True)
+        self._publisher.start()
+
+    def start_utterance(self):
+        """
+        Mark the next sentence as the start of a new utterance.
+        """
+        self._new_utterance = True
+
+    def say(self, voice, sentence):
+        """
+        Queue a sentence for synthesis.
+
+        :param voice: Name of the voice to use
+        :type voice: str
+        :param sentence: Text to synthesize
+        :type sentence: str
+        :raises Exception: The error of a sentence that already failed to synthesize
+        """
+        self.raise_if_failed()
+        future = self.executor.submit(self.service.synthesize, sentence, voice)
+        self._futures.append(future)
+        self.items.put(("audio", future, self._new_utterance))
+        self._new_utterance = False
+        run_metrics.increment("live.sentences")
+
+    def pause(self, seconds):
+        """
+        Queue a pause between utterances.
+
+        :param seconds: Length of the pause
+        :type seconds: float
+        :raises Exception: The error of a sentence that already failed to synthesize
+        """
+        self.raise_if_failed()
+        self.items.put(("pause", seconds, False))
+
+    def raise_if_failed(self):
+        """
+        Raise the error of a sentence whose synthesis has already failed.
+
+        Lets the caller stop writing the episode at the first failure instead of
+        finding out at finish().
+        """
+        if self.error is not None:
+            raise self.error
+        for future in self._futures:
+            if future.done() and not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+        self._futures = [future for future in self._futures if not future.done()]
+
+    def abort(self):
+        """
+        Stop after an error: queued sentences are dropped and the stream is closed.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.items.put(None)
+        self._publisher.join()
+        self.server.close_stream()
+
+    def finish(self):
+        """
+        Wait until everything queued has been published, then close the stream.
+
+        :raises Exception: The first error raised while synthesizing
+        """
+        self.items.put(None)
+        self._publisher.join()
+        self.executor.shutdown()
+        self.server.close_stream()
+        if self.error is not None:
+            raise self.error
+
+    def _publish_loop(self):
+        while (item := self.items.get()) is not None:
+            kind, value, new_utterance = item
+            if self.error is not None:
+                continue
+            try:
+                if kind == "audio":
+                    data = value.result()
+                    for _, header in iter_frames(data):
+                        self.sample_rate = header.sample_rate
+                        break
+                    self._publish(data, duration_of(data), new_utterance)
+                else:
+                    self._publish(silent_frames(value, self.sample_rate), value, False)
+            except Exception as e:
+                logger.exception("Live synthesis failed")
+                self.error = e
+
+    def _publish(self, data, duration, new_utterance):
+        now = self.clock()
+        if self._playhead is None:
+            self.time_to_first_audio = now - self.started
+            run_metrics.observe("live.time_to_first_audio", self.time_to_first_audio)
+            self._playhead = now
+        elif new_utterance:
+            # The listener has already heard the scripted pause, so any time the
+            # audio arrives after the playback position is an unplanned gap.
+            gap = max(0.0, now - self._playhead)
+            self.gaps.append(gap)
+            run_metrics.observe("live.inter_utterance_gap", gap)
+        self._playhead = max(self._playhead, now) + duration
+        self.server.publish(data)
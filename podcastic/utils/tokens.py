@@ -0,0 +1,42 @@
+"""
+Module for estimating LLM token counts.
+
+This module counts tokens with tiktoken when its encodings are available and
+falls back to a characters-per-token estimate otherwise (for example offline,
+when tiktoken cannot download its encoding files).
+"""
+
+from functools import lru_cache
+
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Count the tokens in a text for the given model.
+
+    :param text: Text to count
+    :type text: str
+    :param model: Name of the model whose tokenizer should be used
+    :type model: str
+    :return: Number of tokens (estimated if no tokenizer is available)
+    :rtype: int
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, round(len(text) / CHARS_PER_TOKEN))
+    return len(encoding.encode(text, disallowed_special=()))
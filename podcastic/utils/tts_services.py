@@ -8,6 +8,7 @@ import os
 from dotenv import load_dotenv
 from .openai_tts import OpenAITTS
 from .elevenlabs_tts import ElevenLabsTTS
+from .offline_tts import OfflineTTS
 
 load_dotenv()
 
@@ -15,10 +16,10 @@ def get_tts_service(service_name):
     """
     Get the appropriate TTS service based on the service name.
 
-    :param service_name: Name of the TTS service ('openai' or 'elevenlabs')
+    :param service_name: Name of the TTS service ('openai', 'elevenlabs' or 'offline')
     :type service_name: str
     :return: An instance of the requested TTS service
-    :rtype: OpenAITTS or ElevenLabsTTS
+    :rtype: OpenAITTS, ElevenLabsTTS or OfflineTTS
     :raises ValueError: If the API key is not found or if an unknown service is requested
     """
     if service_name == 'openai':
@@ -31,5 +32,7 @@ def get_tts_service(service_name):
         if not api_key:
             raise ValueError("ElevenLabs API key not found in .env file")
         return ElevenLabsTTS(api_key=api_key)
+    elif service_name == 'offline':
+        return OfflineTTS()
     else:
         raise ValueError(f"Unknown TTS service: {service_name}")
\ No newline at end of file
@@ -0,0 +1,333 @@
+"""
+Module for a memory-mapped vector store.
+
+This module provides a self-contained vector index for research material. The
+embeddings live in a memory-mapped float32 matrix that grows in place, while each
+row's metadata is kept in a compact JSON-lines sidecar with a fixed-width offset
+index, so a search only ever reads the metadata of the rows it returns. Deleted
+rows are masked out of searches until compact() rewrites the store without them.
+
+On disk a store is a directory containing:
+
+* ``store.json`` - dimension, row count, capacity and deleted row ranges
+* ``vectors.f32`` - the raw float32 matrix (capacity x dim, row-major)
+* ``metadata.jsonl`` - one JSON object per row
+* ``metadata.idx`` - uint64 byte offsets of each row in ``metadata.jsonl``
+"""
+
+import heapq
+import json
+import os
+import shutil
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+HEADER_FILE = "store.json"
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "metadata.jsonl"
+OFFSETS_FILE = "metadata.idx"
+
+MIN_CAPACITY = 1024
+DEFAULT_BLOCK_SIZE = 65536
+# Fraction of deleted rows above which a store is worth compacting
+COMPACTION_THRESHOLD = 0.5
+
+SearchResult = namedtuple("SearchResult", ["index", "score", "metadata"])
+
+
+class VectorStore:
+    """
+    An append-only store of normalized embeddings with top-k search.
+    """
+
+    def __init__(self, path: Path, dim=None, embedder=None):
+        """
+        Open a vector store, creating it if it does not exist yet.
+
+        :param path: Directory holding the store files
+        :type path: Path
+        :param dim: Dimension of the vectors; required when creating a new store
+        :type dim: int or None
+        :param embedder: Name of the embedder used to build the store
+        :type embedder: str or None
+        :raises ValueError: If the dimension is missing or does not match the store
+        """
+        self.path = Path(path)
+        header_path = self.path / HEADER_FILE
+        if header_path.exists():
+            self.header = json.loads(header_path.read_text())
+            if dim is not None and dim != self.header["dim"]:
+                raise ValueError(f"Store at {self.path} has dimension {self.header['dim']}, not {dim}")
+            if embedder is not None and self.header.get("embedder") not in (None, embedder):
+                raise ValueError(f"Store at {self.path} was built with the '{self.header['embedder']}' embedder")
+        else:
+            if dim is None:
+                raise ValueError(f"No vector store at {self.path}; a dimension is needed to create one")
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.header = {"dim": dim, "count": 0, "capacity": 0, "deleted": [], "embedder": embedder}
+            (self.path / VECTORS_FILE).touch()
+            (self.path / METADATA_FILE).touch()
+            (self.path / OFFSETS_FILE).touch()
+            self._save_header()
+        self._matrix = None
+        self._offsets = None
+
+    @property
+    def dim(self):
+        """
+        Dimension of the stored vectors.
+
+        :rtype: int
+        """
+        return self.header["dim"]
+
+    def __len__(self):
+        return self.header["count"]
+
+    def _save_header(self):
+        # Write-then-rename, so a crash mid-append never leaves a count that
+        # points past the data that was actually written.
+        tmp_path = self.path / (HEADER_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(self.header))
+        os.replace(tmp_path, self.path / HEADER_FILE)
+
+    def _vectors(self):
+        if self._matrix is None:
+            count = len(self)
+            if count == 0:
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            else:
+                self._matrix = np.memmap(self.path / VECTORS_FILE, dtype=np.float32, mode="r",
+                                         shape=(count, self.dim))
+        return self._matrix
+
+    def _metadata_offsets(self):
+        if self._offsets is None:
+            count = len(self)
+            if count == 0:
+                self._offsets = np.zeros(0, dtype=np.uint64)
+            else:
+                self._offsets = np.memmap(self.path / OFFSETS_FILE, dtype=np.uint64, mode="r",
+                                          shape=(count,))
+        return self._offsets
+
+    def add(self, vectors, metadatas):
+        """
+        Append vectors and their metadata to the store.
+
+        :param vectors: Matrix of shape (n, dim); rows should be L2-normalized
+        :type vectors: numpy.ndarray
+        :param metadatas: One JSON-serializable dict per row
+        :type metadatas: list
+        :return: Row indices of the appended vectors
+        :rtype: range
+        :raises ValueError: If the shapes do not match
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of shape (n, {self.dim}), got {vectors.shape}")
+        if len(vectors) != len(metadatas):
+            raise ValueError("Number of vectors and metadata entries differ")
+        start = len(self)
+        end = start + len(vectors)
+        if len(vectors) == 0:
+            return range(start, end)
+
+        self._matrix = None
+        self._offsets = None
+        row_bytes = self.dim * np.dtype(np.float32).itemsize
+        if end > self.header["capacity"]:
+            capacity = max(end, 2 * self.header["capacity"], MIN_CAPACITY)
+            os.truncate(self.path / VECTORS_FILE, capacity * row_bytes)
+            self.header["capacity"] = capacity
+        block = np.memmap(self.path / VECTORS_FILE, dtype=np.float32, mode="r+",
+                          offset=start * row_bytes, shape=vectors.shape)
+        block[:] = vectors
+        block.flush()
+        del block
+
+        # Drop offsets left behind by an append that never updated the header
+        os.truncate(self.path / OFFSETS_FILE, start * np.dtype(np.uint64).itemsize)
+        offsets = np.empty(len(metadatas), dtype=np.uint64)
+        with open(self.path / METADATA_FILE, "ab") as f:
+            position = f.tell()
+            for i, metadata in enumerate(metadatas):
+                line = json.dumps(metadata, separators=(",", ":")).encode("utf-8") + b"\n"
+                offsets[i] = position
+                f.write(line)
+                position += len(line)
+        with open(self.path / OFFSETS_FILE, "ab") as f:
+            offsets.tofile(f)
+
+        self.header["count"] = end
+        self._save_header()
+        return range(start, end)
+
+    def delete(self, indices):
+        """
+        Mark rows as deleted so they are no longer returned by searches.
+
+        :param indices: Row indices to delete
+        :type indices: iterable of int
+        """
+        if isinstance(indices, range) and indices.step == 1:
+            new_ranges = [[indices.start, indices.stop]] if indices else []
+        else:
+            new_ranges = _to_ranges(sorted({int(i) for i in indices}))
+        self.header["deleted"] = _merge_ranges(self.header["deleted"], new_ranges)
+        self._save_header()
+
+    @property
+    def deleted_count(self) -> int:
+        """
+        Number of rows marked as deleted.
+
+        :rtype: int
+        """
+        return sum(stop - start for start, stop in self.header["deleted"])
+
+    def needs_compaction(self, threshold=COMPACTION_THRESHOLD) -> bool:
+        """
+        Check whether deleted rows make up more than ``threshold`` of the store.
+
+        :rtype: bool
+        """
+        return len(self) > 0 and self.deleted_count > threshold * len(self)
+
+    def compact(self, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Rewrite the store without its deleted rows.
+
+        The remaining rows keep their order but are renumbered, so callers that
+        hold row indices must translate them with the returned map.
+
+        :param block_size: Number of rows copied at a time
+        :type block_size: int
+        :return: The new index of every old row, or -1 for deleted rows
+        :rtype: numpy.ndarray
+        """
+        count = len(self)
+        live = np.ones(count, dtype=bool)
+        for start, stop in self.header["deleted"]:
+            live[start:stop] = False
+        remap = np.full(count, -1, dtype=np.int64)
+        remap[live] = np.arange(int(live.sum()), dtype=np.int64)
+
+        shutil.rmtree(self.path / ".compact", ignore_errors=True)
+        compacted = VectorStore(self.path / ".compact", dim=self.dim, embedder=self.header.get("embedder"))
+        matrix = self._vectors()
+        for start in range(0, count, block_size):
+            rows = np.flatnonzero(live[start:start + block_size]) + start
+            compacted.add(np.asarray(matrix[rows]), [self.metadata(int(row)) for row in rows])
+        self._matrix = None
+        self._offsets = None
+        # The header goes last, so it never describes files that are not in place yet
+        for file_name in (VECTORS_FILE, METADATA_FILE, OFFSETS_FILE, HEADER_FILE):
+            os.replace(compacted.path / file_name, self.path / file_name)
+        compacted.path.rmdir()
+        self.header = compacted.header
+        return remap
+
+    def metadata(self, index):
+        """
+        Read the metadata of a single row.
+
+        :param index: Row index
+        :type index: int
+        :return: The metadata stored with the row
+        :rtype: dict
+        """
+        offset = int(self._metadata_offsets()[index])
+        with open(self.path / METADATA_FILE, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def vectors(self, indices=None):
+        """
+        Return stored vectors.
+
+        :param indices: Row indices to return; all rows if omitted
+        :type indices: list or None
+        :return: Matrix of the requested rows
+        :rtype: numpy.ndarray
+        """
+        matrix = self._vectors()
+        if indices is None:
+            return matrix
+        return np.asarray(matrix[np.asarray(indices, dtype=np.int64)])
+
+    def search(self, query, k=5, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Find the rows most similar to a query vector.
+
+        The matrix is scanned in blocks of ``block_size`` rows, so only one block
+        is paged in at a time, and a running top-k is kept with argpartition.
+
+        :param query: Query vector of shape (dim,), L2-normalized
+        :type query: numpy.ndarray
+        :param k: Number of results to return
+        :type k: int
+        :param block_size: Number of rows scored per matrix product
+        :type block_size: int
+        :return: Results ordered from most to least similar
+        :rtype: list of SearchResult
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Expected a query of dimension {self.dim}, got {query.shape[0]}")
+        matrix = self._vectors()
+        count = len(self)
+        if count == 0 or k <= 0:
+            return []
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_indices = np.empty(0, dtype=np.int64)
+        deleted = self.header["deleted"]
+        # Blocks and deleted ranges are both in row order, so one pass covers them
+        next_range = 0
+        for start in range(0, count, block_size):
+            stop = min(start + block_size, count)
+            scores = np.asarray(matrix[start:stop] @ query)
+            while next_range < len(deleted) and deleted[next_range][1] <= start:
+                next_range += 1
+            current = next_range
+            while current < len(deleted) and deleted[current][0] < stop:
+                deleted_start, deleted_stop = deleted[current]
+                scores[max(deleted_start, start) - start:min(deleted_stop, stop) - start] = -np.inf
+                current += 1
+            scores = np.concatenate([best_scores, scores])
+            indices = np.concatenate([best_indices, np.arange(start, stop, dtype=np.int64)])
+            if len(scores) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                scores, indices = scores[top], indices[top]
+            best_scores, best_indices = scores, indices
+
+        order = np.argsort(-best_scores, kind="stable")
+        return [
+            SearchResult(int(best_indices[i]), float(best_scores[i]), self.metadata(int(best_indices[i])))
+            for i in order
+            if np.isfinite(best_scores[i])
+        ]
+
+
+def _merge_ranges(ranges, new_ranges):
+    # Both lists are sorted, so one pass merges them and joins touching ranges
+    merged = []
+    for start, stop in heapq.merge(ranges, new_ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return merged
+
+
+def _to_ranges(sorted_indices):
+    ranges = []
+    for index in sorted_indices:
+        if ranges and ranges[-1][1] == index:
+            ranges[-1][1] = index + 1
+        else:
+            ranges.append([index, index + 1])
+    return ranges
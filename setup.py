@@ -26,6 +26,7 @@ setup(
         "langchain-community",
         "elevenlabs",
         "langchain-openai",
+        "numpy",
         "pytest",
         "pytest-watch"
     ],